@@ -5,18 +5,28 @@
 MarkdownUp backend API support
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import partial
+import hashlib
+import json
+import multiprocessing
 import os
 from pathlib import PurePosixPath
+import threading
+import time
+from types import MappingProxyType
 
 import bare_script
 from bare_script.include import schema_parse, schema_type_model_validate
 from bare_script.value import value_args_model, value_args_validate
 import chisel
 
+from .cache import LRUCache
 
-# Load the MarkdownUp API requests
-def load_api_requests(root, config, api_config):
+
+# Load the MarkdownUp API requests - process executor APIs are executed using the API process pool
+def load_api_requests(root, config, api_config, api_executor=None):
     debug = config.get('debug', False)
 
     # Parse the API schema markdown files
@@ -28,7 +38,72 @@ def load_api_requests(root, config, api_config):
             schema_parse(schema_file.read(), types, schema_posix, False)
     schema_type_model_validate(types)
 
-    # Parse and execute the API BareScript files
+    # The loaded API globals are shared by all API requests and are read-only
+    api_globals = MappingProxyType(_load_api_globals(root, config, api_config))
+
+    # Yield the API requests
+    stats = api_config.get('stats', False)
+    api_stats = {}
+    for api in api_config['apis']:
+        api_name = api['name']
+        api_fn_name = api.get('function', api_name)
+        api_wsgi = api.get('wsgi', False)
+        api_process = api_executor if api.get('executor') == 'process' else None
+
+        # Create the API's response cache, if necessary
+        api_cache = None
+        if 'cache' in api:
+            cache_config = api['cache']
+            api_cache = APIResponseCache(
+                cache_config['ttlSeconds'],
+                cache_config.get('maxEntries', DEFAULT_API_CACHE_ENTRIES),
+                cache_config.get('maxBytes', DEFAULT_API_CACHE_BYTES)
+            )
+
+        # Create the API's concurrency limit, if necessary
+        api_limit = None
+        if 'maxConcurrent' in api:
+            api_limit = APIConcurrencyLimit(api['maxConcurrent'], api.get('maxQueue', 0))
+            _add_action_errors(types, api_name, ('Unavailable',))
+
+        # Create the API's execution budget and statistics
+        api_execution = APIExecution(api.get('maxStatements'), api.get('timeoutMs'), stats)
+        if 'maxStatements' in api:
+            _add_action_errors(types, api_name, ('StatementLimit',))
+        if 'timeoutMs' in api:
+            _add_action_errors(types, api_name, ('Timeout',))
+
+        # Add the API action
+        api_fn = api_globals.get(api_fn_name)
+        if not api_fn or not callable(api_fn):
+            raise NameError(f'Unknown API function "{api_fn_name}"')
+        action_fn = partial(
+            _bare_script_action_fn, api_fn_name, api_wsgi, api_globals, debug, api_cache, api_process, api_limit, api_execution
+        )
+        yield chisel.Action(action_fn, name=api_name, types=types, wsgi_response=api_wsgi)
+        api_stats[api_name] = (api_execution, api_cache, api_limit)
+
+    # Add the API statistics API, if enabled
+    if stats and api_stats:
+        stats_action_fn = partial(_markdown_up_api_stats, api_stats)
+        yield chisel.Action(stats_action_fn, name='markdown_up_api_stats', spec=_MARKDOWN_UP_API_STATS_SPEC)
+
+
+# Helper to add errors to an API action's errors enum so the errors pass output validation
+def _add_action_errors(types, action_name, error_names):
+    action = types[action_name]['action']
+    errors_name = action.get('errors')
+    if errors_name is None:
+        errors_name = action['errors'] = f'{action_name}_errors'
+        types[errors_name] = {'enum': {'name': errors_name}}
+    error_values = types[errors_name]['enum'].setdefault('values', [])
+    for error_name in error_names:
+        if not any(error_value['name'] == error_name for error_value in error_values):
+            error_values.append({'name': error_name})
+
+
+# Parse and execute the API BareScript files - returns the API globals
+def _load_api_globals(root, config, api_config):
     api_globals = {
         'apiHeader': _api_header,
         'apiError': _api_error
@@ -37,7 +112,7 @@ def load_api_requests(root, config, api_config):
         for key, value in config['globals'].items():
             api_globals[key] = value
     script_options = {
-        'debug': debug,
+        'debug': config.get('debug', False),
         'fetchFn': bare_script.fetch_read_write,
         'globals': api_globals,
         'logFn': bare_script.log_stdout,
@@ -48,19 +123,113 @@ def load_api_requests(root, config, api_config):
         script_path = os.path.join(root, *(script_parts[1:] if script_parts[0] == '/' else script_parts))
         with open(script_path, 'r', encoding='utf-8') as script_file:
             bare_script.execute_script(bare_script.barescript_parse_script(script_file.read(), 1, script_posix), script_options)
+    return api_globals
 
-    # Yield the API requests
-    for api in api_config['apis']:
-        api_name = api['name']
-        api_fn_name = api.get('function', api_name)
-        api_wsgi = api.get('wsgi', False)
 
-        # Add the API action
-        api_fn = api_globals.get(api_fn_name)
-        if not api_fn or not callable(api_fn):
-            raise NameError(f'Unknown API function "{api_fn_name}"')
-        action_fn = partial(_bare_script_action_fn, api_fn_name, api_wsgi, api_globals, debug)
-        yield chisel.Action(action_fn, name=api_name, types=types, wsgi_response=api_wsgi)
+def create_api_executor(root, config, api_config):
+    """
+    Create the API process pool, if any APIs use the process executor. Each worker process parses and executes the API
+    BareScript files once, at startup. Returns None if no APIs use the process executor.
+    """
+
+    if not any(api.get('executor') == 'process' for api in api_config['apis']):
+        return None
+    return APIProcessPool(root, config, api_config)
+
+
+class APIProcessPool:
+    """
+    The API worker process pool. If a worker process terminates abruptly, breaking the pool, the pool is recreated.
+    """
+
+    __slots__ = ('root', 'config', 'api_config', 'lock', 'executor')
+
+
+    def __init__(self, root, config, api_config):
+        self.root = root
+        self.config = config
+        self.api_config = api_config
+        self.lock = threading.Lock()
+        self.executor = self._create_executor()
+
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.api_config.get('processes'),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_api_process_init,
+            initargs=(self.root, self.config, self.api_config)
+        )
+
+
+    def call(self, fn, *args, timeout=None):
+        """
+        Call a function in an API worker process and return its result. If the pool is broken, it is recreated for
+        subsequent calls and BrokenProcessPool is raised. If the call exceeds the timeout, in seconds, the pool's worker
+        processes are terminated, failing any other in-flight calls, the pool is recreated, and TimeoutError is raised.
+        """
+
+        executor = self.executor
+        try:
+            return executor.submit(fn, *args).result(timeout)
+        except BrokenProcessPool:
+            self._replace_executor(executor)
+            raise
+        except TimeoutError:
+            self._replace_executor(executor, terminate=True)
+            raise
+
+
+    # Replace a broken or timed-out executor, if not already replaced - a timed-out executor's workers are terminated
+    def _replace_executor(self, executor, terminate=False):
+        with self.lock:
+            if self.executor is not executor:
+                return
+            self.executor = self._create_executor()
+
+        if terminate:
+            # Python 3.14+
+            terminate_workers = getattr(executor, 'terminate_workers', None)
+            if terminate_workers is not None:
+                terminate_workers()
+                return
+            for process in list((executor._processes or {}).values()): # pylint: disable=protected-access
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+    def shutdown(self):
+        """
+        Shutdown the pool's worker processes
+        """
+
+        self.executor.shutdown()
+
+
+# The API worker process state
+_API_PROCESS_STATE = {}
+
+
+# API worker process initializer
+def _api_process_init(root, config, api_config):
+    _API_PROCESS_STATE['globals'] = MappingProxyType(_load_api_globals(root, config, api_config))
+
+
+# Execute an API function in an API worker process - returns the response, the API state, the statement count, the
+# logged lines, and the error kind/message tuple, if any. Exceptions are returned as data since they may not be
+# picklable (e.g., BareScriptRuntimeError) and an unpicklable exception breaks the process pool.
+def _api_process_call(api_fn_name, debug, max_statements, timeout_ms, req):
+    api_globals = _API_PROCESS_STATE['globals']
+    log_lines = []
+    try:
+        response, api_state, statement_count = _call_api_fn(
+            api_globals.get(api_fn_name), api_globals, debug, req, log_lines.append, max_statements, timeout_ms
+        )
+    except bare_script.BareScriptRuntimeError as exc:
+        return None, None, None, log_lines, ('runtime', str(exc))
+    except Exception as exc: # pylint: disable=broad-exception-caught
+        return None, None, None, log_lines, ('error', f'{type(exc).__name__}: {exc}')
+    return response, api_state, statement_count, log_lines, None
 
 
 # Special API global variables
@@ -68,34 +237,69 @@ _API_GLOBAL = '__markdown_up__'
 
 
 # Action function wrapper for a MarkdownUp API function
-def _bare_script_action_fn(api_fn_name, api_wsgi, api_globals, debug, ctx, req):
-    api_fn = api_globals.get(api_fn_name)
+def _bare_script_action_fn(api_fn_name, api_wsgi, api_globals, debug, api_cache, api_process, api_limit, api_execution, ctx, req):
+    # Execute the API function, or get its cached response - cached responses are not subject to the concurrency limit
+    execute_fn = partial(_execute_api_fn, api_fn_name, api_wsgi, api_globals, debug, api_process, api_execution, ctx, req)
+    if api_limit is not None:
+        execute_fn = partial(_execute_api_fn_limit, api_limit, execute_fn, ctx)
+    if api_cache is not None:
+        response, headers = api_cache.call(_api_cache_key(req), execute_fn)
+    else:
+        response, headers = execute_fn()
 
-    # Copy the API globals
-    script_globals = dict(api_globals)
-    script_globals[_API_GLOBAL] = {'headers': {}}
+    # WSGI response? The response is not modified since it may be cached.
+    if api_wsgi:
+        status, wsgi_headers, content = response
+        ctx.start_response(status, [*wsgi_headers, *headers.items()])
+        return [content.encode('utf-8')]
 
-    # Execute the API function
+    # Add response headers
+    ctx.headers.update(headers)
+
+    return response
+
+
+# Execute a MarkdownUp API function - returns the response and the response headers
+def _execute_api_fn(api_fn_name, api_wsgi, api_globals, debug, api_process, api_execution, ctx, req):
+    # Execute the API function - process executor API functions are executed by an API worker process and their logged
+    # lines are relayed
     wsgi_errors = ctx.environ.get('wsgi.errors')
-    script_options = {
-        'debug': debug,
-        'fetchFn': bare_script.fetch_read_write,
-        'globals': script_globals,
-        'logFn': partial(_log_filehandle, wsgi_errors) if wsgi_errors is not None else None,
-        'statementCount': 0,
-        'urlFile': bare_script.url_file_relative
-    }
-    response = api_fn([req], script_options)
+    log_fn = partial(_log_filehandle, wsgi_errors) if wsgi_errors is not None else None
+    max_statements, timeout_ms = api_execution.max_statements, api_execution.timeout_ms
+    if api_process is not None:
+        # The API worker process is terminated if the execution exceeds the timeout
+        try:
+            response, api_state, statement_count, log_lines, error = api_process.call(
+                _api_process_call, api_fn_name, debug, max_statements, timeout_ms, req,
+                timeout=timeout_ms / 1000 if timeout_ms is not None else None
+            )
+        except TimeoutError:
+            response, api_state, statement_count, log_lines, error = None, {'headers': {}}, 0, [], None
+            _set_api_timeout(api_state, timeout_ms)
+        if log_fn is not None:
+            for log_line in log_lines:
+                log_fn(log_line)
+
+        # Re-raise the API worker process's exception
+        if error is not None:
+            error_kind, error_message = error
+            if error_kind == 'runtime':
+                raise bare_script.BareScriptRuntimeError(None, None, error_message)
+            raise RuntimeError(error_message)
+    else:
+        response, api_state, statement_count = _call_api_fn(
+            api_globals.get(api_fn_name), api_globals, debug, req, log_fn, max_statements, timeout_ms
+        )
+
+    # Record the execution's statement count
+    api_execution.record(statement_count, api_state.get('exceeded'))
 
     # Error?
-    api_state = script_globals[_API_GLOBAL]
     if 'error' in api_state:
-        raise chisel.ActionError(api_state['error'], status=api_state.get('errorStatus'))
+        raise chisel.ActionError(api_state['error'], status=api_state.get('errorStatus'), message=api_state.get('errorMessage'))
 
-    # WSGI response?
+    # Validate the WSGI response
     if api_wsgi:
-        # Validate the WSGI response
-        status, headers, content = None, None, None
         invalid_response = not isinstance(response, list) or len(response) != 3
         if not invalid_response:
             status, headers, content = response
@@ -107,17 +311,332 @@ def _bare_script_action_fn(api_fn_name, api_wsgi, api_globals, debug, ctx, req):
             ctx.log.error(error_message)
             raise chisel.ActionError('InvalidOutput', status='500 Internal Server Error', message=error_message)
 
-        # Add WSGI response headers
-        headers.extend(api_state['headers'].items())
+    return response, api_state['headers']
 
-        # WSGI response
-        ctx.start_response(status, headers)
-        return [content.encode('utf-8')]
 
-    # Add response headers
-    ctx.headers.update(api_state['headers'])
+# Execute a MarkdownUp API function within its concurrency limit
+def _execute_api_fn_limit(api_limit, execute_fn, ctx):
+    if not api_limit.acquire():
+        ctx.add_header('Retry-After', str(API_RETRY_AFTER_SECONDS))
+        raise chisel.ActionError('Unavailable', status='503 Service Unavailable', message='Too many concurrent requests')
+    try:
+        return execute_fn()
+    finally:
+        api_limit.release()
 
-    return response
+
+# The Retry-After header value, in seconds, of API concurrency limit responses
+API_RETRY_AFTER_SECONDS = 1
+
+
+# Call a MarkdownUp API function - returns the response, the API state, and the statement count. If the function exceeds
+# its execution budget, the API state has the budget error. The BareScript runtime can't be interrupted, so the timeout
+# is checked when the execution completes.
+def _call_api_fn(api_fn, api_globals, debug, req, log_fn, max_statements=None, timeout_ms=None):
+    # Copy the API globals - the globals must be a dict since the BareScript runtime is much slower with other mappings
+    script_globals = dict(api_globals)
+    api_state = script_globals[_API_GLOBAL] = {'headers': {}}
+
+    # Execute the API function
+    script_options = {
+        'debug': debug,
+        'fetchFn': bare_script.fetch_read_write,
+        'globals': script_globals,
+        'logFn': log_fn,
+        'statementCount': 0,
+        'urlFile': bare_script.url_file_relative
+    }
+    if max_statements is not None:
+        script_options['maxStatements'] = max_statements
+    response = None
+    start_time = time.monotonic()
+    try:
+        response = api_fn([req], script_options)
+    except bare_script.BareScriptRuntimeError:
+        if max_statements is None or script_options['statementCount'] <= max_statements:
+            raise
+        api_state['error'] = 'StatementLimit'
+        api_state['errorStatus'] = '503 Service Unavailable'
+        api_state['errorMessage'] = f'Exceeded the maximum API statements ({max_statements})'
+        api_state['exceeded'] = 'statements'
+
+    # Exceeded the timeout?
+    if timeout_ms is not None and 'exceeded' not in api_state and (time.monotonic() - start_time) * 1000 > timeout_ms:
+        response = None
+        _set_api_timeout(api_state, timeout_ms)
+
+    return response, api_state, script_options['statementCount']
+
+
+# Set an API state's timeout error
+def _set_api_timeout(api_state, timeout_ms):
+    api_state['error'] = 'Timeout'
+    api_state['errorStatus'] = '504 Gateway Timeout'
+    api_state['errorMessage'] = f'Exceeded the API timeout ({timeout_ms} milliseconds)'
+    api_state['exceeded'] = 'timeout'
+
+
+class APIExecution:
+    """
+    An API's execution budget - the maximum statements and timeout, in milliseconds, if any - and its execution
+    statistics, if enabled
+    """
+
+    __slots__ = (
+        'max_statements', 'timeout_ms', 'stats', 'lock', 'calls', 'statements', 'max_call_statements', 'statement_limits',
+        'timeouts'
+    )
+
+
+    def __init__(self, max_statements=None, timeout_ms=None, stats=False):
+        self.max_statements = max_statements
+        self.timeout_ms = timeout_ms
+        self.stats = stats
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.statements = 0
+        self.max_call_statements = 0
+        self.statement_limits = 0
+        self.timeouts = 0
+
+
+    def record(self, statement_count, exceeded=None):
+        """
+        Record an API function execution's statement count and the exceeded budget, if any ("statements" or "timeout").
+        Nothing is recorded if statistics are not enabled.
+        """
+
+        if not self.stats:
+            return
+        with self.lock:
+            self.calls += 1
+            self.statements += statement_count
+            self.max_call_statements = max(self.max_call_statements, statement_count)
+            if exceeded == 'statements':
+                self.statement_limits += 1
+            elif exceeded == 'timeout':
+                self.timeouts += 1
+
+
+class APIResponseCache:
+    """
+    A time-to-live cache of an API's responses, keyed by request. Concurrent requests for the same uncached response
+    wait for a single execution of the API function (single-flight). Errors are not cached.
+    """
+
+    __slots__ = ('ttl_seconds', 'responses', 'lock', 'pending', 'hits', 'misses')
+
+
+    def __init__(self, ttl_seconds, max_entries, max_bytes):
+        self.ttl_seconds = ttl_seconds
+        self.responses = LRUCache(max_bytes, max_entries)
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+
+    def call(self, key, execute_fn):
+        """
+        Get a cached response or execute the function to get the response and cache it
+        """
+
+        while True:
+            with self.lock:
+                # Cached response?
+                item = self.responses.get(key)
+                if item is not None and item[0] > time.monotonic():
+                    self.hits += 1
+                    return item[1]
+
+                # Another request is executing the function?
+                pending_event = self.pending.get(key)
+                if pending_event is None:
+                    pending_event = self.pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+
+            # Wait for the other request's response and try again - if it failed, this request may execute the function
+            pending_event.wait()
+
+        # Execute the function and cache the response
+        try:
+            response = execute_fn()
+            response_size = len(json.dumps(response, default=str)) + API_CACHE_ENTRY_SIZE
+            self.responses.set(key, (time.monotonic() + self.ttl_seconds, response), response_size)
+            return response
+        finally:
+            with self.lock:
+                del self.pending[key]
+            pending_event.set()
+
+
+# Helper to compute a request's cache key - the hash of its canonical JSON
+def _api_cache_key(req):
+    req_json = json.dumps(req, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(req_json.encode('utf-8')).digest()
+
+
+# The default API response cache maximum entry count and size, in bytes, and the approximate fixed size of a cached response
+DEFAULT_API_CACHE_ENTRIES = 1000
+DEFAULT_API_CACHE_BYTES = 10 * 1024 * 1024
+API_CACHE_ENTRY_SIZE = 128
+
+
+class APIConcurrencyLimit:
+    """
+    An API's concurrent execution limit. Requests beyond the maximum concurrent executions wait in a bounded queue.
+    Requests beyond the maximum queue length are rejected.
+    """
+
+    __slots__ = ('max_concurrent', 'max_queue', 'semaphore', 'lock', 'in_flight', 'queued', 'rejected')
+
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.semaphore = threading.Semaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+
+    def acquire(self):
+        """
+        Acquire an execution slot, waiting in the queue if necessary. Returns False if the queue is full.
+        """
+
+        with self.lock:
+            if self.in_flight + self.queued >= self.max_concurrent + self.max_queue:
+                self.rejected += 1
+                return False
+            self.queued += 1
+        self.semaphore.acquire() # pylint: disable=consider-using-with
+        with self.lock:
+            self.queued -= 1
+            self.in_flight += 1
+        return True
+
+
+    def release(self):
+        """
+        Release an execution slot
+        """
+
+        with self.lock:
+            self.in_flight -= 1
+        self.semaphore.release()
+
+
+# The API statistics API
+def _markdown_up_api_stats(api_stats, _ctx, _req):
+    apis = []
+    for api_name, (api_execution, api_cache, api_limit) in sorted(api_stats.items()):
+        api = {
+            'name': api_name,
+            'execution': {
+                'calls': api_execution.calls,
+                'statements': api_execution.statements,
+                'maxStatements': api_execution.max_call_statements,
+                'statementLimits': api_execution.statement_limits,
+                'timeouts': api_execution.timeouts
+            }
+        }
+        if api_cache is not None:
+            api['cache'] = {
+                'hits': api_cache.hits,
+                'misses': api_cache.misses,
+                'entries': len(api_cache.responses),
+                'bytes': api_cache.responses.size
+            }
+        if api_limit is not None:
+            api['concurrency'] = {
+                'inFlight': api_limit.in_flight,
+                'queued': api_limit.queued,
+                'rejected': api_limit.rejected
+            }
+        apis.append(api)
+    return {'apis': apis}
+
+
+_MARKDOWN_UP_API_STATS_SPEC = '''\
+group "MarkdownUp API"
+
+
+# The MarkdownUp backend API statistics
+action markdown_up_api_stats
+    urls
+        GET
+
+    output
+        # The APIs' statistics
+        APIStats[] apis
+
+
+# An API's statistics
+struct APIStats
+
+    # The API name
+    string name
+
+    # The API's execution statistics
+    APIExecutionStats execution
+
+    # The API's response cache statistics
+    optional APICacheStats cache
+
+    # The API's concurrency limit statistics
+    optional APIConcurrencyStats concurrency
+
+
+# An API's execution statistics
+struct APIExecutionStats
+
+    # The number of API function executions
+    int calls
+
+    # The total number of statements executed
+    int statements
+
+    # The largest number of statements executed by an API function execution
+    int maxStatements
+
+    # The number of executions that exceeded the maximum statements
+    int statementLimits
+
+    # The number of executions that exceeded the timeout
+    int timeouts
+
+
+# An API's response cache statistics
+struct APICacheStats
+
+    # The number of cached responses returned
+    int hits
+
+    # The number of responses computed
+    int misses
+
+    # The number of cached responses
+    int entries
+
+    # The approximate size of the cached responses, in bytes
+    int bytes
+
+
+# An API's concurrency limit statistics
+struct APIConcurrencyStats
+
+    # The number of executing requests
+    int inFlight
+
+    # The number of requests waiting to execute
+    int queued
+
+    # The number of requests rejected because the queue was full
+    int rejected
+'''
 
 
 # File handle logging function
@@ -5,15 +5,28 @@
 The MarkdownUp backend application
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import importlib.resources
+import json
 import os
 from pathlib import PurePosixPath
 import threading
+import time
 import urllib.parse
 
+from bare_script import BareScriptParserError
 import chisel
 
-from .api import load_api_requests
+from .api import create_api_executor, load_api_requests
+from .bundle import bundle_script
+from .cache import DirectoryCache, ShardedLRUCache, stat_key, stat_key_is_dir, stat_key_is_file
+from .index import HTML_EXTS, MARKDOWN_EXTS, DirectoryIndex, markdown_up_index, markdown_up_tree
+from .preload import markdown_preload_urls, preload_link_header
+from .response import CONTENT_ENCODINGS, StaticResponse, accept_content_encoding, content_etag, is_compressible_content_type, \
+    static_content_type, stat_key_etag, stat_key_last_modified
+from .search import SearchIndex, markdown_up_search
+from .watch import create_file_watcher
 
 
 class MarkdownUpApplication(chisel.Application):
@@ -21,14 +34,89 @@ class MarkdownUpApplication(chisel.Application):
     The markdown-up backend API WSGI application class
     """
 
-    __slots__ = ('root', 'release', 'add_request_lock')
+    __slots__ = (
+        'root', 'release', 'static_cache', 'directory_cache', 'index_cache', 'not_found_cache', 'not_found_seconds',
+        'stream_bytes', 'compress_bytes', 'inline_bytes', 'bundle', 'preload_cache', 'hot_paths', 'hot_paths_lock', 'watcher',
+        'search_index', 'document_metadata', 'api_executor', 'private_paths'
+    )
 
 
     def __init__(self, root, config=None, api_config=None):
         super().__init__()
         self.root = root
         self.release = config.get('release', False) if config else False
-        self.add_request_lock = threading.Lock()
+
+        # Create the static response cache
+        cache_bytes = config.get('cacheBytes', DEFAULT_CACHE_BYTES) if config else DEFAULT_CACHE_BYTES
+        cache_entries = config.get('cacheEntries', DEFAULT_CACHE_ENTRIES) if config else DEFAULT_CACHE_ENTRIES
+        self.static_cache = ShardedLRUCache(cache_bytes, cache_entries) if cache_bytes > 0 and cache_entries > 0 else None
+
+        # Start the file system change watcher, if necessary - the watcher caches stat keys until their paths change
+        self.watcher = None
+        if config and config.get('watch'):
+            self.watcher = create_file_watcher(root, config.get('watchPollSeconds'))
+            self.watcher.start()
+
+        # Create the full-text search and document metadata index, if necessary - the index is built and refreshed on a
+        # background thread
+        self.search_index = None
+        self.document_metadata = None
+        private_paths = []
+        if config and (config.get('search') or config.get('metadata')):
+            database = config.get('searchDatabase')
+            database_path = os.path.abspath(database) if database is not None else None
+            if database_path is not None:
+                private_paths.extend(f'{database_path}{suffix}' for suffix in ('', '-journal', '-wal', '-shm'))
+            self.search_index = SearchIndex(
+                root,
+                database_path,
+                config.get('searchRefreshSeconds'),
+                text=config.get('search', False)
+            )
+            if config.get('metadata'):
+                self.document_metadata = self.search_index.metadata
+            if self.watcher is not None:
+                self.watcher.add_listener(self.search_index.changed)
+            self.search_index.start()
+
+        # Create the directory entry snapshot cache
+        self.directory_cache = DirectoryCache(DIRECTORY_CACHE_BYTES, DIRECTORY_CACHE_ENTRIES, self._stat_key)
+
+        # Create the file browser directory index cache
+        self.index_cache = ShardedLRUCache(INDEX_CACHE_BYTES, INDEX_CACHE_ENTRIES)
+
+        # Create the not-found cache
+        not_found_seconds = config.get('notFoundSeconds', DEFAULT_NOT_FOUND_SECONDS) if config else DEFAULT_NOT_FOUND_SECONDS
+        self.not_found_seconds = not_found_seconds
+        self.not_found_cache = ShardedLRUCache(NOT_FOUND_CACHE_BYTES, NOT_FOUND_CACHE_ENTRIES) if not_found_seconds > 0 else None
+
+        # The static path hit counts and last ETags, by path, for the hot-set manifest (None if not enabled)
+        self.hot_paths = {} if config and config.get('hotManifest') else None
+        self.hot_paths_lock = threading.Lock()
+        if self.hot_paths is not None:
+            manifest_path = os.path.abspath(config['hotManifest'])
+            private_paths.extend((manifest_path, f'{manifest_path}.tmp'))
+
+        # The hot-set manifest and search index database files (and their temporary and journal files) are never served
+        self.private_paths = frozenset(private_paths)
+
+        # Files at least this size are streamed rather than read into memory
+        self.stream_bytes = config.get('streamBytes', DEFAULT_STREAM_BYTES) if config else DEFAULT_STREAM_BYTES
+
+        # Text responses at least this size are compressed, if the client accepts it (None disables compression)
+        compress = config.get('compress', True) if config else True
+        compress_bytes = config.get('compressBytes', DEFAULT_COMPRESS_BYTES) if config else DEFAULT_COMPRESS_BYTES
+        self.compress_bytes = compress_bytes if compress else None
+
+        # Markdown files at most this size are embedded in their MarkdownUp HTML stubs (None disables inline stubs)
+        self.inline_bytes = config.get('inlineBytes') if config else None
+
+        # If true, BareScript files are served bundled with their local includes
+        self.bundle = config.get('bundle', False) if config else False
+
+        # The Markdown file preload Link header cache, by path (None if preload is not enabled)
+        preload = config.get('preload', False) if config else False
+        self.preload_cache = ShardedLRUCache(PRELOAD_CACHE_BYTES, PRELOAD_CACHE_ENTRIES) if preload else None
 
         # Release mode?
         if self.release:
@@ -48,14 +136,21 @@ class MarkdownUpApplication(chisel.Application):
 
             # Add the markdown-up APIs
             self.add_request(markdown_up_index)
+            self.add_request(markdown_up_tree)
 
             # Add the markdown-up statics
             self.add_static('index.html', content_type='text/html; charset=utf-8', urls=(('GET', '/'),))
             self.add_static('markdownUpIndex.bare')
 
+        # Add the search API
+        if self.search_index is not None and self.search_index.text:
+            self.add_request(markdown_up_search)
+
         # Add the backend APIs
+        self.api_executor = None
         if api_config:
-            self.add_requests(load_api_requests(root, config, api_config))
+            self.api_executor = create_api_executor(root, config, api_config)
+            self.add_requests(load_api_requests(root, config, api_config, self.api_executor))
 
 
     def add_static(self, filename, content_type=None, urls=(('GET', None),), doc_group='MarkdownUp File Browser'):
@@ -72,92 +167,574 @@ class MarkdownUpApplication(chisel.Application):
         if request is not None:
             return super().__call__(environ, start_response)
 
+        # Cached not-found response?
+        if self.not_found_cache is not None and self._is_cached_not_found(path_info):
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [] if request_method == 'HEAD' else [b'Not Found']
+
+        # Negotiate the content encoding - range requests are served with identity encoding
+        content_encoding = None
+        if self.compress_bytes is not None and request_method == 'GET' and 'HTTP_RANGE' not in environ:
+            content_encoding = accept_content_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+
+        # Cached static response? In non-release mode, revalidate the cached response with its validators' stat keys.
+        response = None
+        validators = None
+        if self.static_cache is not None:
+            for cache_key in ((path_info, content_encoding), path_info) if content_encoding is not None else (path_info,):
+                cache_entry = self.static_cache.get(cache_key)
+                if cache_entry is not None and \
+                   (self.release or all(self._stat_key(path) == key for path, key in cache_entry.validators)):
+                    response = cache_entry.response
+                    validators = cache_entry.validators
+                    break
+
+        # Create the static response
+        cache_key = None
+        if response is None:
+            cache_key = path_info
+            try:
+                response, validators = self._create_static_response(path_info)
+            except ValueError as exc:
+                ctx = chisel.Context(self, environ, start_response)
+                ctx.log.warning(str(exc))
+                response, validators = None, None
+                cache_key = None
+
+            # Not found?
+            if not response:
+                return self._not_found_response(environ, start_response, path_info, cache_key is not None)
+
+        # Bad method?
+        is_static = isinstance(response, StaticResponse)
+        if is_static and request_method != 'GET':
+            start_response('405 Method Not Allowed', [('Content-Type', 'text/plain; charset=utf-8')])
+            return [b'Method Not Allowed']
+
+        # Create the content-encoded response, if necessary
+        if is_static and response.encodable and response.content_encoding is None and content_encoding is not None:
+            encoded_response, encoded_validators = self._create_encoded_response(response, content_encoding)
+            if encoded_response is not None:
+                response = encoded_response
+                validators = validators + encoded_validators
+                cache_key = (path_info, content_encoding)
+
+        # Handle the request
+        content = response(environ, start_response)
+
+        # Count the static path request for the hot-set manifest
+        if is_static and self.hot_paths is not None and PREWARM_ENVIRON not in environ:
+            self._count_hot_path(path_info, response.etag)
+
+        # Cache the static response - not-modified and streamed static responses are not cached since their content was
+        # not read
+        if cache_key is not None and self.static_cache is not None and \
+           (not is_static or (response.content is not None and not response.stream)):
+            cache_size = len(path_info) + (len(response.content) if is_static else 0)
+            self.static_cache.set(cache_key, StaticCacheEntry(response, validators), cache_size)
+
+        return content
+
+
+    def prewarm(self, max_bytes=None, max_file_bytes=None, workers=None, path_infos=None):
+        """
+        Pre-warm the static response cache with the root directory tree's files, directory indexes, and Markdown stubs.
+        Files larger than max_file_bytes (default is 256KB) are skipped, and pre-warming stops once the cache holds
+        max_bytes (default is the cache size). If path_infos is provided, only those request paths are pre-warmed. Returns
+        the number of cached responses and their total size, in bytes.
+        """
+
+        if self.static_cache is None:
+            return 0, 0
+        if max_bytes is None:
+            max_bytes = self.static_cache.max_bytes
+        if path_infos is None:
+            path_infos = self._prewarm_path_infos(max_file_bytes if max_file_bytes is not None else DEFAULT_PREWARM_FILE_BYTES)
+
+        # Request the static paths (and their compressed variants)
+        environs = [{PREWARM_ENVIRON: True}]
+        if self.compress_bytes is not None:
+            environs.append({PREWARM_ENVIRON: True, 'HTTP_ACCEPT_ENCODING': CONTENT_ENCODINGS[0]})
+        def prewarm_path(path_info):
+            for environ in environs:
+                if self.static_cache.size >= max_bytes:
+                    break
+                content = self(chisel.Context.create_environ('GET', path_info, environ=dict(environ)), _prewarm_start_response)
+                if hasattr(content, 'close'):
+                    content.close()
+        with ThreadPoolExecutor(max_workers=workers or DEFAULT_PREWARM_WORKERS) as executor:
+            for _ in executor.map(prewarm_path, path_infos):
+                pass
+
+        return len(self.static_cache), self.static_cache.size
+
+
+    # Walk the root directory tree, collecting the static request paths to pre-warm. Directories are visited once so
+    # symbolic link cycles terminate.
+    def _prewarm_path_infos(self, max_file_bytes):
+        path_infos = []
+        try:
+            root_stat = os.stat(self.root)
+        except OSError:
+            return path_infos
+        visited = {(root_stat.st_dev, root_stat.st_ino)}
+        dir_stack = [(self.root, '/')]
+        while dir_stack:
+            dir_path, dir_path_info = dir_stack.pop()
+            path_infos.append(dir_path_info)
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in sorted(entries, key=lambda entry: entry.name):
+                        if entry.is_dir():
+                            entry_stat = entry.stat()
+                            dir_id = (entry_stat.st_dev, entry_stat.st_ino)
+                            if dir_id not in visited:
+                                visited.add(dir_id)
+                                dir_stack.append((entry.path, f'{dir_path_info}{entry.name}/'))
+                        elif entry.is_file():
+                            name_root, name_ext = os.path.splitext(entry.name)
+                            if name_ext in MARKDOWN_EXTS:
+                                path_infos.append(f'{dir_path_info}{name_root}{HTML_EXTS[0]}')
+                            if name_ext in chisel.StaticRequest.EXT_TO_CONTENT_TYPE and entry.stat().st_size <= max_file_bytes:
+                                path_infos.append(f'{dir_path_info}{entry.name}')
+            except OSError:
+                pass
+        return path_infos
+
+
+    def save_hot_manifest(self, manifest_path, max_entries=None):
+        """
+        Save the hot-set manifest - the most-requested static paths, their hit counts, and their last ETags - to a JSON
+        file. The file is replaced atomically. Returns the number of manifest entries saved.
+        """
+
+        with self.hot_paths_lock:
+            hot_paths = sorted((self.hot_paths or {}).items(), key=lambda item: (-item[1][0], item[0]))
+        if max_entries is not None:
+            hot_paths = hot_paths[:max_entries]
+        manifest = {'paths': [{'path': path_info, 'hits': hits, 'etag': etag} for path_info, (hits, etag) in hot_paths]}
+
+        manifest_path_tmp = f'{manifest_path}.tmp'
+        with open(manifest_path_tmp, 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, separators=(',', ':'))
+        os.replace(manifest_path_tmp, manifest_path)
+        return len(hot_paths)
+
+
+    def load_hot_manifest(self, manifest_path, max_entries=None):
+        """
+        Load a hot-set manifest file, seeding the hit counts. Returns the most-requested static paths, in order. If the
+        manifest file does not exist or is invalid, an empty list is returned.
+        """
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+            hot_paths = [(entry['path'], int(entry['hits']), entry.get('etag')) for entry in manifest['paths']]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return []
+        if max_entries is not None:
+            hot_paths = hot_paths[:max_entries]
+
+        # Seed the hit counts
+        if self.hot_paths is not None:
+            with self.hot_paths_lock:
+                for path_info, hits, etag in hot_paths:
+                    if path_info not in self.hot_paths and len(self.hot_paths) < HOT_PATHS_MAX:
+                        self.hot_paths[path_info] = (hits, etag)
+
+        return [path_info for path_info, _, _ in hot_paths]
+
+
+    # Count a static path request for the hot-set manifest
+    def _count_hot_path(self, path_info, etag):
+        with self.hot_paths_lock:
+            hot_path = self.hot_paths.get(path_info)
+            if hot_path is not None:
+                self.hot_paths[path_info] = (hot_path[0] + 1, etag)
+            elif len(self.hot_paths) < HOT_PATHS_MAX:
+                self.hot_paths[path_info] = (1, etag)
+
+
+    def close(self):
+        """
+        Stop the application's file system change watcher, search and metadata index, and API process pool, if any
+        """
+
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if self.search_index is not None:
+            self.search_index.stop()
+            self.search_index = None
+        if self.api_executor is not None:
+            self.api_executor.shutdown()
+            self.api_executor = None
+
+
+    def get_directory_index(self, path):
+        """
+        Get a directory's file browser index. The index is cached and revalidated by the directory's stat key. Returns None
+        if the path is not a directory.
+        """
+
+        # Cached, up-to-date index?
+        snapshot = self.directory_cache.get(path)
+        if snapshot is None:
+            return None
+        index = self.index_cache.get(path)
+        if index is not None and index.key == snapshot.key:
+            return index
+
+        # Create the index from the directory's entry snapshot
+        index = DirectoryIndex.create(snapshot)
+        self.index_cache.set(path, index, index.size)
+        return index
+
+
+    # Get a path's stat key - using the file system change watcher's cached stat keys, if available
+    def _stat_key(self, path):
+        watcher = self.watcher
+        if watcher is not None:
+            return watcher.stat_key(path)
+        return stat_key(path)
+
+
+    # Determine if a path is cached as not found. In release mode, the file system is not accessed within the cache
+    # entry's time-to-live. Otherwise, the entry is revalidated by its directory's stat key.
+    def _is_cached_not_found(self, path_info):
+        cache_entry = self.not_found_cache.get(path_info)
+        if cache_entry is None:
+            return False
+
+        # Expired? In non-release mode or with a file system change watcher (whose stat keys are cached), the entry is
+        # always revalidated.
+        now = time.monotonic()
+        if not self.release or self.watcher is not None or now >= cache_entry.expires:
+            if self._stat_key(cache_entry.path) != cache_entry.key:
+                self.not_found_cache.remove(path_info)
+                return False
+            cache_entry.expires = now + self.not_found_seconds
+
+        return True
+
+
+    # Chisel's not-found response helper - if cacheable, the path is cached if the response is not found (and not, for
+    # example, a bad method response)
+    def _not_found_response(self, environ, start_response, path_info, cacheable):
+        if self.not_found_cache is None or not cacheable:
+            return super().__call__(environ, start_response)
+
+        # The directory whose change invalidates the not-found path
+        path = os.path.join(self.root, *PurePosixPath(path_info).parts[1:])
+        dir_path = path if path_info.endswith('/') else os.path.dirname(path)
+        dir_key = self._stat_key(dir_path)
+
+        def not_found_start_response(status, response_headers, *args):
+            if status.startswith('404 '):
+                cache_entry = NotFoundCacheEntry(time.monotonic() + self.not_found_seconds, dir_path, dir_key)
+                self.not_found_cache.set(path_info, cache_entry, len(path_info) + len(dir_path))
+            return start_response(status, response_headers, *args)
+
+        return super().__call__(environ, not_found_start_response)
+
+
+    # Create a static response's content-encoded variant - returns the response (None if not available) and its additional
+    # validators
+    def _create_encoded_response(self, response, content_encoding):
+        # Pre-compressed gzip file?
+        if content_encoding == 'gzip' and response.path is not None:
+            gzip_path = response.path + '.gz'
+            gzip_key = self._stat_key(gzip_path)
+            if stat_key_is_file(gzip_key):
+                gzip_response = StaticResponse(
+                    response.content_type,
+                    stat_key_etag(gzip_key),
+                    stat_key_last_modified(gzip_key),
+                    path=gzip_path,
+                    stream=gzip_key[2] >= self.stream_bytes,
+                    encodable=True,
+                    content_encoding=content_encoding
+                )
+                return gzip_response, [(gzip_path, gzip_key)]
+            return response.encoded_response(content_encoding), [(gzip_path, gzip_key)]
+
+        return response.encoded_response(content_encoding), []
+
+
+    # Determine if a static response of a content type and size has content-encoded variants
+    def _is_encodable(self, content_type, content_size):
+        return self.compress_bytes is not None and content_size >= self.compress_bytes and \
+            is_compressible_content_type(content_type)
+
+
+    # Create a static response - returns the response (None if not found) and its validators, a list of path/stat-key
+    # tuples. File content is not read until the response is called. Index files and Markdown siblings are found using the
+    # directory cache's entry snapshots rather than probing the file system.
+    def _create_static_response(self, path_info):
         # Compute the static file path
-        posix_path_info = PurePosixPath(path_info)
-        path = os.path.join(self.root, *posix_path_info.parts[1:])
+        path = os.path.join(self.root, *PurePosixPath(path_info).parts[1:])
+        is_private = self.private_paths and os.path.abspath(path) in self.private_paths
+        path_key = self._stat_key(path) if not is_private else None
 
         # Directory path?
-        request = None
-        if os.path.isdir(path):
+        if stat_key_is_dir(path_key):
+            validators = [(path, path_key)]
+
             # Directory redirect?
             if not path_info.endswith('/'):
-                request = chisel.RedirectRequest(((None, path_info),), path_info + '/', name=path_info)
+                return chisel.RedirectRequest(((None, path_info),), path_info + '/', name=path_info), validators
 
             # HTML index file exist?
-            if request is None:
-                for index_file in HTML_INDEXES:
-                    index_posix_path = posix_path_info.joinpath(index_file)
-                    index_path = os.path.join(self.root, *index_posix_path.parts[1:])
-                    if os.path.isfile(index_path):
-                        with open(index_path, 'rb') as index_file:
-                            request = chisel.StaticRequest(
-                                path_info,
-                                index_file.read(),
-                                content_type='text/html; charset=utf-8',
-                                urls=(('GET', path_info),)
-                            )
-                        break
+            snapshot = self.directory_cache.get(path, path_key)
+            snapshot_files = snapshot.files if snapshot is not None else frozenset()
+            index_html = next((index_file for index_file in HTML_INDEXES if index_file in snapshot_files), None)
+            if index_html is not None:
+                index_path = os.path.join(path, index_html)
+                index_key = self._stat_key(index_path)
+                if stat_key_is_file(index_key):
+                    validators.append((index_path, index_key))
+                    response = StaticResponse(
+                        'text/html; charset=utf-8',
+                        stat_key_etag(index_key),
+                        stat_key_last_modified(index_key),
+                        path=index_path,
+                        stream=index_key[2] >= self.stream_bytes,
+                        encodable=self._is_encodable('text/html; charset=utf-8', index_key[2])
+                    )
+                    return response, validators
 
             # No HTML index file - does a Markdown index file exist?
-            if request is None:
-                for index_markdown in MARKDOWN_INDEXES:
-                    markdown_posix_path = posix_path_info.joinpath(index_markdown)
-                    markdown_path = os.path.join(self.root, *markdown_posix_path.parts[1:])
-                    if os.path.isfile(markdown_path):
-                        request = chisel.StaticRequest(
-                            path_info,
-                            create_markdown_up_stub(markdown_posix_path.name),
-                            content_type='text/html; charset=utf-8',
-                            urls=(('GET', path_info),)
-                        )
-                        break
+            index_markdown = next((index_file for index_file in MARKDOWN_INDEXES if index_file in snapshot_files), None)
+            if index_markdown is not None:
+                response, stub_validators = self._create_stub_response(path, index_markdown, path_key)
+                return response, validators + stub_validators
 
         # File path?
-        elif os.path.isfile(path):
-            try:
-                with open(path, 'rb') as path_file:
-                    request = chisel.StaticRequest(path_info, path_file.read(), urls=(('GET', path_info),))
-            except AssertionError as exc:
-                ctx = chisel.Context(self, environ, start_response)
-                ctx.log.warning(str(exc))
+        elif stat_key_is_file(path_key):
+            # Bundled BareScript file?
+            response, validators = None, None
+            if self.bundle and path_info.endswith(BARE_EXT):
+                response, validators = self._create_bundle_response(path, path_key)
+
+            if response is None:
+                content_type = static_content_type(path_info)
+                response = StaticResponse(
+                    content_type,
+                    stat_key_etag(path_key),
+                    stat_key_last_modified(path_key),
+                    path=path,
+                    stream=path_key[2] >= self.stream_bytes,
+                    encodable=self._is_encodable(content_type, path_key[2])
+                )
+                validators = [(path, path_key)]
+            return response, validators
 
         # Auto-generate MarkdownUp HTML stub?
-        elif posix_path_info.suffix == HTML_EXTS[0]:
-            for markdown_ext in MARKDOWN_EXTS:
-                markdown_posix_path = posix_path_info.with_suffix(markdown_ext)
-                markdown_path = os.path.join(self.root, *markdown_posix_path.parts[1:])
-                if os.path.isfile(markdown_path):
-                    request = chisel.StaticRequest(
-                        path_info,
-                        create_markdown_up_stub(markdown_posix_path.name),
-                        content_type='text/html; charset=utf-8',
-                        urls=(('GET', path_info),)
+        elif path_info.endswith(HTML_EXTS[0]):
+            parent_path, name = os.path.split(path)
+            parent_snapshot = self.directory_cache.get(parent_path)
+            if parent_snapshot is not None:
+                name_root = name[:-len(HTML_EXTS[0])]
+                markdown_names = (f'{name_root}{markdown_ext}' for markdown_ext in MARKDOWN_EXTS)
+                markdown_name = next(
+                    (markdown_name for markdown_name in markdown_names if markdown_name in parent_snapshot.files), None
+                )
+                if markdown_name is not None:
+                    response, stub_validators = self._create_stub_response(parent_path, markdown_name, parent_snapshot.key)
+                    return response, [(parent_path, parent_snapshot.key), *stub_validators]
+
+        return None, None
+
+
+    # Create a bundled BareScript static response - returns the response (None if the script can't be bundled) and its
+    # validators. The script's directory is a validator since new files may satisfy the script's includes.
+    def _create_bundle_response(self, path, path_key):
+        try:
+            script_text, script_paths = bundle_script(path)
+        except (OSError, UnicodeDecodeError, BareScriptParserError):
+            return None, None
+        dir_path = os.path.dirname(path)
+        validators = [(dir_path, self._stat_key(dir_path)), (path, path_key)]
+        validators.extend((script_path, self._stat_key(script_path)) for script_path in script_paths[1:])
+        content = script_text.encode('utf-8')
+        response = StaticResponse(
+            'text/plain; charset=utf-8',
+            content_etag(content),
+            max(stat_key_last_modified(key) for _, key in validators if key is not None),
+            content,
+            encodable=self._is_encodable('text/plain; charset=utf-8', len(content))
+        )
+        return response, validators
+
+
+    # Create a MarkdownUp HTML stub static response - returns the response and its additional validators. The stub's
+    # last-modified time is that of its directory. In inline mode, Markdown files up to the inline size are embedded in
+    # the stub. In preload mode, the stub has preload Link headers for its Markdown file's references.
+    def _create_stub_response(self, dir_path, markdown_name, directory_key):
+        stub_validators = []
+        markdown_path = os.path.join(dir_path, markdown_name)
+        markdown_key = None
+        if self.inline_bytes is not None or self.preload_cache is not None:
+            markdown_key = self._stat_key(markdown_path)
+            stub_validators.append((markdown_path, markdown_key))
+        preload_headers = self._preload_headers(markdown_path, markdown_key)
+
+        # Inline Markdown stub?
+        if self.inline_bytes is not None:
+            if stat_key_is_file(markdown_key) and markdown_key[2] <= self.inline_bytes:
+                try:
+                    with open(markdown_path, 'r', encoding='utf-8') as markdown_file:
+                        markdown_text = markdown_file.read()
+                except (OSError, UnicodeDecodeError):
+                    markdown_text = None
+                if markdown_text is not None:
+                    content = create_markdown_up_inline_stub(markdown_name, markdown_text)
+                    response = StaticResponse(
+                        'text/html; charset=utf-8',
+                        content_etag(content),
+                        max(stat_key_last_modified(directory_key), stat_key_last_modified(markdown_key)),
+                        content,
+                        encodable=self._is_encodable('text/html; charset=utf-8', len(content)),
+                        headers=preload_headers
                     )
-                    break
+                    return response, stub_validators
+
+        # The Markdown file is preloaded, too
+        if self.preload_cache is not None:
+            preload_headers = [('Link', preload_link_header(urllib.parse.quote(markdown_name), 'fetch')), *preload_headers]
+
+        content = create_markdown_up_stub(markdown_name)
+        response = StaticResponse(
+            'text/html; charset=utf-8',
+            markdown_up_stub_etag(markdown_name),
+            stat_key_last_modified(directory_key),
+            content,
+            encodable=self._is_encodable('text/html; charset=utf-8', len(content)),
+            headers=preload_headers
+        )
+        return response, stub_validators
+
+
+    # Get the preload Link headers for a Markdown file's references (images, includes, and fetched data). The headers are
+    # cached by the Markdown file's stat key.
+    def _preload_headers(self, markdown_path, markdown_key):
+        if self.preload_cache is None:
+            return ()
+
+        # Cached?
+        cache_entry = self.preload_cache.get(markdown_path)
+        if cache_entry is not None and cache_entry[0] == markdown_key:
+            return cache_entry[1]
+
+        # Read the Markdown file and analyze its references
+        markdown_text = None
+        if stat_key_is_file(markdown_key) and markdown_key[2] <= PRELOAD_MARKDOWN_BYTES:
+            try:
+                with open(markdown_path, 'r', encoding='utf-8') as markdown_file:
+                    markdown_text = markdown_file.read()
+            except (OSError, UnicodeDecodeError):
+                pass
+        preload_urls = markdown_preload_urls(markdown_text)[:PRELOAD_MAX_LINKS] if markdown_text is not None else []
+        preload_headers = [('Link', preload_link_header(url, destination)) for url, destination in preload_urls]
+        self.preload_cache.set(
+            markdown_path,
+            (markdown_key, preload_headers),
+            len(markdown_path) + sum(len(header) for _, header in preload_headers)
+        )
+        return preload_headers
+
+
+# The pre-warm request start_response function
+def _prewarm_start_response(_status, _response_headers, *_args):
+    pass
+
+
+class StaticCacheEntry:
+    """
+    A static response cache entry
+    """
 
-        # Not found?
-        if not request:
-            return super().__call__(environ, start_response)
+    __slots__ = ('response', 'validators')
 
-        # Add the request, if caching of statics is enabled
-        if self.release:
-            with self.add_request_lock:
-                request_lock, _ = self.match_request('GET', path_info)
-                if request_lock is None:
-                    self.add_request(request)
 
-        # Bad method?
-        if isinstance(request, chisel.StaticRequest) and request_method != 'GET':
-            start_response('405 Method Not Allowed', [('Content-Type', 'text/plain; charset=utf-8')])
-            return [b'Method Not Allowed']
+    def __init__(self, response, validators):
+        self.response = response
+        self.validators = validators
+
+
+class NotFoundCacheEntry:
+    """
+    A not-found cache entry
+    """
+
+    __slots__ = ('expires', 'path', 'key')
+
+
+    def __init__(self, expires, path, key):
+        self.expires = expires
+        self.path = path
+        self.key = key
+
+
+# The default static response cache size, in bytes, and maximum entry count
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_ENTRIES = 10000
+
+
+# The directory entry snapshot cache size, in bytes, and maximum entry count
+DIRECTORY_CACHE_BYTES = 16 * 1024 * 1024
+DIRECTORY_CACHE_ENTRIES = 10000
+
+
+# The directory index cache size, in bytes, and maximum entry count
+INDEX_CACHE_BYTES = 16 * 1024 * 1024
+INDEX_CACHE_ENTRIES = 1000
+
+
+# The default not-found cache time-to-live, in seconds
+DEFAULT_NOT_FOUND_SECONDS = 10
+
+
+# The not-found cache size, in bytes, and maximum entry count
+NOT_FOUND_CACHE_BYTES = 4 * 1024 * 1024
+NOT_FOUND_CACHE_ENTRIES = 10000
+
+
+# The default maximum size of pre-warmed files, in bytes, and the default number of pre-warm worker threads
+DEFAULT_PREWARM_FILE_BYTES = 256 * 1024
+DEFAULT_PREWARM_WORKERS = 8
 
-        # Handle the request
-        return request(environ, start_response)
 
+# The pre-warm request environ key - pre-warm requests are not counted in the hot-set manifest
+PREWARM_ENVIRON = 'markdown_up.prewarm'
 
-# Recognized HTML and Markdown extensions
-HTML_EXTS = ('.html', '.htm')
-MARKDOWN_EXTS = ('.md', '.markdown')
+
+# The maximum number of static paths counted for the hot-set manifest
+HOT_PATHS_MAX = 100000
+
+
+# The default minimum size of streamed files, in bytes
+DEFAULT_STREAM_BYTES = 1024 * 1024
+
+
+# The default minimum size of compressed responses, in bytes
+DEFAULT_COMPRESS_BYTES = 512
+
+
+# The BareScript file extension
+BARE_EXT = '.bare'
+
+
+# The preload Link header cache size, in bytes, and maximum entry count
+PRELOAD_CACHE_BYTES = 4 * 1024 * 1024
+PRELOAD_CACHE_ENTRIES = 10000
+
+
+# Markdown files larger than this, in bytes, are not analyzed for preload links. Stubs have at most this many preload
+# reference links.
+PRELOAD_MARKDOWN_BYTES = 1024 * 1024
+PRELOAD_MAX_LINKS = 32
 
 
 # Recognized HTML and Markdown index file names
@@ -165,9 +742,8 @@ HTML_INDEXES = ('index.html', 'index.htm')
 MARKDOWN_INDEXES = ('index.md', 'README.md')
 
 
-# Create a MarkdownUp HTML file (bytes)
-def create_markdown_up_stub(filename):
-    return f'''\
+# The MarkdownUp HTML file template, split at the Markdown URL
+MARKDOWN_UP_STUB_PREFIX = b'''\
 <!DOCTYPE html>
 <html lang="en">
     <head>
@@ -179,90 +755,52 @@ def create_markdown_up_stub(filename):
         <link rel="modulepreload" href="/markdown-up/lib/appImports.js" as="script">
     </head>
     <script type="module">
-        import {{MarkdownUp}} from '/markdown-up/lib/appImports.js';
-        const app = new MarkdownUp(window, {{
-            'url': '{urllib.parse.quote(filename)}'
-        }});
+        import {MarkdownUp} from '/markdown-up/lib/appImports.js';
+        const app = new MarkdownUp(window, {
+            'url': \''''
+MARKDOWN_UP_STUB_TEXT = b'''',
+            'markdownText': '''
+MARKDOWN_UP_STUB_SUFFIX = b'''
+        });
         app.run();
     </script>
 </html>
-'''.encode('utf-8')
-
-
-@chisel.action(spec='''\
-group "MarkdownUp File Browser"
-
-
-# The MarkdownUp file browser API
-action markdown_up_index
-    urls
-        GET
-
-    query
-        # The relative sub-directory path
-        optional string(len > 0) path
-
-    output
-        # The index path
-        string path
-
-        # The parent path
-        optional string parent
-
-        # The path's files
-        IndexFile[] files
-
-        # The path's sub-directories
-        string[] directories
-
-    errors
-        # The path is invalid
-        InvalidPath
-
-
-# An index file
-struct IndexFile
-
-    # The file name
-    string name
-
-    # The file's display name
-    optional string display
-''')
-def markdown_up_index(ctx, req):
-    # Validate the path
-    posix_path = PurePosixPath(req['path'] if 'path' in req else '')
-    if posix_path.is_absolute() or any(part == '..' for part in posix_path.parts):
-        raise chisel.ActionError('InvalidPath')
-
-    # Verify that the path exists
-    path = os.path.join(ctx.app.root, *posix_path.parts)
-    if not os.path.isdir(path):
-        raise chisel.ActionError('InvalidPath')
-
-    # Compute parent path
-    parent_path = str(posix_path.parent) if 'path' in req else None
-
-    # Get the list of files and sub-directories from the current sub-directory
-    files = []
-    directories = []
-    for entry in os.scandir(path):
-        if entry.is_file():
-            # Markdown files are viewed using their generated MarkdownUp HTML stubs
-            name_root, name_ext = os.path.splitext(entry.name)
-            if name_ext in MARKDOWN_EXTS:
-                files.append({'name': f'{name_root}{HTML_EXTS[0]}', 'display': entry.name})
-            elif name_ext in HTML_EXTS:
-                files.append({'name': entry.name})
-        elif entry.is_dir(): # pragma: no branch
-            directories.append(entry.name)
-
-    # Return the response
-    response = {
-        'path': path,
-        'files': sorted(files, key=lambda file_: file_.get('display', file_['name'])),
-        'directories': sorted(directories)
-    }
-    if parent_path is not None and parent_path != '.':
-        response['parent'] = parent_path
-    return response
+'''
+
+
+# The maximum number of memoized MarkdownUp HTML files
+MARKDOWN_UP_STUB_CACHE_SIZE = 4096
+
+
+# Create a MarkdownUp HTML file (bytes) - the file is memoized, so the same bytes object is returned for a filename
+@functools.lru_cache(maxsize=MARKDOWN_UP_STUB_CACHE_SIZE)
+def create_markdown_up_stub(filename):
+    return b''.join((MARKDOWN_UP_STUB_PREFIX, urllib.parse.quote(filename).encode('utf-8'), b"'", MARKDOWN_UP_STUB_SUFFIX))
+
+
+# Create a MarkdownUp HTML file with inline Markdown text (bytes). The Markdown text is embedded as a JSON string with its
+# HTML-significant and JavaScript line terminator characters escaped.
+def create_markdown_up_inline_stub(filename, markdown_text):
+    markdown_json = json.dumps(markdown_text, ensure_ascii=False).translate(_INLINE_STUB_ESCAPES)
+    return b''.join((
+        MARKDOWN_UP_STUB_PREFIX,
+        urllib.parse.quote(filename).encode('utf-8'),
+        MARKDOWN_UP_STUB_TEXT,
+        markdown_json.encode('utf-8'),
+        MARKDOWN_UP_STUB_SUFFIX
+    ))
+
+
+_INLINE_STUB_ESCAPES = str.maketrans({
+    '<': '\\u003c',
+    '>': '\\u003e',
+    '&': '\\u0026',
+    '\u2028': '\\u2028',
+    '\u2029': '\\u2029'
+})
+
+
+# Compute a MarkdownUp HTML file's ETag (memoized)
+@functools.lru_cache(maxsize=MARKDOWN_UP_STUB_CACHE_SIZE)
+def markdown_up_stub_etag(filename):
+    return content_etag(create_markdown_up_stub(filename))
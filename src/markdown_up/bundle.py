@@ -0,0 +1,122 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+"""
+MarkdownUp BareScript include bundling
+"""
+
+import os
+import re
+
+from bare_script import barescript_parse_script
+
+
+def bundle_script(script_path):
+    """
+    Bundle a BareScript file with its local includes. Local includes of files in the script's directory are inlined, in
+    order, and each file is included once. Files whose top-level statements return, or whose top-level labels clash with
+    the bundle's, are not inlined since inlining would change their behavior. System includes are hoisted to the top of
+    the bundle so the browser fetches them together. Other includes are left as-is.
+
+    Returns the bundled script text and the list of bundled file paths, starting with the script's path. Raises OSError,
+    UnicodeDecodeError, or bare_script.BareScriptParserError if a file can't be read or parsed.
+    """
+
+    dir_path = os.path.dirname(script_path)
+    system_includes = []
+    script_paths = [script_path]
+    script = _parse_script_file(script_path)
+    bundle_labels = _script_labels(script)[0]
+    script_lines = _bundle_lines(dir_path, script, system_includes, script_paths, bundle_labels)
+    include_lines = [f'include <{system_url}>' for system_url in system_includes]
+    return '\n'.join(include_lines + script_lines), script_paths
+
+
+# Helper to read and parse a BareScript file
+def _parse_script_file(script_path):
+    with open(script_path, 'r', encoding='utf-8') as script_file:
+        return barescript_parse_script(script_file.read())
+
+
+# Helper to get a parsed BareScript's top-level label names (labels and jump targets) and whether it has a top-level
+# return statement. The parser's generated labels are ignored since they're renumbered when the bundle is parsed.
+def _script_labels(script):
+    labels = set()
+    has_return = False
+    for statement in script['statements']:
+        if 'return' in statement:
+            has_return = True
+        elif 'label' in statement:
+            labels.add(statement['label']['name'])
+        elif 'jump' in statement:
+            labels.add(statement['jump']['label'])
+    return {label for label in labels if not label.startswith('__barescript')}, has_return
+
+
+# Helper to bundle a parsed BareScript file's lines
+def _bundle_lines(dir_path, script, system_includes, script_paths, bundle_labels):
+    lines = script['scriptLines']
+
+    # Replace the top-level include statements
+    bundle_lines = []
+    ix_line = 0
+    for statement in script['statements']:
+        include = statement.get('include')
+        if include is None:
+            continue
+
+        # Add the lines preceding the include statement
+        ix_include = include['lineNumber'] - 1
+        bundle_lines.extend(lines[ix_line:ix_include])
+        ix_line = ix_include + include.get('lineCount', 1)
+
+        # Replace the include statement's lines - comment and blank lines are kept
+        includes = iter(include['includes'])
+        for line in lines[ix_include:ix_line]:
+            if not line.lstrip().startswith('include'):
+                bundle_lines.append(line)
+                continue
+            include_url = next(includes)
+            url = include_url['url']
+
+            # System include?
+            if include_url.get('system'):
+                if url not in system_includes:
+                    system_includes.append(url)
+                continue
+
+            # Local include that can't be inlined?
+            include_path = _local_include_path(dir_path, url)
+            if include_path is None:
+                bundle_lines.append(line)
+                continue
+
+            # Inline the local include, if not already included - includes that return or whose labels clash with the
+            # bundle's are left as-is
+            if include_path not in script_paths:
+                include_script = _parse_script_file(include_path)
+                include_labels, include_return = _script_labels(include_script)
+                if include_return or not include_labels.isdisjoint(bundle_labels):
+                    bundle_lines.append(line)
+                    continue
+                bundle_labels.update(include_labels)
+                script_paths.append(include_path)
+                bundle_lines.extend(_bundle_lines(dir_path, include_script, system_includes, script_paths, bundle_labels))
+
+    # Add the remaining lines
+    bundle_lines.extend(lines[ix_line:])
+    return bundle_lines
+
+
+# Get a local include's file path - None if the include is not a file in the script's directory. Includes in other
+# directories are not inlined since relative URLs in included scripts are relative to the include.
+def _local_include_path(dir_path, url):
+    if not _RE_LOCAL_INCLUDE_URL.fullmatch(url) or url in ('.', '..'):
+        return None
+    include_path = os.path.join(dir_path, url)
+    if not os.path.isfile(include_path):
+        return None
+    return include_path
+
+
+_RE_LOCAL_INCLUDE_URL = re.compile(r'[^/\\:?#]+')
@@ -0,0 +1,237 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+"""
+MarkdownUp backend caching support
+"""
+
+from collections import OrderedDict
+import os
+import stat
+import threading
+
+
+class LRUCache:
+    """
+    A thread-safe, byte-budgeted least-recently-used cache with an optional maximum entry count
+    """
+
+    __slots__ = ('max_bytes', 'max_entries', 'size', 'entries', 'lock')
+
+
+    def __init__(self, max_bytes, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            self.entries.move_to_end(key)
+            return item[0]
+
+
+    def set(self, key, value, size):
+        # Too large to cache?
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            # Replace the existing value, if any
+            item = self.entries.pop(key, None)
+            if item is not None:
+                self.size -= item[1]
+            self.entries[key] = (value, size)
+            self.size += size
+
+            # Evict least-recently-used values until we're within budget
+            while self.size > self.max_bytes or (self.max_entries is not None and len(self.entries) > self.max_entries):
+                _, (_, evict_size) = self.entries.popitem(last=False)
+                self.size -= evict_size
+
+
+    def remove(self, key):
+        with self.lock:
+            item = self.entries.pop(key, None)
+            if item is not None:
+                self.size -= item[1]
+
+
+    def evict(self):
+        """
+        Evict the least-recently-used value. Returns False if the cache is empty.
+        """
+
+        with self.lock:
+            if not self.entries:
+                return False
+            _, (_, evict_size) = self.entries.popitem(last=False)
+            self.size -= evict_size
+            return True
+
+
+class ShardedLRUCache:
+    """
+    A byte-budgeted least-recently-used cache partitioned into independently-locked shards. The byte budget applies to
+    all shards, so any value up to the total budget is cached. The maximum entry count is divided among the shards.
+    """
+
+    __slots__ = ('max_bytes', 'max_entries', 'shards', 'evict_lock')
+
+
+    def __init__(self, max_bytes, max_entries=None, shard_count=16):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        shard_entries = max(1, max_entries // shard_count) if max_entries is not None else None
+        self.shards = tuple(LRUCache(max_bytes, shard_entries) for _ in range(shard_count))
+        self.evict_lock = threading.Lock()
+
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+
+    @property
+    def size(self):
+        return sum(shard.size for shard in self.shards)
+
+
+    def shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+
+    def get(self, key):
+        return self.shard(key).get(key)
+
+
+    def set(self, key, value, size):
+        # Too large to cache?
+        if size > self.max_bytes:
+            return
+
+        ix_shard = hash(key) % len(self.shards)
+        self.shards[ix_shard].set(key, value, size)
+
+        # Within budget? Sets only take the eviction lock if the budget is exceeded.
+        if self.size <= self.max_bytes:
+            return
+
+        # Evict the other shards' least-recently-used values, in turn, until we're within budget. The new value's shard is
+        # evicted from only when the other shards are empty.
+        with self.evict_lock:
+            ix_evict = ix_shard
+            evicted = False
+            while self.size > self.max_bytes:
+                ix_evict = (ix_evict + 1) % len(self.shards)
+                if ix_evict != ix_shard:
+                    evicted = self.shards[ix_evict].evict() or evicted
+                else:
+                    if not evicted:
+                        self.shards[ix_shard].evict()
+                    evicted = False
+
+
+    def remove(self, key):
+        self.shard(key).remove(key)
+
+
+class DirectoryCache:
+    """
+    A cache of directory entry snapshots, revalidated by the directory's stat key
+    """
+
+    __slots__ = ('snapshots', 'stat_fn')
+
+
+    def __init__(self, max_bytes, max_entries=None, stat_fn=None):
+        self.snapshots = ShardedLRUCache(max_bytes, max_entries)
+        self.stat_fn = stat_fn if stat_fn is not None else stat_key
+
+
+    def get(self, path, key=None):
+        """
+        Get a directory's entry snapshot. If the directory's stat key is not provided, the directory is stat-ed. Returns
+        None if the path is not a directory.
+        """
+
+        if key is None:
+            key = self.stat_fn(path)
+        if not stat_key_is_dir(key):
+            return None
+
+        # Cached, up-to-date snapshot?
+        snapshot = self.snapshots.get(path)
+        if snapshot is not None and snapshot.key == key:
+            return snapshot
+
+        # Scan the directory
+        snapshot = DirectorySnapshot.scan(path, key)
+        if snapshot is not None:
+            self.snapshots.set(path, snapshot, snapshot.size)
+        return snapshot
+
+
+class DirectorySnapshot:
+    """
+    A directory's file and sub-directory name sets at the time of the directory's stat key
+    """
+
+    __slots__ = ('key', 'files', 'directories', 'size')
+
+
+    def __init__(self, key, files, directories):
+        self.key = key
+        self.files = files
+        self.directories = directories
+        self.size = sum(len(name) for name in files) + sum(len(name) for name in directories) + DIRECTORY_SNAPSHOT_SIZE
+
+
+    @classmethod
+    def scan(cls, path, key):
+        """
+        Scan a directory's entries. Returns None if the directory does not exist.
+        """
+
+        files = set()
+        directories = set()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files.add(entry.name)
+                    elif entry.is_dir():
+                        directories.add(entry.name)
+        except OSError:
+            return None
+        return cls(key, frozenset(files), frozenset(directories))
+
+
+# The approximate fixed size of a directory snapshot, in bytes
+DIRECTORY_SNAPSHOT_SIZE = 256
+
+
+# Get a path's stat validator key (file type, modified time, size, inode, and device) - None if the path does not exist
+def stat_key(path):
+    try:
+        path_stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return (stat.S_IFMT(path_stat.st_mode), path_stat.st_mtime_ns, path_stat.st_size, path_stat.st_ino, path_stat.st_dev)
+
+
+# Stat validator key helpers
+def stat_key_is_dir(key):
+    return key is not None and key[0] == stat.S_IFDIR
+
+
+def stat_key_is_file(key):
+    return key is not None and key[0] == stat.S_IFREG
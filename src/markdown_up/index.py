@@ -0,0 +1,348 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+"""
+The MarkdownUp file browser index APIs
+"""
+
+import bisect
+from collections import deque
+from datetime import datetime, timezone
+import os
+from pathlib import PurePosixPath
+import sys
+
+import chisel
+
+
+class DirectoryIndex:
+    """
+    A directory's file browser index - the sorted index file and sub-directory lists, in markdown_up_index output form.
+    The lists are shared by all responses and must not be modified.
+    """
+
+    __slots__ = ('key', 'files', 'file_names', 'directories', 'size')
+
+
+    def __init__(self, key, files, directories):
+        self.key = key
+        self.files = files
+        self.file_names = [file_.get('display', file_['name']) for file_ in files]
+        self.directories = directories
+        self.size = sum(len(name) for name in directories) + DIRECTORY_INDEX_SIZE + \
+            sum(len(file_['name']) + len(file_.get('display', '')) + DIRECTORY_INDEX_FILE_SIZE for file_ in files)
+
+
+    @classmethod
+    def create(cls, snapshot):
+        """
+        Create a directory's index from its entry snapshot
+        """
+
+        files = []
+        for name in snapshot.files:
+            # Markdown files are viewed using their generated MarkdownUp HTML stubs
+            name_root, name_ext = os.path.splitext(name)
+            if name_ext in MARKDOWN_EXTS:
+                files.append({'name': f'{name_root}{HTML_EXTS[0]}', 'display': name})
+            elif name_ext in HTML_EXTS:
+                files.append({'name': name})
+        files.sort(key=lambda file_: file_.get('display', file_['name']))
+        return cls(snapshot.key, files, sorted(snapshot.directories))
+
+
+    def page(self, prefix=None, offset=0, limit=None):
+        """
+        Get a page of the index's files and sub-directories whose (display) names start with the prefix. The offset and
+        limit apply to the files and sub-directories separately. Returns the files page, the matching file count, the
+        sub-directories page, and the matching sub-directory count.
+        """
+
+        files_start, files_end = _prefix_range(self.file_names, prefix)
+        directories_start, directories_end = _prefix_range(self.directories, prefix)
+        files_page_end = files_end if limit is None else min(files_end, files_start + offset + limit)
+        directories_page_end = directories_end if limit is None else min(directories_end, directories_start + offset + limit)
+        return (
+            self.files[files_start + offset:files_page_end],
+            files_end - files_start,
+            self.directories[directories_start + offset:directories_page_end],
+            directories_end - directories_start
+        )
+
+
+# Get the index range of the sorted names that start with a prefix. The names that start with the prefix sort before the
+# prefix with its last character incremented.
+def _prefix_range(names, prefix):
+    if prefix is None:
+        return 0, len(names)
+    start = bisect.bisect_left(names, prefix)
+    prefix_end = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix_end:
+        return start, len(names)
+    return start, bisect.bisect_left(names, prefix_end[:-1] + chr(ord(prefix_end[-1]) + 1), start)
+
+
+# Helper to add the Markdown files' metadata to a list of index files - the shared index files are copied
+def _index_files_metadata(files, dir_posix, metadata, outline=False):
+    if metadata is None:
+        return files
+    files_metadata = []
+    for file_ in files:
+        display = file_.get('display')
+        document = metadata.get(f'{dir_posix}/{display}' if dir_posix else display) if display is not None else None
+        if document is None:
+            files_metadata.append(file_)
+            continue
+        file_metadata = dict(file_)
+        if document.title is not None:
+            file_metadata['title'] = document.title
+        file_metadata['size'] = document.size
+        file_metadata['modified'] = datetime.fromtimestamp(document.mtime / 1e9, timezone.utc)
+        if outline:
+            file_metadata['outline'] = [{'level': level, 'text': text} for level, text in document.outline]
+        files_metadata.append(file_metadata)
+    return files_metadata
+
+
+# Recognized HTML and Markdown extensions
+HTML_EXTS = ('.html', '.htm')
+MARKDOWN_EXTS = ('.md', '.markdown')
+
+
+# The approximate fixed sizes of a directory index and of an index file, in bytes
+DIRECTORY_INDEX_SIZE = 256
+DIRECTORY_INDEX_FILE_SIZE = 128
+
+
+# The maximum number of directories in a markdown_up_tree response
+TREE_MAX_DIRECTORIES = 10000
+
+
+# The file browser APIs' shared index file types
+_INDEX_FILE_SPEC = '''\
+# An index file
+struct IndexFile
+
+    # The file name
+    string name
+
+    # The file's display name
+    optional string display
+
+    # The Markdown file's title - its front matter title or first heading. Markdown file metadata is returned only if the
+    # metadata index is enabled and the file has been indexed.
+    optional string title
+
+    # The Markdown file's size, in bytes
+    optional int size
+
+    # The Markdown file's modified time
+    optional datetime modified
+
+    # The Markdown file's headings
+    optional IndexHeading[] outline
+
+
+# A Markdown file heading
+struct IndexHeading
+
+    # The heading level, from 1 to 6
+    int level
+
+    # The heading text
+    string text
+'''
+
+
+@chisel.action(spec='''\
+group "MarkdownUp File Browser"
+
+
+# The MarkdownUp file browser API
+action markdown_up_index
+    urls
+        GET
+
+    query
+        # The relative sub-directory path
+        optional string(len > 0) path
+
+        # If provided, only files and sub-directories whose names (or display names) start with the prefix are returned
+        optional string(len > 0) prefix
+
+        # The index of the first file and sub-directory returned. The offset and limit apply to the files and
+        # sub-directories separately.
+        optional int(>= 0) offset
+
+        # The maximum number of files and sub-directories returned. Default is all.
+        optional int(>= 1) limit
+
+        # If true, the Markdown files' heading outlines are returned
+        optional bool outline
+
+    output
+        # The index path
+        string path
+
+        # The parent path
+        optional string parent
+
+        # The path's files
+        IndexFile[] files
+
+        # The path's sub-directories
+        string[] directories
+
+        # The total number of files matching the prefix
+        int fileCount
+
+        # The total number of sub-directories matching the prefix
+        int directoryCount
+
+    errors
+        # The path is invalid
+        InvalidPath
+
+
+''' + _INDEX_FILE_SPEC)
+def markdown_up_index(ctx, req):
+    # Validate the path
+    posix_path = PurePosixPath(req['path'] if 'path' in req else '')
+    if posix_path.is_absolute() or any(part == '..' for part in posix_path.parts):
+        raise chisel.ActionError('InvalidPath')
+
+    # Get the directory's index
+    path = os.path.join(ctx.app.root, *posix_path.parts)
+    index = ctx.app.get_directory_index(path)
+    if index is None:
+        raise chisel.ActionError('InvalidPath')
+
+    # Compute parent path
+    parent_path = str(posix_path.parent) if 'path' in req else None
+
+    # Get the requested page of the index
+    files, file_count, directories, directory_count = index.page(req.get('prefix'), req.get('offset', 0), req.get('limit'))
+
+    # Return the response
+    response = {
+        'path': path,
+        'files': _index_files_metadata(files, '/'.join(posix_path.parts), ctx.app.document_metadata, req.get('outline', False)),
+        'directories': directories,
+        'fileCount': file_count,
+        'directoryCount': directory_count
+    }
+    if parent_path is not None and parent_path != '.':
+        response['parent'] = parent_path
+    return response
+
+
+@chisel.action(spec='''\
+group "MarkdownUp File Browser"
+
+
+# The MarkdownUp file browser tree API - a directory's files and sub-directories, recursively
+action markdown_up_tree
+    urls
+        GET
+
+    query
+        # The relative sub-directory path
+        optional string(len > 0) path
+
+        # The maximum sub-directory depth - zero returns only the directory's files. Default is unlimited.
+        optional int(>= 0) depth
+
+        # If true, only Markdown files are returned
+        optional bool markdown
+
+    output
+        # The tree path
+        string path
+
+        # The tree's root directory
+        IndexDirectory tree
+
+        # If true, the tree has more than the maximum number of directories and some sub-directories were omitted
+        optional bool truncated
+
+    errors
+        # The path is invalid
+        InvalidPath
+
+
+# An index directory
+struct IndexDirectory
+
+    # The directory's relative path (omitted for the root)
+    optional string path
+
+    # The directory's files
+    IndexFile[] files
+
+    # The directory's sub-directories
+    IndexDirectory[] directories
+
+    # If true, the directory has sub-directories beyond the maximum depth
+    optional bool more
+
+
+''' + _INDEX_FILE_SPEC)
+def markdown_up_tree(ctx, req):
+    # Validate the path
+    posix_path = PurePosixPath(req['path'] if 'path' in req else '')
+    if posix_path.is_absolute() or any(part == '..' for part in posix_path.parts):
+        raise chisel.ActionError('InvalidPath')
+
+    # Get the directory's index
+    path = os.path.join(ctx.app.root, *posix_path.parts)
+    index = ctx.app.get_directory_index(path)
+    if index is None:
+        raise chisel.ActionError('InvalidPath')
+
+    # Walk the tree breadth-first using the cached directory indexes. Directories, by inode and device, are visited once so
+    # symbolic link cycles terminate.
+    depth = req.get('depth')
+    markdown = req.get('markdown', False)
+    tree = {}
+    truncated = False
+    visited = {index.key[3:5]}
+    directory_queue = deque([(tree, path, str(posix_path) if 'path' in req else None, index, 0)])
+    directory_count = 1
+    while directory_queue:
+        node, dir_path, dir_posix, dir_index, dir_depth = directory_queue.popleft()
+        if dir_posix is not None:
+            node['path'] = dir_posix
+        files = [file_ for file_ in dir_index.files if 'display' in file_] if markdown else dir_index.files
+        node['files'] = _index_files_metadata(files, dir_posix, ctx.app.document_metadata)
+        node['directories'] = []
+
+        # Depth limit?
+        if depth is not None and dir_depth >= depth:
+            if dir_index.directories:
+                node['more'] = True
+            continue
+
+        # Add the sub-directories
+        for directory in dir_index.directories:
+            sub_path = os.path.join(dir_path, directory)
+            sub_index = ctx.app.get_directory_index(sub_path)
+            if sub_index is None or sub_index.key[3:5] in visited:
+                continue
+            if directory_count >= TREE_MAX_DIRECTORIES:
+                truncated = True
+                break
+            directory_count += 1
+            visited.add(sub_index.key[3:5])
+            sub_node = {}
+            node['directories'].append(sub_node)
+            sub_posix = f'{dir_posix}/{directory}' if dir_posix is not None else directory
+            directory_queue.append((sub_node, sub_path, sub_posix, sub_index, dir_depth + 1))
+
+    # Return the response
+    response = {
+        'path': path,
+        'tree': tree
+    }
+    if truncated:
+        response['truncated'] = True
+    return response
@@ -11,12 +11,14 @@ import json
 import os
 import sys
 import threading
+import time
 import webbrowser
 
 from bare_script.include import schema_parse, schema_validate
 import waitress
 
 from .app import HTML_EXTS, MARKDOWN_EXTS, MarkdownUpApplication
+from .search import search_fts5_available
 
 
 def main(argv=None):
@@ -38,7 +40,7 @@ def main(argv=None):
     parser.add_argument('-n', '--no-browser', action='store_true',
                         help="don't open a web browser")
     parser.add_argument('-r', '--release', action='store_true', default=None,
-                        help="release mode (cache statics, remove documentation and index)")
+                        help="release mode (don't revalidate statics, remove documentation and index)")
     parser.add_argument('-q', '--quiet', action='store_true',
                         help="hide access logging")
     parser.add_argument('-d', '--debug', action='store_true', default=None,
@@ -111,16 +113,71 @@ def main(argv=None):
         webbrowser_thread.daemon = True
         webbrowser_thread.start()
 
+    # Full-text search requires SQLite FTS5
+    if config.get('search') and not search_fts5_available():
+        print('markdown-up: SQLite FTS5 is not available - search is disabled', file=sys.stderr)
+        config['search'] = False
+
     # Create the WSGI application
     wsgiapp = MarkdownUpApplication(root, config, api_config)
     wsgiapp_wrap = wsgiapp if args.quiet else partial(_wsgiapp_log_access, wsgiapp)
 
+    # Pre-warm the static response cache on a thread so the server can startup immediately
+    if config.get('prewarm'):
+        prewarm_thread = threading.Thread(target=_prewarm, args=(wsgiapp, config, args.quiet))
+        prewarm_thread.daemon = True
+        prewarm_thread.start()
+
+    # Pre-warm the static response cache from the hot-set manifest and periodically save the manifest
+    if config.get('hotManifest'):
+        hot_manifest_thread = threading.Thread(target=_hot_manifest, args=(wsgiapp, config, args.quiet))
+        hot_manifest_thread.daemon = True
+        hot_manifest_thread.start()
+
     # Host the application
     if not args.quiet:
         print(f'markdown-up: Serving at {url} ...')
     waitress.serve(wsgiapp_wrap, port=args.port, threads=config['threads'])
 
 
+# Pre-warm the WSGI application's static response cache
+def _prewarm(wsgiapp, config, quiet, path_infos=None):
+    start_time = time.monotonic()
+    response_count, response_bytes = wsgiapp.prewarm(
+        config.get('prewarmBytes'), config.get('prewarmFileBytes'), workers=config['threads'], path_infos=path_infos
+    )
+    if not quiet:
+        print(
+            f'markdown-up: Pre-warmed {response_count} static responses ({response_bytes} bytes) '
+            f'in {time.monotonic() - start_time:.3f} seconds'
+        )
+
+
+# Pre-warm the WSGI application's static response cache from the hot-set manifest, then periodically save the manifest
+def _hot_manifest(wsgiapp, config, quiet):
+    manifest_path = os.path.abspath(config['hotManifest'])
+    manifest_entries = config.get('hotManifestEntries', DEFAULT_HOT_MANIFEST_ENTRIES)
+    manifest_seconds = config.get('hotManifestSeconds', DEFAULT_HOT_MANIFEST_SECONDS)
+
+    # Pre-warm the manifest's static paths
+    path_infos = wsgiapp.load_hot_manifest(manifest_path, manifest_entries)
+    if path_infos:
+        _prewarm(wsgiapp, config, quiet, path_infos)
+
+    # Periodically save the manifest
+    while True:
+        time.sleep(manifest_seconds)
+        try:
+            wsgiapp.save_hot_manifest(manifest_path, manifest_entries)
+        except OSError as exc:
+            print(f'markdown-up: Failed to save hot-set manifest "{manifest_path}": {exc}', file=sys.stderr)
+
+
+# The hot-set manifest defaults - the maximum entry count and the save period, in seconds
+DEFAULT_HOT_MANIFEST_ENTRIES = 1000
+DEFAULT_HOT_MANIFEST_SECONDS = 60
+
+
 # WSGI application wrapper and the start_response function so we can log status and environ
 def _wsgiapp_log_access(wsgiapp, environ, start_response):
     def log_start_response(status, response_headers):
@@ -147,6 +204,80 @@ struct MarkdownUpConfig
     # The number of backend server threads. Default is 8.
     optional int threads
 
+    # The static response cache size, in bytes. Zero disables the cache. Default is 64MB.
+    optional int(>= 0) cacheBytes
+
+    # The static response cache's maximum entry count. Zero disables the cache. Default is 10000.
+    optional int(>= 0) cacheEntries
+
+    # If true, pre-warm the static response cache on startup. Default is false.
+    optional bool prewarm
+
+    # The maximum total size of pre-warmed static responses, in bytes. Default is the cache size.
+    optional int(>= 0) prewarmBytes
+
+    # The maximum size of pre-warmed files, in bytes. Default is 256KB.
+    optional int(>= 0) prewarmFileBytes
+
+    # The hot-set manifest file path, relative to the current working directory. If provided, the most-requested static
+    # paths are periodically saved and, on startup, pre-warmed. The manifest file is never served.
+    optional string(len > 0) hotManifest
+
+    # The hot-set manifest's maximum entry count. Default is 1000.
+    optional int(> 0) hotManifestEntries
+
+    # The hot-set manifest's save period, in seconds. Default is 60.
+    optional int(> 0) hotManifestSeconds
+
+    # If true, watch the file system for changes so statics are revalidated without stat-ing. Default is false.
+    optional bool watch
+
+    # The file system change watcher's polling period, in seconds, if the platform has no change notifications.
+    # Default is 1.
+    optional float(> 0) watchPollSeconds
+
+    # If provided, Markdown files at most this size, in bytes, are embedded in their MarkdownUp HTML stubs so the browser
+    # doesn't request them separately. Default is no inline Markdown.
+    optional int(>= 0) inlineBytes
+
+    # If true, BareScript files are served with their local includes inlined and their system includes hoisted, so the
+    # browser doesn't fetch the includes one after another. Default is false.
+    optional bool bundle
+
+    # If true, MarkdownUp HTML stubs are served with preload Link headers for their Markdown file and the images, includes,
+    # and fetched data it references, so the browser fetches them in parallel. Default is false.
+    optional bool preload
+
+    # If true, the Markdown files are indexed for the full-text search API. The index is built on a background thread at
+    # startup and refreshed as files change. Requires SQLite FTS5. Default is false.
+    optional bool search
+
+    # If true, the Markdown files' titles, sizes, modified times, and heading outlines are indexed and returned by the file
+    # browser APIs. The index is built on a background thread at startup and refreshed as files change. Default is false.
+    optional bool metadata
+
+    # If provided, the search and metadata index database file path, relative to the current working directory. A
+    # persistent index is only updated with changed files at startup. The database files are never served. Default is an
+    # in-memory index.
+    optional string(len > 0) searchDatabase
+
+    # The search and metadata index refresh period, in seconds. With the file system change watcher, the index is also
+    # refreshed when files change. Default is 60.
+    optional float(> 0) searchRefreshSeconds
+
+    # The not-found cache's time-to-live, in seconds. In non-release mode, cached not-found paths are always revalidated
+    # by their directory's stat key. Zero disables the cache. Default is 10.
+    optional int(>= 0) notFoundSeconds
+
+    # The minimum size of files that are streamed rather than read into memory, in bytes. Default is 1MB.
+    optional int(>= 0) streamBytes
+
+    # If false, text responses are never compressed. Default is true.
+    optional bool compress
+
+    # The minimum size of compressed text responses, in bytes. Default is 512.
+    optional int(>= 0) compressBytes
+
     # Global variables
     optional string{} globals
 
@@ -166,6 +297,13 @@ struct MarkdownUpAPIConfig
     # The APIs
     MarkdownUpAPI[] apis
 
+    # The number of API worker processes for process executor APIs. Default is the number of CPUs.
+    optional int(>= 1) processes
+
+    # If true, the API statistics API (markdown_up_api_stats) is added and the APIs' execution statistics are recorded.
+    # Default is false.
+    optional bool stats
+
 
 group
 
@@ -182,4 +320,53 @@ struct MarkdownUpAPI
     # If true, the API function has a WSGI respone (e.g. `["200 Status", [["Content-Type": "text/plain"]], "Hello!"]`)
     # Default is false.
     optional bool wsgi
+
+    # The API function executor. Process executor API functions are executed by a pool of worker processes, so CPU-bound
+    # API functions don't block other requests. Default is "thread".
+    optional MarkdownUpAPIExecutor executor
+
+    # If provided, the maximum number of statements an API function execution may execute. Executions that exceed the
+    # limit fail with a 503 status. Default is unlimited.
+    optional int(>= 1) maxStatements
+
+    # If provided, the maximum time an API function execution may take, in milliseconds. Executions that exceed the
+    # timeout fail with a 504 status. Thread executor executions can't be interrupted, so the timeout is checked when
+    # the execution completes - use maxStatements to bound them. Process executor executions are interrupted by
+    # terminating the API worker processes, which fails other in-flight process executor executions. Default is
+    # unlimited.
+    optional int(>= 1) timeoutMs
+
+    # If provided, the maximum number of concurrent executions of the API function. Requests beyond the limit wait in
+    # the queue. Default is unlimited.
+    optional int(>= 1) maxConcurrent
+
+    # The maximum number of requests waiting for an API function execution. Requests beyond the queue limit fail with
+    # a 503 status and a Retry-After header. Ignored if maxConcurrent is not provided. Default is 0.
+    optional int(>= 0) maxQueue
+
+    # If provided, the API's responses are cached by request. Use only for APIs whose response depends only on the request.
+    optional MarkdownUpAPICache cache
+
+
+# An API function executor
+enum MarkdownUpAPIExecutor
+
+    # The API function is executed on the request's thread
+    thread
+
+    # The API function is executed by an API worker process
+    process
+
+
+# An API response cache
+struct MarkdownUpAPICache
+
+    # The cached responses' time-to-live, in seconds
+    float(> 0) ttlSeconds
+
+    # The maximum number of cached responses. Default is 1000.
+    optional int(>= 1) maxEntries
+
+    # The maximum size of the cached responses, in bytes. Default is 10MB.
+    optional int(>= 1) maxBytes
 ''')
@@ -0,0 +1,125 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+"""
+MarkdownUp preload link analysis
+"""
+
+import re
+import urllib.parse
+
+from bare_script import BareScriptParserError, barescript_parse_script
+
+
+def markdown_preload_urls(markdown_text):
+    """
+    Get the resources referenced by Markdown text that the browser fetches once the Markdown is rendered - images,
+    markdown-script includes, and markdown-script systemFetch calls with literal URLs. System includes and non-literal
+    fetches are ignored.
+
+    Returns a list of URL/destination tuples (e.g., "('image.png', 'image')"), in order, without duplicates. The URLs are
+    relative to the Markdown file's URL.
+    """
+
+    preload_urls = []
+    for is_script, lines in markdown_blocks(markdown_text):
+        if is_script:
+            _script_preload_urls('\n'.join(lines), preload_urls)
+        else:
+            for match_image in _RE_MARKDOWN_IMAGE.finditer('\n'.join(lines)):
+                _add_preload_url(preload_urls, match_image.group('url_angle') or match_image.group('url'), 'image')
+    return preload_urls
+
+
+def markdown_blocks(markdown_text):
+    """
+    Split Markdown text into markdown-script and other line blocks - yields is-script/lines tuples. Fenced code blocks
+    that aren't markdown-script are dropped.
+    """
+
+    lines = []
+    fence = None
+    is_script = False
+    for line in markdown_text.splitlines():
+        # Fenced code block start?
+        if fence is None:
+            match_fence = _RE_FENCE.match(line)
+            if match_fence is None:
+                lines.append(line)
+                continue
+            yield False, lines
+            lines = []
+            fence = match_fence.group('fence')
+            is_script = match_fence.group('language') == 'markdown-script'
+
+        # Fenced code block end?
+        elif line.strip().startswith(fence) and not line.strip().strip(fence[0]):
+            if is_script:
+                yield True, lines
+            lines = []
+            fence = None
+            is_script = False
+
+        elif is_script:
+            lines.append(line)
+
+    # Unterminated fenced code blocks extend to the end of the document
+    if fence is None or is_script:
+        yield is_script, lines
+
+
+_RE_FENCE = re.compile(r'^ {0,3}(?P<fence>`{3,}|~{3,})\s*(?P<language>[^\s`]*)')
+
+
+# Markdown image - "![alt](url)" or "![alt](<url> "title")"
+_RE_MARKDOWN_IMAGE = re.compile(r'!\[[^\]]*\]\(\s*(?:<(?P<url_angle>[^>\n]+)>|(?P<url>[^\s)]+))')
+
+
+# Helper to add a markdown-script's include and fetch URLs
+def _script_preload_urls(script_text, preload_urls):
+    try:
+        script = barescript_parse_script(script_text)
+    except BareScriptParserError:
+        return
+
+    # Top-level includes are fetched before the script runs
+    for statement in script['statements']:
+        include = statement.get('include')
+        if include is not None:
+            for include_url in include['includes']:
+                if not include_url.get('system'):
+                    _add_preload_url(preload_urls, include_url['url'], 'fetch')
+
+    # Add the literal systemFetch URLs
+    nodes = [script['statements']]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(reversed(node))
+        elif isinstance(node, dict):
+            function = node.get('function')
+            if isinstance(function, dict) and function.get('name') == 'systemFetch':
+                args = function.get('args')
+                if args and 'string' in args[0]:
+                    _add_preload_url(preload_urls, args[0]['string'], 'fetch')
+            nodes.extend(reversed(list(node.values())))
+
+
+# Helper to add a preload URL - only same-origin URLs are preloaded
+def _add_preload_url(preload_urls, url, destination):
+    url_parts = urllib.parse.urlsplit(url)
+    if url_parts.scheme or url_parts.netloc or not url_parts.path:
+        return
+    preload_url = (url, destination)
+    if preload_url not in preload_urls:
+        preload_urls.append(preload_url)
+
+
+def preload_link_header(url, destination):
+    """
+    Create a preload Link header value. Fetch preloads are CORS-mode so they match the browser's fetch requests.
+    """
+
+    url_quoted = urllib.parse.quote(url, safe="/:@!$&'()*+,;=?#~%")
+    crossorigin = '; crossorigin' if destination == 'fetch' else ''
+    return f'<{url_quoted}>; rel=preload; as={destination}{crossorigin}'
@@ -0,0 +1,355 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+"""
+MarkdownUp static response support
+"""
+
+import email.utils
+import gzip
+import hashlib
+from itertools import chain
+import os
+import posixpath
+import re
+import wsgiref.util
+import zlib
+
+import chisel
+
+
+class StaticResponse:
+    """
+    A static response with conditional GET support. If the content is None, the content is read from the path when it
+    is first needed, so not-modified responses never read the file. If stream is True, the file is streamed using the
+    WSGI server's file wrapper and the content is never read into memory.
+
+    If encodable is True, the response has content-encoded variants (see :meth:`encoded_response`). If content_encoding
+    is not None, the response is a content-encoded variant. If compress is True, the content read from the path is
+    compressed with the content encoding.
+
+    The headers are additional response headers (e.g., preload Link headers). They are sent with not-modified responses,
+    too, so caches update their stored headers.
+    """
+
+    __slots__ = (
+        'content_type', 'etag', 'last_modified', 'content', 'path', 'stream', 'encodable', 'content_encoding', 'compress',
+        'headers'
+    )
+
+
+    def __init__(self, content_type, etag, last_modified, content=None, path=None, stream=False, encodable=False,
+                 content_encoding=None, compress=False, headers=()):
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content = content
+        self.path = path
+        self.stream = stream
+        self.encodable = encodable
+        self.content_encoding = content_encoding
+        self.compress = compress
+        self.headers = headers
+
+
+    def encoded_response(self, content_encoding):
+        """
+        Create the response's compressed variant response. Returns None if the response can't be compressed (e.g.,
+        streamed responses).
+        """
+
+        if self.stream:
+            return None
+        return StaticResponse(
+            self.content_type,
+            f'{self.etag[:-1]}-{content_encoding}"',
+            self.last_modified,
+            compress_content(self.content, content_encoding) if self.content is not None else None,
+            self.path,
+            encodable=True,
+            content_encoding=content_encoding,
+            compress=self.content is None,
+            headers=self.headers
+        )
+
+
+    def __call__(self, environ, start_response):
+        # Not modified?
+        validator_headers = [('ETag', self.etag), ('Last-Modified', email.utils.formatdate(self.last_modified, usegmt=True))]
+        if self.encodable:
+            validator_headers.append(('Vary', 'Accept-Encoding'))
+        validator_headers.extend(self.headers)
+        if is_not_modified(environ, self.etag, self.last_modified):
+            start_response(STATUS_NOT_MODIFIED, validator_headers)
+            return []
+
+        # Content-encoded response?
+        if self.content_encoding is not None:
+            validator_headers.append(('Content-Encoding', self.content_encoding))
+
+        # File responses accept range requests (identity encoding only)
+        accept_ranges = self.path is not None and self.content_encoding is None
+        if accept_ranges:
+            validator_headers.append(('Accept-Ranges', 'bytes'))
+
+        # Open the streamed file or read the content, if necessary
+        content_file = None
+        if self.stream:
+            content_file = open(self.path, 'rb') # pylint: disable=consider-using-with
+        elif self.content is None:
+            with open(self.path, 'rb') as path_file:
+                content = path_file.read()
+            self.content = compress_content(content, self.content_encoding) if self.compress else content
+        try:
+            content_size = os.fstat(content_file.fileno()).st_size if content_file is not None else len(self.content)
+
+            # Range request?
+            range_header = environ.get('HTTP_RANGE')
+            if range_header is not None and accept_ranges and \
+               is_if_range(environ.get('HTTP_IF_RANGE'), self.etag, self.last_modified):
+                ranges = parse_ranges(range_header, content_size)
+                if ranges is not None:
+                    return self._range_response(start_response, validator_headers, content_file, content_size, ranges)
+
+            # Stream the file?
+            if content_file is not None:
+                start_response(STATUS_OK, [
+                    ('Content-Type', self.content_type),
+                    *validator_headers,
+                    ('Content-Length', str(content_size))
+                ])
+                file_wrapper = environ.get('wsgi.file_wrapper', wsgiref.util.FileWrapper)
+                return file_wrapper(content_file, STREAM_BLOCK_SIZE)
+        except:
+            if content_file is not None:
+                content_file.close()
+            raise
+
+        start_response(STATUS_OK, [('Content-Type', self.content_type), *validator_headers])
+        return [self.content]
+
+
+    # Range request response helper - the content file, if any, is closed when the response is complete
+    def _range_response(self, start_response, validator_headers, content_file, content_size, ranges):
+        # Range not satisfiable?
+        if not ranges:
+            if content_file is not None:
+                content_file.close()
+            start_response(STATUS_RANGE_NOT_SATISFIABLE, [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('Content-Range', f'bytes */{content_size}')
+            ])
+            return [b'Range Not Satisfiable']
+
+        # Single range?
+        if len(ranges) == 1:
+            range_start, range_end = ranges[0]
+            start_response(STATUS_PARTIAL_CONTENT, [
+                ('Content-Type', self.content_type),
+                *validator_headers,
+                ('Content-Range', f'bytes {range_start}-{range_end}/{content_size}'),
+                ('Content-Length', str(range_end - range_start + 1))
+            ])
+            if content_file is not None:
+                return _file_range_iter(content_file, ranges)
+            return [self.content[range_start:range_end + 1]]
+
+        # Multiple ranges - multipart/byteranges response
+        boundary = hashlib.md5(self.etag.encode('utf-8')).hexdigest()
+        range_headers = [
+            f'\r\n--{boundary}\r\nContent-Type: {self.content_type}\r\n'
+            f'Content-Range: bytes {range_start}-{range_end}/{content_size}\r\n\r\n'.encode('utf-8')
+            for range_start, range_end in ranges
+        ]
+        range_footer = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        content_length = sum(len(range_header) for range_header in range_headers) + len(range_footer) + \
+            sum(range_end - range_start + 1 for range_start, range_end in ranges)
+        start_response(STATUS_PARTIAL_CONTENT, [
+            ('Content-Type', f'multipart/byteranges; boundary={boundary}'),
+            *validator_headers,
+            ('Content-Length', str(content_length))
+        ])
+        if content_file is not None:
+            return _file_range_iter(content_file, ranges, range_headers, range_footer)
+        return [
+            *chain.from_iterable(
+                (range_header, self.content[range_start:range_end + 1])
+                for range_header, (range_start, range_end) in zip(range_headers, ranges)
+            ),
+            range_footer
+        ]
+
+
+# Generator of a file's byte ranges with optional range part headers and footer. The file is closed when complete.
+def _file_range_iter(content_file, ranges, range_headers=None, range_footer=None):
+    with content_file:
+        for ix_range, (range_start, range_end) in enumerate(ranges):
+            if range_headers is not None:
+                yield range_headers[ix_range]
+            content_file.seek(range_start)
+            remaining = range_end - range_start + 1
+            while remaining > 0:
+                block = content_file.read(min(remaining, STREAM_BLOCK_SIZE))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+        if range_footer is not None:
+            yield range_footer
+
+
+# The streamed response block size, in bytes
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+# The maximum number of ranges in a range request - requests with more ranges are served in full
+MAX_RANGES = 16
+
+
+# Response status strings
+STATUS_OK = '200 OK'
+STATUS_PARTIAL_CONTENT = '206 Partial Content'
+STATUS_NOT_MODIFIED = '304 Not Modified'
+STATUS_RANGE_NOT_SATISFIABLE = '416 Range Not Satisfiable'
+
+
+# Determine if a request's conditional GET headers match the resource's validators
+def is_not_modified(environ, etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return any(
+            match_etag == '*' or match_etag.removeprefix('W/') == etag
+            for match_etag in (match_etag.strip() for match_etag in if_none_match.split(','))
+        )
+
+    # If-Modified-Since?
+    if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since is not None:
+        try:
+            if_modified_since_date = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= if_modified_since_date.timestamp()
+
+    return False
+
+
+# Determine if a request's If-Range header matches the resource's validators (strong comparison). If there is no
+# If-Range header, the range request is unconditional.
+def is_if_range(if_range, etag, last_modified):
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    try:
+        return email.utils.parsedate_to_datetime(if_range).timestamp() == last_modified
+    except (TypeError, ValueError):
+        return False
+
+
+# Parse a Range header into a list of inclusive start/end byte offset tuples. Returns None if the Range header is
+# invalid or should be ignored, and an empty list if the range is not satisfiable.
+def parse_ranges(range_header, content_size):
+    range_unit, _, range_specs = range_header.partition('=')
+    if range_unit.strip().lower() != 'bytes':
+        return None
+    range_specs = range_specs.split(',')
+    if len(range_specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for range_spec in range_specs:
+        range_match = _RE_RANGE_SPEC.fullmatch(range_spec.strip())
+        if range_match is None:
+            return None
+        range_start, range_end = range_match.groups()
+
+        # Suffix range (e.g. "-500")?
+        if not range_start:
+            suffix_length = int(range_end)
+            if suffix_length > 0 and content_size > 0:
+                ranges.append((max(0, content_size - suffix_length), content_size - 1))
+            continue
+
+        # Start/end range (e.g. "0-499" or "500-")
+        start = int(range_start)
+        end = int(range_end) if range_end else content_size - 1
+        if range_end and end < start:
+            return None
+        if start < content_size:
+            ranges.append((start, min(end, content_size - 1)))
+
+    return ranges
+
+
+_RE_RANGE_SPEC = re.compile(r'(\d*)-(\d*)(?<!^-)')
+
+
+# Negotiate a response's compressed content encoding from the request's Accept-Encoding header - returns None for
+# identity encoding
+def accept_content_encoding(accept_encoding):
+    if not accept_encoding:
+        return None
+
+    # Parse the content encoding qualities
+    qualities = {}
+    for coding_spec in accept_encoding.split(','):
+        coding, *coding_params = coding_spec.split(';')
+        quality = 1.0
+        for coding_param in coding_params:
+            param_name, _, param_value = coding_param.partition('=')
+            if param_name.strip() == 'q':
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    # Select the supported content encoding, in order of preference
+    wildcard_quality = qualities.get('*', 0.0)
+    return next(
+        (content_encoding for content_encoding in CONTENT_ENCODINGS if qualities.get(content_encoding, wildcard_quality) > 0),
+        None
+    )
+
+
+# The supported compressed content encodings, in order of preference
+CONTENT_ENCODINGS = ('gzip', 'deflate')
+
+
+# Compress content with a content encoding
+def compress_content(content, content_encoding):
+    if content_encoding == 'gzip':
+        return gzip.compress(content, mtime=0)
+    return zlib.compress(content)
+
+
+# Determine if a content type is compressible text
+def is_compressible_content_type(content_type):
+    return content_type.startswith(('text/', 'application/json', 'application/javascript', 'image/svg+xml'))
+
+
+# Compute a stat key's strong ETag - the inode is not used so ETags match across servers and don't expose inode numbers
+def stat_key_etag(key):
+    _, mtime_ns, size = key[:3]
+    return f'"{mtime_ns:x}-{size:x}"'
+
+
+# Compute a content's strong ETag
+def content_etag(content):
+    return f'"{hashlib.md5(content).hexdigest()}"'
+
+
+# Compute a stat key's last-modified time, in seconds since the epoch
+def stat_key_last_modified(key):
+    return key[1] // 1_000_000_000
+
+
+# Get a static resource's content type from its path
+def static_content_type(path_info):
+    content_type = chisel.StaticRequest.EXT_TO_CONTENT_TYPE.get(posixpath.splitext(path_info)[1])
+    if content_type is None:
+        raise ValueError(f'Unknown content type for static resource "{path_info}"')
+    return content_type
@@ -0,0 +1,444 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+"""
+MarkdownUp full-text search and document metadata index
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+
+import chisel
+
+from .index import HTML_EXTS, MARKDOWN_EXTS
+from .preload import markdown_blocks
+
+
+class DocumentMetadata:
+    """
+    A Markdown file's metadata - its title (None if it has no front matter title or heading), size, modified time in
+    nanoseconds, and heading outline (a tuple of level/text tuples)
+    """
+
+    __slots__ = ('title', 'size', 'mtime', 'outline')
+
+
+    def __init__(self, title, size, mtime, outline):
+        self.title = title
+        self.size = size
+        self.mtime = mtime
+        self.outline = outline
+
+
+class SearchIndex:
+    """
+    A SQLite index of the Markdown files under a root directory - their metadata and, if text is true, an FTS5 full-text
+    search index. The index is built and refreshed on a background thread. Refreshes are incremental - only new and
+    changed files, by modified time and size, are read. File change events re-index only the changed paths, and the
+    periodic refresh re-indexes all files. If a database path is provided, the index is persisted so restarts only
+    re-index changed files.
+
+    The metadata attribute is the dictionary of Markdown file relative POSIX path to DocumentMetadata. It is updated in
+    place by the background thread and must not be modified.
+    """
+
+    __slots__ = (
+        'root', 'text', 'connection', 'lock', 'refresh_seconds', 'thread', 'stop_event', 'refresh_event', 'ready', 'metadata',
+        'changed_paths', 'changed_lock'
+    )
+
+
+    def __init__(self, root, database=None, refresh_seconds=None, text=True):
+        self.root = root
+        self.text = text
+        self.connection = _open_database(database if database is not None else ':memory:', text)
+        self.lock = threading.Lock()
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else DEFAULT_SEARCH_REFRESH_SECONDS
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.refresh_event = threading.Event()
+        self.ready = False
+        self.metadata = {}
+        self.changed_paths = set()
+        self.changed_lock = threading.Lock()
+
+
+    def start(self):
+        """
+        Start the index's background thread
+        """
+
+        self.thread = threading.Thread(target=self.run, name=f'SearchIndex-{self.root}')
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stop the index's background thread and close the database
+        """
+
+        self.stop_event.set()
+        self.refresh_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.connection.close()
+
+
+    def run(self):
+        paths = None
+        while not self.stop_event.is_set():
+            self.refresh(paths)
+            self.ready = True
+
+            # Wait for the refresh period or a file change - file changes are coalesced and only the changed paths are
+            # re-indexed. The periodic refresh re-indexes all files.
+            is_changed = self.refresh_event.wait(self.refresh_seconds)
+            if is_changed:
+                self.stop_event.wait(SEARCH_CHANGE_SECONDS)
+            self.refresh_event.clear()
+            with self.changed_lock:
+                paths = self.changed_paths if is_changed else None
+                self.changed_paths = set()
+
+
+    def changed(self, path):
+        """
+        File change listener - queue the changed path and schedule an index refresh. Changes to files that aren't
+        Markdown files are ignored.
+        """
+
+        if os.path.splitext(path)[1] not in MARKDOWN_EXTS and os.path.isfile(path):
+            return
+        with self.changed_lock:
+            self.changed_paths.add(path)
+        self.refresh_event.set()
+
+
+    def refresh(self, paths=None):
+        """
+        Incrementally update the index. If paths are provided, only the Markdown files at or under the paths are
+        re-indexed. Returns the number of files indexed and the number of files removed.
+        """
+
+        # Get the relative POSIX paths to refresh - a root path refreshes all files
+        posix_paths = None
+        if paths is not None:
+            posix_paths = {}
+            for path in paths:
+                posix_path = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if posix_path == '.':
+                    posix_paths = None
+                    break
+                if posix_path != '..' and not posix_path.startswith('../'):
+                    posix_paths[posix_path] = path
+
+        # Get the indexed files' modified times and sizes
+        with self.lock:
+            indexed = {}
+            if posix_paths is None:
+                rows = self.connection.execute('SELECT id, path, mtime, size, title, outline FROM search_files').fetchall()
+            else:
+                rows = []
+                for posix_path in posix_paths:
+                    posix_prefix = f'{posix_path}/'
+                    rows.extend(self.connection.execute(
+                        'SELECT id, path, mtime, size, title, outline FROM search_files WHERE path = ? OR substr(path, 1, ?) = ?',
+                        (posix_path, len(posix_prefix), posix_prefix)
+                    ))
+            for file_id, path, mtime, size, title, outline in rows:
+                indexed[path] = (file_id, mtime, size)
+
+                # Load the persisted metadata
+                if path not in self.metadata:
+                    outline = tuple(tuple(heading) for heading in json.loads(outline))
+                    self.metadata[path] = DocumentMetadata(title, size, mtime, outline)
+
+        # Find the new and changed Markdown files
+        found = {}
+        for path in (self.root,) if posix_paths is None else posix_paths.values():
+            if os.path.isdir(path):
+                file_paths = (
+                    os.path.join(dir_path, file_name) for dir_path, _, file_names in os.walk(path) for file_name in file_names
+                )
+            else:
+                file_paths = (path,)
+            for file_path in file_paths:
+                if os.path.splitext(file_path)[1] not in MARKDOWN_EXTS:
+                    continue
+                try:
+                    path_stat = os.stat(file_path)
+                except OSError:
+                    continue
+                found[os.path.relpath(file_path, self.root).replace(os.sep, '/')] = (file_path, path_stat)
+        changed = []
+        for posix_path, (path, path_stat) in found.items():
+            indexed_file = indexed.get(posix_path)
+            if indexed_file is None or indexed_file[1:] != (path_stat.st_mtime_ns, path_stat.st_size):
+                changed.append((posix_path, path, path_stat, indexed_file))
+
+        # Index the new and changed files in batches so searches aren't blocked for long
+        for ix_batch in range(0, len(changed), SEARCH_BATCH_SIZE):
+            if self.stop_event.is_set():
+                break
+            documents = [
+                (posix_path, path_stat, indexed_file, *_read_document(path, path_stat))
+                for posix_path, path, path_stat, indexed_file in changed[ix_batch:ix_batch + SEARCH_BATCH_SIZE]
+            ]
+            with self.lock, self.connection:
+                for posix_path, path_stat, indexed_file, title, text, outline in documents:
+                    outline_json = json.dumps(outline)
+                    if indexed_file is not None:
+                        file_id = indexed_file[0]
+                        self.connection.execute(
+                            'UPDATE search_files SET mtime = ?, size = ?, title = ?, outline = ? WHERE id = ?',
+                            (path_stat.st_mtime_ns, path_stat.st_size, title, outline_json, file_id)
+                        )
+                        if self.text:
+                            self.connection.execute('DELETE FROM search_text WHERE rowid = ?', (file_id,))
+                    else:
+                        file_id = self.connection.execute(
+                            'INSERT INTO search_files (path, mtime, size, title, outline) VALUES (?, ?, ?, ?, ?)',
+                            (posix_path, path_stat.st_mtime_ns, path_stat.st_size, title, outline_json)
+                        ).lastrowid
+                    if self.text:
+                        self.connection.execute(
+                            'INSERT INTO search_text (rowid, title, text) VALUES (?, ?, ?)',
+                            (file_id, title if title is not None else os.path.basename(posix_path), text)
+                        )
+            for posix_path, path_stat, _, title, _, outline in documents:
+                self.metadata[posix_path] = DocumentMetadata(title, path_stat.st_size, path_stat.st_mtime_ns, outline)
+
+        # Remove the deleted files
+        removed = [(file_id,) for posix_path, (file_id, _, _) in indexed.items() if posix_path not in found]
+        with self.lock, self.connection:
+            if self.text:
+                self.connection.executemany('DELETE FROM search_text WHERE rowid = ?', removed)
+            self.connection.executemany('DELETE FROM search_files WHERE id = ?', removed)
+        for posix_path in indexed:
+            if posix_path not in found:
+                self.metadata.pop(posix_path, None)
+
+        return len(changed), len(removed)
+
+
+    def search(self, query, offset=0, limit=None):
+        """
+        Search the index. Files containing all of the query's words are returned, best match first. Words ending with
+        "*" match word prefixes. Returns the total number of matching files and the page of matches - a list of
+        path/title/snippet tuples. The snippets' matched words are bolded with Markdown "**".
+        """
+
+        match_query = search_match_query(query)
+        if match_query is None:
+            return 0, []
+        if limit is None:
+            limit = DEFAULT_SEARCH_LIMIT
+        with self.lock:
+            count = self.connection.execute(SEARCH_COUNT_QUERY, (match_query,)).fetchone()[0]
+            results = self.connection.execute(SEARCH_QUERY, (match_query, limit, offset)).fetchall()
+        return count, results
+
+
+# Helper to open the index database. Databases with a different schema version or text indexing are rebuilt.
+def _open_database(database, text):
+    connection = sqlite3.connect(database, check_same_thread=False)
+    version = SEARCH_SCHEMA_VERSION * 2 + (1 if text else 0)
+    if connection.execute('PRAGMA user_version').fetchone()[0] != version:
+        connection.executescript(f'''\
+DROP TABLE IF EXISTS search_files;
+DROP TABLE IF EXISTS search_text;
+{SEARCH_SCHEMA}{SEARCH_TEXT_SCHEMA if text else ''}PRAGMA user_version = {version};
+''')
+    return connection
+
+
+# Helper to read a Markdown file's title, text, and heading outline - the title is the front matter title, if any,
+# otherwise the first heading, if any, otherwise None. Files that can't be read, or that are too large, are indexed by
+# file name only.
+def _read_document(path, path_stat):
+    text = ''
+    if path_stat.st_size <= SEARCH_MAX_FILE_BYTES:
+        try:
+            with open(path, 'r', encoding='utf-8') as markdown_file:
+                text = markdown_file.read()
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    # Front matter title?
+    title = None
+    body = text
+    match_front_matter = _RE_FRONT_MATTER.match(text)
+    if match_front_matter is not None:
+        body = text[match_front_matter.end():]
+        match_title = _RE_FRONT_MATTER_TITLE.search(match_front_matter.group('front'))
+        if match_title is not None:
+            title = match_title.group('title').strip('"\'') or None
+
+    # Get the heading outline - headings in fenced code blocks are ignored
+    outline = []
+    for is_script, lines in markdown_blocks(body):
+        if not is_script:
+            for line in lines:
+                match_heading = _RE_HEADING.match(line)
+                if match_heading is not None and len(outline) < METADATA_MAX_HEADINGS:
+                    outline.append((len(match_heading.group('level')), match_heading.group('text')))
+    if title is None and outline:
+        title = outline[0][1]
+
+    return title, text, tuple(outline)
+
+
+_RE_FRONT_MATTER = re.compile(r'---[ \t]*\r?\n(?P<front>.*?)\r?\n---[ \t]*(?:\r?\n|$)', re.DOTALL)
+_RE_FRONT_MATTER_TITLE = re.compile(r'^title:[ \t]*(?P<title>.*?)[ \t]*$', re.MULTILINE)
+_RE_HEADING = re.compile(r' {0,3}(?P<level>#{1,6})[ \t]+(?P<text>.+?)(?:[ \t]+#+)?[ \t]*$')
+
+
+def search_match_query(query):
+    """
+    Convert a search query to an FTS5 match query - each word is quoted so FTS5 query syntax is not interpreted. Returns
+    None if the query has no words.
+    """
+
+    terms = []
+    for word in query.split():
+        is_prefix = word.endswith('*')
+        word = word.replace('"', '').rstrip('*')
+        if word:
+            terms.append(f'"{word}"*' if is_prefix else f'"{word}"')
+    return ' '.join(terms) if terms else None
+
+
+def search_fts5_available():
+    """
+    Determine if the SQLite library supports FTS5
+    """
+
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute('CREATE VIRTUAL TABLE fts5_test USING fts5(text)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+
+
+# The index database schema and schema version - the search_files table's outline is a JSON array of level/text arrays
+SEARCH_SCHEMA_VERSION = 1
+SEARCH_SCHEMA = '''\
+CREATE TABLE search_files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    outline TEXT NOT NULL
+);
+'''
+
+
+# The full-text search index schema - the search_text table's rowid is the search_files table's id
+SEARCH_TEXT_SCHEMA = '''\
+CREATE VIRTUAL TABLE search_text USING fts5(title, text, tokenize = 'porter unicode61');
+'''
+
+
+# The search result count query
+SEARCH_COUNT_QUERY = 'SELECT count(*) FROM search_text WHERE search_text MATCH ?'
+
+
+# The search results query - title matches are weighted more than text matches
+SEARCH_QUERY = '''\
+SELECT search_files.path, search_text.title, snippet(search_text, 1, '**', '**', '...', 16)
+FROM search_text JOIN search_files ON search_files.id = search_text.rowid
+WHERE search_text MATCH ?
+ORDER BY bm25(search_text, 10.0, 1.0)
+LIMIT ? OFFSET ?
+'''
+
+
+# The default search index refresh period, in seconds, and the delay to coalesce file changes before refreshing
+DEFAULT_SEARCH_REFRESH_SECONDS = 60
+SEARCH_CHANGE_SECONDS = 0.5
+
+
+# The number of files indexed per transaction
+SEARCH_BATCH_SIZE = 100
+
+
+# Markdown files larger than this, in bytes, are indexed by file name only
+SEARCH_MAX_FILE_BYTES = 4 * 1024 * 1024
+
+
+# The maximum number of headings in a Markdown file's outline
+METADATA_MAX_HEADINGS = 100
+
+
+# The default number of search results
+DEFAULT_SEARCH_LIMIT = 20
+
+
+@chisel.action(spec='''\
+group "MarkdownUp File Browser"
+
+
+# The MarkdownUp full-text search API
+action markdown_up_search
+    urls
+        GET
+
+    query
+        # The search query - Markdown files containing all of the query's words are returned, best match first. Words
+        # ending with "*" match word prefixes.
+        string(len > 0) query
+
+        # The index of the first result returned
+        optional int(>= 0) offset
+
+        # The maximum number of results returned. Default is 20.
+        optional int(>= 1, <= 100) limit
+
+    output
+        # The total number of matching Markdown files
+        int count
+
+        # The page of search results
+        SearchResult[] results
+
+        # If true, the search index is still being built and the results may be incomplete
+        optional bool building
+
+
+# A search result
+struct SearchResult
+
+    # The Markdown file's relative path
+    string path
+
+    # The Markdown file's MarkdownUp HTML stub relative URL
+    string url
+
+    # The Markdown file's title - its front matter title or first heading, if any, otherwise the file name
+    string title
+
+    # The text matching the query - matched words are bolded with Markdown "**"
+    string snippet
+''')
+def markdown_up_search(ctx, req):
+    search_index = ctx.app.search_index
+    count, results = search_index.search(req['query'], req.get('offset', 0), req.get('limit'))
+    response = {
+        'count': count,
+        'results': [
+            {'path': path, 'url': f'{os.path.splitext(path)[0]}{HTML_EXTS[0]}', 'title': title, 'snippet': snippet}
+            for path, title, snippet in results
+        ]
+    }
+    if not search_index.ready:
+        response['building'] = True
+    return response
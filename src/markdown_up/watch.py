@@ -0,0 +1,345 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+"""
+MarkdownUp file system change watcher
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import ctypes
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+
+from .cache import stat_key
+
+
+class FileWatcher(ABC):
+    """
+    The file system change watcher abstract base class. A watcher caches the stat keys of the paths under its root and
+    publishes change events, invalidating the changed paths' stat keys, so callers can revalidate without stat-ing.
+    Sub-classes implement the watcher thread's run method.
+    """
+
+    __slots__ = ('root', 'root_prefix', 'keys', 'generation', 'listeners', 'lock', 'thread', 'stop_event')
+
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.root_prefix = os.path.join(self.root, '')
+        self.keys = OrderedDict()
+        self.generation = 0
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+
+    def add_listener(self, listener):
+        """
+        Add a change event listener. The listener is called with the changed path from the watcher's thread.
+        """
+
+        self.listeners.append(listener)
+
+
+    def stat_key(self, path):
+        """
+        Get a path's stat key, stat-ing the path only if it has changed since it was last stat-ed
+        """
+
+        # Only paths under the root are watched
+        path = os.path.abspath(path)
+        if path != self.root and not path.startswith(self.root_prefix):
+            return stat_key(path)
+
+        with self.lock:
+            if path in self.keys:
+                self.keys.move_to_end(path)
+                return self.keys[path]
+            generation = self.generation
+
+        # Don't cache the key if a change occurred while stat-ing or if the path's changes aren't watched
+        key = stat_key(path)
+        if not self.is_watched(path):
+            return key
+        with self.lock:
+            if generation == self.generation:
+                self.keys[path] = key
+                if len(self.keys) > WATCHER_MAX_KEYS:
+                    self.keys.popitem(last=False)
+        return key
+
+
+    def is_watched(self, path): # pylint: disable=unused-argument
+        """
+        Determine if a path under the root has its changes published. Only watched paths' stat keys are cached.
+        """
+
+        return True
+
+
+    def start(self):
+        """
+        Start the watcher's thread
+        """
+
+        self.thread = threading.Thread(target=self.run, name=f'{type(self).__name__}-{self.root}')
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stop the watcher's thread
+        """
+
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+    @abstractmethod
+    def run(self):
+        """
+        The watcher thread's function - publish change events until the watcher is stopped
+        """
+
+
+    def changed(self, path, is_dir=False):
+        """
+        Publish a path change event. The path's stat key and its parent directory's stat key are invalidated. If the path
+        is a directory, the stat keys of all paths under it are invalidated.
+        """
+
+        parent_path = os.path.dirname(path)
+        dir_prefix = path + os.sep
+        with self.lock:
+            self.generation += 1
+            self.keys.pop(path, None)
+            self.keys.pop(parent_path, None)
+            if is_dir:
+                for key_path in [key_path for key_path in self.keys if key_path.startswith(dir_prefix)]:
+                    del self.keys[key_path]
+        for listener in self.listeners:
+            listener(path)
+
+
+    def changed_all(self):
+        """
+        Publish a change event for the watcher's root, invalidating all stat keys
+        """
+
+        with self.lock:
+            self.generation += 1
+            self.keys.clear()
+        for listener in self.listeners:
+            listener(self.root)
+
+
+class PollingFileWatcher(FileWatcher):
+    """
+    A file system change watcher that periodically re-stats the paths whose stat keys are cached. Since directory stat
+    keys change when entries are added or removed, this detects changes to all paths that have been stat-ed.
+    """
+
+    __slots__ = ('poll_seconds',)
+
+
+    def __init__(self, root, poll_seconds=None):
+        super().__init__(root)
+        self.poll_seconds = poll_seconds if poll_seconds is not None else DEFAULT_POLL_SECONDS
+
+
+    def run(self):
+        while not self.stop_event.wait(self.poll_seconds):
+            self.poll()
+
+
+    def poll(self):
+        """
+        Re-stat the cached paths, publishing change events for the changed paths
+        """
+
+        with self.lock:
+            keys = list(self.keys.items())
+        for path, key in keys:
+            path_key = stat_key(path)
+            if path_key != key:
+                self.changed(path, is_dir=key is not None and path_key is None)
+
+
+class InotifyFileWatcher(FileWatcher):
+    """
+    A file system change watcher using Linux inotify. All directories under the root are watched.
+    """
+
+    __slots__ = ('real_root', 'libc', 'inotify_fd', 'watch_paths', 'unwatched_prefixes', 'wake_read', 'wake_write')
+
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.real_root = os.path.realpath(self.root)
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.inotify_fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.inotify_fd < 0:
+            raise _errno_error('inotify_init1')
+        self.watch_paths = {}
+        self.unwatched_prefixes = ()
+        self.wake_read, self.wake_write = os.pipe()
+        try:
+            self.add_watches(self.root)
+        except:
+            self.close()
+            raise
+
+
+    def close(self):
+        os.close(self.inotify_fd)
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+
+
+    def add_watches(self, dir_path):
+        """
+        Watch a directory and its sub-directories
+        """
+
+        dir_stack = [dir_path]
+        while dir_stack:
+            dir_path = dir_stack.pop()
+            watch = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(dir_path), INOTIFY_MASK)
+            if watch < 0:
+                # Directory removed before we could watch it?
+                if ctypes.get_errno() in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+                raise _errno_error(f'inotify_add_watch "{dir_path}"')
+            self.watch_paths[watch] = dir_path
+            try:
+                with os.scandir(dir_path) as entries:
+                    dir_stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+
+
+    def is_watched(self, path):
+        # Paths under new directories that couldn't be watched (e.g., the inotify watch limit was reached) are not watched
+        if self.unwatched_prefixes and os.path.join(path, '').startswith(self.unwatched_prefixes):
+            return False
+
+        # Symbolic links aren't followed when adding watches, so paths through symbolic links (whose targets may be
+        # outside the root) are not watched. Invalid paths (e.g., with embedded null bytes) are not watched.
+        try:
+            real_path = os.path.realpath(path)
+        except (OSError, ValueError):
+            return False
+        return real_path == os.path.normpath(os.path.join(self.real_root, os.path.relpath(path, self.root)))
+
+
+    def stop(self):
+        self.stop_event.set()
+        os.write(self.wake_write, b'x')
+        super().stop()
+        self.close()
+
+
+    def run(self):
+        while not self.stop_event.is_set():
+            readable, _, _ = select.select([self.inotify_fd, self.wake_read], [], [])
+            if self.inotify_fd in readable:
+                try:
+                    events = os.read(self.inotify_fd, INOTIFY_READ_SIZE)
+                except BlockingIOError:
+                    continue
+                self.handle_events(events)
+
+
+    def handle_events(self, events):
+        """
+        Publish the change events for a buffer of inotify events
+        """
+
+        offset = 0
+        while offset < len(events):
+            watch, mask, _, name_size = INOTIFY_EVENT.unpack_from(events, offset)
+            name = events[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + name_size].rstrip(b'\0')
+            offset += INOTIFY_EVENT.size + name_size
+
+            # Event queue overflow?
+            if mask & IN_Q_OVERFLOW:
+                self.changed_all()
+                continue
+
+            # Watch removed?
+            dir_path = self.watch_paths.get(watch)
+            if dir_path is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watch_paths[watch]
+                continue
+
+            # Publish the change
+            path = os.path.join(dir_path, os.fsdecode(name)) if name else dir_path
+            is_dir = bool(mask & IN_ISDIR) or not name
+            self.changed(path, is_dir)
+
+            # Watch new directories - if the directory can't be watched, its paths are no longer watched. The unwatched
+            # prefixes tuple is replaced, rather than modified, since it's read by other threads.
+            if is_dir and name and mask & (IN_CREATE | IN_MOVED_TO):
+                path_prefix = os.path.join(path, '')
+                try:
+                    self.add_watches(path)
+                    if path_prefix in self.unwatched_prefixes:
+                        self.unwatched_prefixes = tuple(prefix for prefix in self.unwatched_prefixes if prefix != path_prefix)
+                except OSError:
+                    if path_prefix not in self.unwatched_prefixes:
+                        self.unwatched_prefixes = (*self.unwatched_prefixes, path_prefix)
+                    self.changed_all()
+
+
+# Create the best available file system change watcher for the platform
+def create_file_watcher(root, poll_seconds=None):
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyFileWatcher(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingFileWatcher(root, poll_seconds)
+
+
+# Create an OSError from the C errno
+def _errno_error(message):
+    error_number = ctypes.get_errno()
+    return OSError(error_number, f'{message}: {os.strerror(error_number)}')
+
+
+# The maximum number of cached stat keys - once full, the least-recently used stat keys are evicted
+WATCHER_MAX_KEYS = 100000
+
+
+# The default polling file watcher's polling period, in seconds
+DEFAULT_POLL_SECONDS = 1.0
+
+
+# inotify event constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+    IN_DELETE_SELF | IN_MOVE_SELF
+INOTIFY_EVENT = struct.Struct('iIII')
+INOTIFY_READ_SIZE = 64 * 1024
@@ -1,18 +1,25 @@
 # Licensed under the MIT License
 # https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
 
+from concurrent.futures.process import BrokenProcessPool
 from io import StringIO
 import json
+import os
 import re
+import threading
+import time
 import unittest
 import unittest.mock
 
+import bare_script
 from bare_script import BareScriptParserError
 from bare_script.include import SchemaParserError
 
+from markdown_up.api import APIConcurrencyLimit, APIProcessPool, APIResponseCache, _api_process_call, _execute_api_fn
 from markdown_up.app import MarkdownUpApplication
 
 from .test_app import create_test_files
+from .test_watch import wait_for
 
 
 class TestMarkdownUpAPI(unittest.TestCase):
@@ -346,6 +353,106 @@ endfunction
             self.assertEqual(content_bytes, b'Tom and Jerry')
 
 
+    def test_api_globals_write(self):
+        test_files = [
+            ('test.smd', '''\
+action testGlobals
+    urls
+        GET
+
+    output
+        int count
+        string name
+'''),
+            ('test.bare', '''\
+vCount = 0
+
+function testGlobals(request):
+    systemGlobalSet('vCount', vCount + 1)
+    systemGlobalSet('vName', 'Jerry')
+    return {'count': vCount, 'name': vName}
+endfunction
+''')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(
+                temp_dir,
+                {
+                    'globals': {'vName': 'Tom'}
+                },
+                {
+                    'schemas': ['test.smd'],
+                    'scripts': ['test.bare'],
+                    'apis': [
+                        {'name': 'testGlobals'}
+                    ]
+                }
+            )
+
+            # Global writes are per-request - the shared API globals are not modified
+            for _ in range(2):
+                status, _, content_bytes = app.request('GET', '/testGlobals')
+                self.assertEqual(status, '200 OK')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'count': 1, 'name': 'Jerry'})
+
+
+    def test_api_execution_time(self):
+        test_files = [
+            ('test.smd', '''\
+action testLoop
+    urls
+        GET
+
+    query
+        int count
+
+    output
+        int result
+'''),
+            ('test.bare', '''\
+function testHelper(value):
+    return value + 1
+endfunction
+
+function testLoop(request):
+    result = 0
+    while result < objectGet(request, 'count'):
+        result = testHelper(result)
+    endwhile
+    return {'result': result}
+endfunction
+''')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testLoop'}
+                ]
+            })
+
+            # Execute the API function directly with plain dict globals
+            script_globals = {}
+            with open(os.path.join(temp_dir, 'test.bare'), 'r', encoding='utf-8') as script_file:
+                bare_script.execute_script(bare_script.barescript_parse_script(script_file.read()), {'globals': script_globals})
+            direct_times = []
+            for _ in range(3):
+                start_time = time.perf_counter()
+                script_globals['testLoop']([{'count': 20000}], {'globals': dict(script_globals), 'statementCount': 0})
+                direct_times.append(time.perf_counter() - start_time)
+
+            # The API request's execution time is comparable - the request's globals don't slow the BareScript runtime
+            request_times = []
+            for _ in range(3):
+                start_time = time.perf_counter()
+                status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=20000')
+                request_times.append(time.perf_counter() - start_time)
+                self.assertEqual(status, '200 OK')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'result': 20000})
+            self.assertLess(min(request_times), 3 * min(direct_times) + 0.01)
+
+
     def test_api_error(self):
         test_files = [
             ('test.smd', '''\
@@ -738,3 +845,675 @@ endfunction
                 'error': 'InvalidOutput',
                 'message': 'WSGI API function "test" invalid return value'
             })
+
+
+class TestMarkdownUpAPICache(unittest.TestCase):
+
+    TEST_FILES = [
+        ('test.smd', '''\
+action sumNumbers
+    urls
+        GET
+
+    query
+        float[] values
+
+    output
+        float result
+
+    errors
+        Negative
+
+
+action testWSGI
+    urls
+        GET
+'''),
+        ('test.bare', '''\
+function sumNumbers(request):
+    result = 0
+    for value in objectGet(request, 'values'):
+        if value < 0:
+            apiError('Negative')
+            return
+        endif
+        result = result + value
+    endfor
+    apiHeader('X-Sum', stringNew(result))
+    return {'result': result}
+endfunction
+
+function testWSGI(request):
+    apiHeader('X-Test', 'test')
+    return ['200 OK', [['Content-Type', 'text/plain']], 'Hello']
+endfunction
+''')
+    ]
+
+
+    def test_api_cache(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'sumNumbers', 'cache': {'ttlSeconds': 60}},
+                    {'name': 'testWSGI', 'wsgi': True, 'cache': {'ttlSeconds': 60, 'maxEntries': 10, 'maxBytes': 10000}}
+                ],
+                'stats': True
+            })
+            with unittest.mock.patch('markdown_up.api._execute_api_fn', wraps=_execute_api_fn) as mock_execute:
+                # Miss, then hits - the response headers are cached with the response
+                for _ in range(3):
+                    status, headers, content_bytes = app.request('GET', '/sumNumbers', query_string='values.0=1&values.1=2.5')
+                    self.assertEqual(status, '200 OK')
+                    self.assertEqual(headers, [('Content-Type', 'application/json'), ('X-Sum', '3.5')])
+                    self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'result': 3.5})
+                self.assertEqual(mock_execute.call_count, 1)
+
+                # Different request
+                status, _, content_bytes = app.request('GET', '/sumNumbers', query_string='values.0=1')
+                self.assertEqual(status, '200 OK')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'result': 1})
+                self.assertEqual(mock_execute.call_count, 2)
+
+                # Errors are not cached
+                for _ in range(2):
+                    status, _, content_bytes = app.request('GET', '/sumNumbers', query_string='values.0=-1')
+                    self.assertEqual(status, '400 Bad Request')
+                    self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'Negative'})
+                self.assertEqual(mock_execute.call_count, 4)
+
+                # WSGI API
+                for _ in range(2):
+                    status, headers, content_bytes = app.request('GET', '/testWSGI')
+                    self.assertEqual(status, '200 OK')
+                    self.assertEqual(headers, [('Content-Type', 'text/plain'), ('X-Test', 'test')])
+                    self.assertEqual(content_bytes, b'Hello')
+                self.assertEqual(mock_execute.call_count, 5)
+
+            # Cache statistics
+            status, _, content_bytes = app.request('GET', '/markdown_up_api_stats')
+            self.assertEqual(status, '200 OK')
+            stats = json.loads(content_bytes.decode('utf-8'))
+            self.assertEqual(
+                [(api['name'], api['cache']['hits'], api['cache']['misses'], api['cache']['entries']) for api in stats['apis']],
+                [('sumNumbers', 2, 4, 2), ('testWSGI', 1, 1, 1)]
+            )
+            self.assertTrue(all(api['cache']['bytes'] > 0 and 'concurrency' not in api for api in stats['apis']))
+
+
+    def test_api_cache_ttl(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'sumNumbers', 'cache': {'ttlSeconds': 10}}
+                ],
+                'stats': True
+            })
+            with unittest.mock.patch('markdown_up.api._execute_api_fn', wraps=_execute_api_fn) as mock_execute:
+                with unittest.mock.patch('time.monotonic', return_value=1000):
+                    status, _, _ = app.request('GET', '/sumNumbers', query_string='values.0=1')
+                    self.assertEqual(status, '200 OK')
+                    self.assertEqual(mock_execute.call_count, 1)
+
+                # Not expired
+                with unittest.mock.patch('time.monotonic', return_value=1009):
+                    status, _, _ = app.request('GET', '/sumNumbers', query_string='values.0=1')
+                    self.assertEqual(status, '200 OK')
+                    self.assertEqual(mock_execute.call_count, 1)
+
+                # Expired
+                with unittest.mock.patch('time.monotonic', return_value=1010):
+                    status, _, _ = app.request('GET', '/sumNumbers', query_string='values.0=1')
+                    self.assertEqual(status, '200 OK')
+                    self.assertEqual(mock_execute.call_count, 2)
+
+
+    def test_api_cache_disabled(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'sumNumbers'}
+                ],
+                'stats': True
+            })
+            with unittest.mock.patch('markdown_up.api._execute_api_fn', wraps=_execute_api_fn) as mock_execute:
+                for _ in range(2):
+                    status, _, _ = app.request('GET', '/sumNumbers', query_string='values.0=1')
+                    self.assertEqual(status, '200 OK')
+                self.assertEqual(mock_execute.call_count, 2)
+            status, _, content_bytes = app.request('GET', '/markdown_up_api_stats')
+            self.assertEqual(status, '200 OK')
+            self.assertNotIn('cache', json.loads(content_bytes.decode('utf-8'))['apis'][0])
+
+
+    def test_api_response_cache_single_flight(self):
+        api_cache = APIResponseCache(60, 10, 10000)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def execute_fn():
+            calls.append(True)
+            started.set()
+            release.wait()
+            return {'result': 1}, {}
+
+        # Concurrent misses for the same key execute the function once
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(api_cache.call(b'key', execute_fn))) for _ in range(4)]
+        threads[0].start()
+        self.assertTrue(started.wait(5))
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(responses, [({'result': 1}, {})] * 4)
+        self.assertEqual((api_cache.hits, api_cache.misses), (3, 1))
+        self.assertEqual(api_cache.pending, {})
+
+
+    def test_api_response_cache_error(self):
+        api_cache = APIResponseCache(60, 10, 10000)
+
+        def execute_fn():
+            raise ValueError('error')
+
+        # Errors are not cached and the pending request is cleared
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                api_cache.call(b'key', execute_fn)
+        self.assertEqual((api_cache.hits, api_cache.misses), (0, 2))
+        self.assertEqual(api_cache.pending, {})
+        self.assertEqual(len(api_cache.responses), 0)
+
+
+class TestMarkdownUpAPIProcess(unittest.TestCase):
+
+    def test_api_process(self):
+        test_files = [
+            ('test.smd', '''\
+action sumNumbers
+    urls
+        GET
+
+    query
+        float[] values
+
+    output
+        float result
+
+    errors
+        Negative
+
+
+action testWSGI
+    urls
+        GET
+'''),
+            ('test.bare', '''\
+function sumNumbers(request):
+    result = 0
+    for value in objectGet(request, 'values'):
+        if value < 0:
+            apiError('Negative')
+            return
+        endif
+        result = result + value
+    endfor
+    systemLog('Sum is ' + result)
+    apiHeader('X-Sum', stringNew(result))
+    return {'result': result}
+endfunction
+
+function testWSGI(request):
+    return ['200 OK', [['Content-Type', 'text/plain']], vName]
+endfunction
+''')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'globals': {'vName': 'Tom'}}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'sumNumbers', 'executor': 'process'},
+                    {'name': 'testWSGI', 'wsgi': True, 'executor': 'process'}
+                ],
+                'processes': 1
+            })
+            try:
+                self.assertIsNotNone(app.api_executor)
+
+                # The response, headers, and logged lines are relayed from the API worker process
+                wsgi_errors = StringIO()
+                status, headers, content_bytes = app.request(
+                    'GET', '/sumNumbers', query_string='values.0=1&values.1=2.5', environ={'wsgi.errors': wsgi_errors}
+                )
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(headers, [('Content-Type', 'application/json'), ('X-Sum', '3.5')])
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'result': 3.5})
+                self.assertEqual(wsgi_errors.getvalue(), 'Sum is 3.5\n')
+
+                # Errors are relayed from the API worker process
+                status, _, content_bytes = app.request('GET', '/sumNumbers', query_string='values.0=-1')
+                self.assertEqual(status, '400 Bad Request')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'Negative'})
+
+                # WSGI API - the API worker process has the config globals
+                status, headers, content_bytes = app.request('GET', '/testWSGI')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(headers, [('Content-Type', 'text/plain')])
+                self.assertEqual(content_bytes, b'Tom')
+            finally:
+                app.close()
+            self.assertIsNone(app.api_executor)
+
+
+    def test_api_process_error(self):
+        test_files = [
+            ('test.smd', 'action testError\n\naction testOK\n'),
+            ('test.bare', '''\
+function testError(request):
+    unknownFunction()
+endfunction
+
+function testOK(request):
+    return {}
+endfunction
+''')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testError', 'executor': 'process'},
+                    {'name': 'testOK', 'executor': 'process'}
+                ],
+                'processes': 1
+            })
+            try:
+                # The API worker process's runtime error is re-raised
+                wsgi_errors = StringIO()
+                status, _, content_bytes = app.request(
+                    'POST', '/testError', wsgi_input=b'{}', environ={'wsgi.errors': wsgi_errors}
+                )
+                self.assertEqual(status, '500 Internal Server Error')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'UnexpectedError'})
+                self.assertIn('Undefined function "unknownFunction"', wsgi_errors.getvalue())
+
+                # The process pool is not broken
+                status, _, content_bytes = app.request('POST', '/testOK', wsgi_input=b'{}')
+                self.assertEqual(status, '200 OK')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {})
+            finally:
+                app.close()
+
+
+    def test_api_process_error_other(self):
+        with unittest.mock.patch('markdown_up.api._call_api_fn', side_effect=ValueError('Bad value')), \
+             unittest.mock.patch.dict('markdown_up.api._API_PROCESS_STATE', {'globals': {}}):
+            self.assertEqual(
+                _api_process_call('test', False, None, None, {}),
+                (None, None, None, [], ('error', 'ValueError: Bad value'))
+            )
+
+
+    def test_api_process_pool_broken(self):
+        with create_test_files([('test.smd', 'action test\n'), ('test.bare', 'function test():\nendfunction\n')]) as temp_dir:
+            api_config = {'schemas': ['test.smd'], 'scripts': ['test.bare'], 'apis': [], 'processes': 1}
+            api_pool = APIProcessPool(temp_dir, {}, api_config)
+            try:
+                # A worker process exits abruptly, breaking the pool - the pool is recreated
+                executor = api_pool.executor
+                with self.assertRaises(BrokenProcessPool):
+                    api_pool.call(os._exit, 1)
+                self.assertIsNot(api_pool.executor, executor)
+                self.assertEqual(api_pool.call(abs, -1), 1)
+            finally:
+                api_pool.shutdown()
+
+
+    def test_api_process_none(self):
+        with create_test_files([('test.smd', 'action test\n'), ('test.bare', 'function test():\nendfunction\n')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'test', 'executor': 'thread'}
+                ]
+            })
+            self.assertIsNone(app.api_executor)
+
+
+class TestMarkdownUpAPIConcurrency(unittest.TestCase):
+
+    def test_api_concurrency(self):
+        test_files = [
+            ('test.smd', '''\
+action sumNumbers
+    urls
+        GET
+
+    query
+        float[] values
+
+    output
+        float result
+
+
+action testErrors
+    urls
+        GET
+
+    errors
+        TestError
+        Unavailable
+'''),
+            ('test.bare', '''\
+function sumNumbers(request):
+    result = 0
+    for value in objectGet(request, 'values'):
+        result = result + value
+    endfor
+    return {'result': result}
+endfunction
+
+function testErrors(request):
+    apiError('TestError')
+endfunction
+''')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'sumNumbers', 'maxConcurrent': 1},
+                    {'name': 'testErrors', 'maxConcurrent': 2, 'maxQueue': 1}
+                ],
+                'stats': True
+            })
+
+            # Within the limit
+            status, _, content_bytes = app.request('GET', '/sumNumbers', query_string='values.0=1')
+            self.assertEqual(status, '200 OK')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'result': 1})
+            status, _, content_bytes = app.request('GET', '/testErrors')
+            self.assertEqual(status, '400 Bad Request')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'TestError'})
+
+            # Queue full
+            with unittest.mock.patch.object(APIConcurrencyLimit, 'acquire', return_value=False):
+                status, headers, content_bytes = app.request('GET', '/sumNumbers', query_string='values.0=1')
+                self.assertEqual(status, '503 Service Unavailable')
+                self.assertEqual(headers, [('Content-Type', 'application/json'), ('Retry-After', '1')])
+                self.assertDictEqual(
+                    json.loads(content_bytes.decode('utf-8')),
+                    {'error': 'Unavailable', 'message': 'Too many concurrent requests'}
+                )
+
+                # The schema's errors are kept
+                status, _, content_bytes = app.request('GET', '/testErrors')
+                self.assertEqual(status, '503 Service Unavailable')
+                self.assertEqual(json.loads(content_bytes.decode('utf-8'))['error'], 'Unavailable')
+
+            # Statistics
+            status, _, content_bytes = app.request('GET', '/markdown_up_api_stats')
+            self.assertEqual(status, '200 OK')
+            stats = json.loads(content_bytes.decode('utf-8'))
+            self.assertEqual(
+                [(api['name'], api['execution']['calls'], api['concurrency']) for api in stats['apis']],
+                [
+                    ('sumNumbers', 1, {'inFlight': 0, 'queued': 0, 'rejected': 0}),
+                    ('testErrors', 1, {'inFlight': 0, 'queued': 0, 'rejected': 0})
+                ]
+            )
+
+
+    def test_api_concurrency_limit(self):
+        api_limit = APIConcurrencyLimit(1, 1)
+        self.assertTrue(api_limit.acquire())
+        self.assertEqual((api_limit.in_flight, api_limit.queued), (1, 0))
+
+        # The second request waits in the queue
+        acquired = threading.Event()
+        def acquire_queued():
+            self.assertTrue(api_limit.acquire())
+            acquired.set()
+        queued_thread = threading.Thread(target=acquire_queued)
+        queued_thread.start()
+        self.assertTrue(wait_for(lambda: api_limit.queued == 1))
+        self.assertFalse(acquired.is_set())
+
+        # The queue is full
+        self.assertFalse(api_limit.acquire())
+        self.assertEqual(api_limit.rejected, 1)
+
+        # Release - the queued request executes
+        api_limit.release()
+        queued_thread.join()
+        self.assertTrue(acquired.is_set())
+        self.assertEqual((api_limit.in_flight, api_limit.queued), (1, 0))
+        api_limit.release()
+        self.assertEqual((api_limit.in_flight, api_limit.queued, api_limit.rejected), (0, 0, 1))
+
+
+class TestMarkdownUpAPIBudget(unittest.TestCase):
+
+    TEST_FILES = [
+        ('test.smd', '''\
+action testLoop
+    urls
+        GET
+
+    query
+        int count
+
+
+action testError
+    urls
+        GET
+'''),
+        ('test.bare', '''\
+function testLoopHelper(count):
+    ix = 0
+    while count < 0 || ix < count:
+        ix = ix + 1
+    endwhile
+endfunction
+
+function testLoop(request):
+    testLoopHelper(objectGet(request, 'count'))
+endfunction
+
+function testError(request):
+    unknownFunction()
+endfunction
+''')
+    ]
+
+
+    def test_api_budget_statements(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testLoop', 'maxStatements': 100},
+                    {'name': 'testError', 'maxStatements': 100}
+                ],
+                'stats': True
+            })
+
+            # Within the budget
+            status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=5')
+            self.assertEqual(status, '200 OK')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {})
+
+            # Exceeded - the statement limit error is raised from the nested function call
+            status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=-1')
+            self.assertEqual(status, '503 Service Unavailable')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                'error': 'StatementLimit',
+                'message': 'Exceeded the maximum API statements (100)'
+            })
+
+            # Other runtime errors are unexpected errors
+            wsgi_errors = StringIO()
+            status, _, content_bytes = app.request('GET', '/testError', environ={'wsgi.errors': wsgi_errors})
+            self.assertEqual(status, '500 Internal Server Error')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'UnexpectedError'})
+
+            # Statistics
+            status, _, content_bytes = app.request('GET', '/markdown_up_api_stats')
+            self.assertEqual(status, '200 OK')
+            stats = json.loads(content_bytes.decode('utf-8'))
+            execution = stats['apis'][1]['execution']
+            self.assertEqual(stats['apis'][1]['name'], 'testLoop')
+            self.assertEqual((execution['calls'], execution['maxStatements']), (2, 101))
+            self.assertEqual((execution['statementLimits'], execution['timeouts']), (1, 0))
+            self.assertGreater(execution['statements'], 101)
+
+            # The unexpected error is not recorded
+            self.assertEqual(stats['apis'][0]['execution']['calls'], 0)
+
+
+    def test_api_budget_timeout(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testLoop', 'timeoutMs': 10}
+                ],
+                'stats': True
+            })
+
+            # Within the budget
+            status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=5')
+            self.assertEqual(status, '200 OK')
+
+            # Exceeded - the timeout is checked when the execution completes
+            monotonic_times = iter(range(100))
+            with unittest.mock.patch('time.monotonic', side_effect=lambda: next(monotonic_times) * 0.011):
+                status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=5')
+            self.assertEqual(status, '504 Gateway Timeout')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                'error': 'Timeout',
+                'message': 'Exceeded the API timeout (10 milliseconds)'
+            })
+
+            # Statistics
+            status, _, content_bytes = app.request('GET', '/markdown_up_api_stats')
+            self.assertEqual(status, '200 OK')
+            execution = json.loads(content_bytes.decode('utf-8'))['apis'][0]['execution']
+            self.assertEqual((execution['calls'], execution['statementLimits'], execution['timeouts']), (2, 0, 1))
+            self.assertGreater(execution['maxStatements'], 5)
+
+
+    def test_api_budget_timeout_statements(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testLoop', 'maxStatements': 100, 'timeoutMs': 1}
+                ]
+            })
+
+            # The statement limit takes precedence over the timeout
+            monotonic_times = iter(range(100))
+            with unittest.mock.patch('time.monotonic', side_effect=lambda: next(monotonic_times) * 0.011):
+                status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=-1')
+            self.assertEqual(status, '503 Service Unavailable')
+            self.assertEqual(json.loads(content_bytes.decode('utf-8'))['error'], 'StatementLimit')
+
+
+    def test_api_budget_timeout_process(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testLoop', 'executor': 'process', 'timeoutMs': 2000}
+                ],
+                'processes': 1,
+                'stats': True
+            })
+            try:
+                # Within the budget
+                status, _, _ = app.request('GET', '/testLoop', query_string='count=5')
+                self.assertEqual(status, '200 OK')
+
+                # Exceeded - the API worker process is terminated
+                status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=-1')
+                self.assertEqual(status, '504 Gateway Timeout')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                    'error': 'Timeout',
+                    'message': 'Exceeded the API timeout (2000 milliseconds)'
+                })
+
+                # The pool is recreated
+                status, _, _ = app.request('GET', '/testLoop', query_string='count=5')
+                self.assertEqual(status, '200 OK')
+
+                # Statistics
+                status, _, content_bytes = app.request('GET', '/markdown_up_api_stats')
+                self.assertEqual(status, '200 OK')
+                execution = json.loads(content_bytes.decode('utf-8'))['apis'][0]['execution']
+                self.assertEqual((execution['calls'], execution['statementLimits'], execution['timeouts']), (3, 0, 1))
+            finally:
+                app.close()
+
+
+    def test_api_stats_disabled(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testLoop', 'maxStatements': 100}
+                ]
+            })
+
+            # The execution budget is enforced, but statistics are not recorded
+            execution = next(request for request in app.requests.values() if request.name == 'testLoop').action_callback.args[-1]
+            self.assertFalse(execution.stats)
+            with unittest.mock.patch.object(execution, 'lock') as mock_lock:
+                status, _, _ = app.request('GET', '/testLoop', query_string='count=-1')
+                self.assertEqual(status, '503 Service Unavailable')
+                mock_lock.__enter__.assert_not_called()
+            self.assertEqual(execution.calls, 0)
+
+            # The statistics API is not added
+            status, _, _ = app.request('GET', '/markdown_up_api_stats')
+            self.assertEqual(status, '404 Not Found')
+
+
+    def test_api_budget_process(self):
+        with create_test_files(self.TEST_FILES) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {}, {
+                'schemas': ['test.smd'],
+                'scripts': ['test.bare'],
+                'apis': [
+                    {'name': 'testLoop', 'executor': 'process', 'maxStatements': 100}
+                ],
+                'processes': 1
+            })
+            try:
+                status, _, content_bytes = app.request('GET', '/testLoop', query_string='count=-1')
+                self.assertEqual(status, '503 Service Unavailable')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                    'error': 'StatementLimit',
+                    'message': 'Exceeded the maximum API statements (100)'
+                })
+            finally:
+                app.close()
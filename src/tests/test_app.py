@@ -2,16 +2,21 @@
 # https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
 
 from contextlib import contextmanager
+import email.utils
+import gzip
+import hashlib
 from io import StringIO
 import json
 import os
 import re
 from tempfile import TemporaryDirectory
+import time
 import unittest
 import unittest.mock
+import zlib
 
 import chisel.app
-from markdown_up.app import MarkdownUpApplication, create_markdown_up_stub
+from markdown_up.app import MarkdownUpApplication, create_markdown_up_inline_stub, create_markdown_up_stub, markdown_up_stub_etag
 
 
 # Helper context manager to create a list of files in a temporary directory
@@ -31,6 +36,21 @@ def create_test_files(file_defs):
         tempdir.cleanup()
 
 
+# Helper to compute a static file's expected validator headers
+def static_validator_headers(temp_dir, posix_path, stub=False):
+    path = os.path.join(temp_dir, *posix_path.split('/'))
+    if stub:
+        path_stat = os.stat(os.path.dirname(path))
+        etag = f'"{hashlib.md5(create_markdown_up_stub(os.path.basename(path))).hexdigest()}"'
+    else:
+        path_stat = os.stat(path)
+        etag = f'"{path_stat.st_mtime_ns:x}-{path_stat.st_size:x}"'
+    headers = [('ETag', etag), ('Last-Modified', email.utils.formatdate(path_stat.st_mtime_ns // 1_000_000_000, usegmt=True))]
+    if stub:
+        headers.append(('Vary', 'Accept-Encoding'))
+    return headers
+
+
 class TestMarkdownUp(unittest.TestCase):
 
     def test_init(self):
@@ -41,6 +61,7 @@ class TestMarkdownUp(unittest.TestCase):
         self.assertTrue('index.html' in (request.name for request in app.requests.values()))
         self.assertTrue('markdownUpIndex.bare' in (request.name for request in app.requests.values()))
         self.assertTrue('markdown_up_index' in (request.name for request in app.requests.values()))
+        self.assertTrue('markdown_up_tree' in (request.name for request in app.requests.values()))
         self.assertTrue('chisel_doc' in (request.name for request in app.requests.values()))
         self.assertTrue('markdown-up/VERSION.txt' in (request.name for request in app.requests.values()))
 
@@ -53,6 +74,7 @@ class TestMarkdownUp(unittest.TestCase):
         self.assertFalse('index.html' in (request.name for request in app.requests.values()))
         self.assertFalse('markdownUpIndex.bare' in (request.name for request in app.requests.values()))
         self.assertFalse('markdown_up_index' in (request.name for request in app.requests.values()))
+        self.assertFalse('markdown_up_tree' in (request.name for request in app.requests.values()))
         self.assertFalse('chisel_doc' in (request.name for request in app.requests.values()))
         self.assertTrue('markdown-up/VERSION.txt' in (request.name for request in app.requests.values()))
 
@@ -96,7 +118,7 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/html; charset=utf-8'), ('ETag', '00890c48e54acdf4c568d071e9042ab6')]
+                [('Content-Type', 'text/html; charset=utf-8'), *static_validator_headers(temp_dir, 'sub/index.md', stub=True)]
             )
             self.assertTrue(content, [create_markdown_up_stub('index.md')])
 
@@ -107,7 +129,11 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/html; charset=utf-8'), ('ETag', 'c83301425b2ad1d496473a5ff3d9ecca')]
+                [
+                    ('Content-Type', 'text/html; charset=utf-8'),
+                    *static_validator_headers(temp_dir, 'sub2/index.html'),
+                    ('Accept-Ranges', 'bytes')
+                ]
             )
             self.assertEqual(content, [b'<html></html>'])
 
@@ -129,17 +155,21 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/markdown; charset=utf-8'), ('ETag', '38cdd67987afb67a4af89ea02044a00e')]
+                [
+                    ('Content-Type', 'text/markdown; charset=utf-8'),
+                    *static_validator_headers(temp_dir, 'README.md'),
+                    ('Accept-Ranges', 'bytes')
+                ]
             )
             self.assertEqual(content, [b'# Title'])
 
             # File unmodified
             environ = chisel.Context.create_environ('GET', '/README.md')
-            environ['HTTP_IF_NONE_MATCH'] = '38cdd67987afb67a4af89ea02044a00e'
+            environ['HTTP_IF_NONE_MATCH'] = static_validator_headers(temp_dir, 'README.md')[0][1]
             start_response = chisel.app.StartResponse()
             content = app(environ, start_response)
             self.assertEqual(start_response.status, '304 Not Modified')
-            self.assertEqual(start_response.headers, [])
+            self.assertEqual(start_response.headers, static_validator_headers(temp_dir, 'README.md'))
             self.assertEqual(content, [])
 
             # Auto HTML stub
@@ -149,17 +179,17 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/html; charset=utf-8'), ('ETag', 'e9609c26809eb178142eee1ececf314b')]
+                [('Content-Type', 'text/html; charset=utf-8'), *static_validator_headers(temp_dir, 'README.md', stub=True)]
             )
             self.assertEqual(content, [create_markdown_up_stub('README.md')])
 
             # Auto HTML stub unmodified
             environ = chisel.Context.create_environ('GET', '/README.html')
-            environ['HTTP_IF_NONE_MATCH'] = 'e9609c26809eb178142eee1ececf314b'
+            environ['HTTP_IF_NONE_MATCH'] = static_validator_headers(temp_dir, 'README.md', stub=True)[0][1]
             start_response = chisel.app.StartResponse()
             content = app(environ, start_response)
             self.assertEqual(start_response.status, '304 Not Modified')
-            self.assertEqual(start_response.headers, [])
+            self.assertEqual(start_response.headers, static_validator_headers(temp_dir, 'README.md', stub=True))
             self.assertEqual(content, [])
 
             # Not found
@@ -215,7 +245,7 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/html; charset=utf-8'), ('ETag', 'e9609c26809eb178142eee1ececf314b')]
+                [('Content-Type', 'text/html; charset=utf-8'), *static_validator_headers(temp_dir, 'README.md', stub=True)]
             )
             self.assertTrue(content, [create_markdown_up_stub('README.md')])
 
@@ -237,7 +267,7 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/html; charset=utf-8'), ('ETag', '00890c48e54acdf4c568d071e9042ab6')]
+                [('Content-Type', 'text/html; charset=utf-8'), *static_validator_headers(temp_dir, 'sub/index.md', stub=True)]
             )
             self.assertTrue(content, [create_markdown_up_stub('index.md')])
 
@@ -248,7 +278,11 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/html; charset=utf-8'), ('ETag', 'c83301425b2ad1d496473a5ff3d9ecca')]
+                [
+                    ('Content-Type', 'text/html; charset=utf-8'),
+                    *static_validator_headers(temp_dir, 'sub2/index.html'),
+                    ('Accept-Ranges', 'bytes')
+                ]
             )
             self.assertEqual(content, [b'<html></html>'])
 
@@ -270,17 +304,21 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/markdown; charset=utf-8'), ('ETag', '38cdd67987afb67a4af89ea02044a00e')]
+                [
+                    ('Content-Type', 'text/markdown; charset=utf-8'),
+                    *static_validator_headers(temp_dir, 'README.md'),
+                    ('Accept-Ranges', 'bytes')
+                ]
             )
             self.assertEqual(content, [b'# Title'])
 
             # File unmodified
             environ = chisel.Context.create_environ('GET', '/README.md')
-            environ['HTTP_IF_NONE_MATCH'] = '38cdd67987afb67a4af89ea02044a00e'
+            environ['HTTP_IF_NONE_MATCH'] = static_validator_headers(temp_dir, 'README.md')[0][1]
             start_response = chisel.app.StartResponse()
             content = app(environ, start_response)
             self.assertEqual(start_response.status, '304 Not Modified')
-            self.assertEqual(start_response.headers, [])
+            self.assertEqual(start_response.headers, static_validator_headers(temp_dir, 'README.md'))
             self.assertEqual(content, [])
 
             # Auto HTML stub
@@ -290,17 +328,17 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(start_response.status, '200 OK')
             self.assertEqual(
                 start_response.headers,
-                [('Content-Type', 'text/html; charset=utf-8'), ('ETag', 'e9609c26809eb178142eee1ececf314b')]
+                [('Content-Type', 'text/html; charset=utf-8'), *static_validator_headers(temp_dir, 'README.md', stub=True)]
             )
             self.assertEqual(content, [create_markdown_up_stub('README.md')])
 
             # Auto HTML stub unmodified
             environ = chisel.Context.create_environ('GET', '/README.html')
-            environ['HTTP_IF_NONE_MATCH'] = 'e9609c26809eb178142eee1ececf314b'
+            environ['HTTP_IF_NONE_MATCH'] = static_validator_headers(temp_dir, 'README.md', stub=True)[0][1]
             start_response = chisel.app.StartResponse()
             content = app(environ, start_response)
             self.assertEqual(start_response.status, '304 Not Modified')
-            self.assertEqual(start_response.headers, [])
+            self.assertEqual(start_response.headers, static_validator_headers(temp_dir, 'README.md', stub=True))
             self.assertEqual(content, [])
 
             # Not found
@@ -328,15 +366,42 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(content, [b'Method Not Allowed'])
 
             # Verify no requests were added
-            self.assertTrue('/' in app.requests)
-            self.assertTrue('/sub' in app.requests)
-            self.assertTrue('/sub/' in app.requests)
-            self.assertTrue('/sub2/' in app.requests)
+            self.assertFalse('/' in app.requests)
+            self.assertFalse('/sub' in app.requests)
+            self.assertFalse('/sub/' in app.requests)
+            self.assertFalse('/sub2/' in app.requests)
             self.assertFalse('/sub3/' in app.requests)
-            self.assertTrue('/README.html' in app.requests)
-            self.assertTrue('/README.md' in app.requests)
+            self.assertFalse('/README.html' in app.requests)
+            self.assertFalse('/README.md' in app.requests)
             self.assertFalse('/not-found.md' in app.requests)
 
+            # Verify the statics were cached
+            self.assertIsNotNone(app.static_cache.get('/'))
+            self.assertIsNotNone(app.static_cache.get('/sub'))
+            self.assertIsNotNone(app.static_cache.get('/sub/'))
+            self.assertIsNotNone(app.static_cache.get('/sub2/'))
+            self.assertIsNone(app.static_cache.get('/sub3/'))
+            self.assertIsNotNone(app.static_cache.get('/README.html'))
+            self.assertIsNotNone(app.static_cache.get('/README.md'))
+            self.assertIsNone(app.static_cache.get('/not-found.md'))
+
+
+    def test_static_release_no_revalidate(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'release': True})
+            status, _, content_bytes = app.request('GET', '/README.md')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title')
+
+            # Release mode cache hits are not revalidated
+            with open(os.path.join(temp_dir, 'README.md'), 'w', encoding='utf-8') as readme_file:
+                readme_file.write('# Title 2')
+            with unittest.mock.patch('os.stat') as mock_stat:
+                status, _, content_bytes = app.request('GET', '/README.md')
+                mock_stat.assert_not_called()
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title')
+
 
     def test_static_unknown_extension(self):
         test_files = [
@@ -356,6 +421,9 @@ class TestMarkdownUp(unittest.TestCase):
                 wsgi_errors.getvalue()
             ), wsgi_errors.getvalue())
 
+            # Unknown content types are not cached as not found
+            self.assertEqual(len(app.not_found_cache), 0)
+
 
     def test_static_unknown_extension_not_found(self):
         test_files = []
@@ -369,6 +437,871 @@ class TestMarkdownUp(unittest.TestCase):
             self.assertEqual(content, [b'Not Found'])
 
 
+    def test_create_markdown_up_stub(self):
+        stub = create_markdown_up_stub("my doc's.md")
+        self.assertTrue(stub.startswith(b'<!DOCTYPE html>\n'))
+        self.assertIn(b"""
+        const app = new MarkdownUp(window, {
+            'url': 'my%20doc%27s.md'
+        });
+""", stub)
+        self.assertTrue(stub.endswith(b'</html>\n'))
+
+        # Memoized
+        self.assertIs(create_markdown_up_stub("my doc's.md"), stub)
+        self.assertEqual(markdown_up_stub_etag("my doc's.md"), f'"{hashlib.md5(stub).hexdigest()}"')
+        self.assertIs(markdown_up_stub_etag("my doc's.md"), markdown_up_stub_etag("my doc's.md"))
+
+
+    def test_create_markdown_up_inline_stub(self):
+        stub = create_markdown_up_inline_stub("my doc's.md", '# Title\n\n</script><b>&</b> \u2028\u2029 "\u00e9"\n')
+        self.assertTrue(stub.startswith(b'<!DOCTYPE html>\n'))
+        self.assertIn(b"""
+        const app = new MarkdownUp(window, {
+            'url': 'my%20doc%27s.md',
+            'markdownText': "# Title\\n\\n\\u003c/script\\u003e\\u003cb\\u003e\\u0026\\u003c/b\\u003e \\u2028\\u2029 \\"\xc3\xa9\\"\\n"
+        });
+""", stub)
+        self.assertTrue(stub.endswith(b'</html>\n'))
+
+
+    def test_static_inline(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('large.md', '# Large' + 'x' * 100),
+            (('sub', 'index.md'), '# Index')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'inlineBytes': 100})
+            self.assertEqual(app.inline_bytes, 100)
+            readme_path = os.path.join(temp_dir, 'README.md')
+
+            # Inline stub
+            status, headers, content_bytes = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_inline_stub('README.md', '# Title'))
+            self.assertEqual(headers[0], ('Content-Type', 'text/html; charset=utf-8'))
+            self.assertEqual(headers[1], ('ETag', f'"{hashlib.md5(content_bytes).hexdigest()}"'))
+            status, _, content_bytes = app.request('GET', '/sub/')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_inline_stub('index.md', '# Index'))
+
+            # Too large to inline
+            status, _, content_bytes = app.request('GET', '/large.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('large.md'))
+
+            # Modify the Markdown file - the cached inline stub is revalidated
+            with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                readme_file.write('# Title 2')
+            status, _, content_bytes = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_inline_stub('README.md', '# Title 2'))
+
+            # Shrink the large Markdown file - it's now inlined
+            with open(os.path.join(temp_dir, 'large.md'), 'w', encoding='utf-8') as large_file:
+                large_file.write('# Large')
+            status, _, content_bytes = app.request('GET', '/large.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_inline_stub('large.md', '# Large'))
+
+            # Invalid UTF-8 Markdown files aren't inlined
+            with open(readme_path, 'wb') as readme_file:
+                readme_file.write(b'# \xff')
+            status, _, content_bytes = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('README.md'))
+
+
+    def test_static_preload(self):
+        test_files = [
+            ('README.md', '# Title\n\n![Image](image.png)\n\n```markdown-script\ninclude \'lib.bare\'\n```\n'),
+            ('my doc.md', '# My Doc'),
+            (('sub', 'index.md'), '# Index\n\n![Image](../image.png)\n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'preload': True})
+            self.assertIsNotNone(app.preload_cache)
+            readme_path = os.path.join(temp_dir, 'README.md')
+
+            # Stub with preload links
+            status, headers, content_bytes = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('README.md'))
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/html; charset=utf-8'),
+                *static_validator_headers(temp_dir, 'README.md', stub=True),
+                ('Link', '<README.md>; rel=preload; as=fetch; crossorigin'),
+                ('Link', '<image.png>; rel=preload; as=image'),
+                ('Link', '<lib.bare>; rel=preload; as=fetch; crossorigin')
+            ])
+            self.assertEqual(len(app.preload_cache), 1)
+            status, headers, _ = app.request('GET', '/my doc.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-1], ('Link', '<my%20doc.md>; rel=preload; as=fetch; crossorigin'))
+            status, headers, _ = app.request('GET', '/sub/')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-2:], [
+                ('Link', '<index.md>; rel=preload; as=fetch; crossorigin'),
+                ('Link', '<../image.png>; rel=preload; as=image')
+            ])
+
+            # Cached analysis - the Markdown file is not re-read
+            app.static_cache = None
+            with unittest.mock.patch('builtins.open') as mock_open:
+                status, headers, _ = app.request('GET', '/README.html')
+                mock_open.assert_not_called()
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-1], ('Link', '<lib.bare>; rel=preload; as=fetch; crossorigin'))
+
+            # Modify the Markdown file - the preload links are updated
+            with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                readme_file.write('# Title 2\n\n![Image 2](image2.png)\n')
+            status, headers, _ = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-2:], [
+                ('Link', '<README.md>; rel=preload; as=fetch; crossorigin'),
+                ('Link', '<image2.png>; rel=preload; as=image')
+            ])
+
+            # Inline stubs don't preload the Markdown file
+            app = MarkdownUpApplication(temp_dir, {'preload': True, 'inlineBytes': 1000})
+            status, headers, content_bytes = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_inline_stub('README.md', '# Title 2\n\n![Image 2](image2.png)\n'))
+            self.assertEqual(headers[-1], ('Link', '<image2.png>; rel=preload; as=image'))
+            self.assertNotIn(('Link', '<README.md>; rel=preload; as=fetch; crossorigin'), headers)
+
+            # Preload disabled
+            app = MarkdownUpApplication(temp_dir)
+            self.assertIsNone(app.preload_cache)
+            status, headers, _ = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertNotIn('Link', (header for header, _ in headers))
+
+
+    def test_static_bundle(self):
+        test_files = [
+            ('app.bare', "include <args.bare>\ninclude 'lib.bare'\n\nx = lib()\n"),
+            ('lib.bare', 'function lib():\n    return 1\nendfunction\n'),
+            ('bad.bare', 'x = \n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'bundle': True})
+            self.assertTrue(app.bundle)
+
+            # Bundled script
+            bundle_content = b'include <args.bare>\nfunction lib():\n    return 1\nendfunction\n\n\nx = lib()\n'
+            status, headers, content_bytes = app.request('GET', '/app.bare')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[:2], [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('ETag', f'"{hashlib.md5(bundle_content).hexdigest()}"')
+            ])
+            self.assertEqual(content_bytes, bundle_content)
+
+            # Modify the included file - the bundle is revalidated
+            with open(os.path.join(temp_dir, 'lib.bare'), 'w', encoding='utf-8') as lib_file:
+                lib_file.write('function lib():\n    return 2\nendfunction\n')
+            status, _, content_bytes = app.request('GET', '/app.bare')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'include <args.bare>\nfunction lib():\n    return 2\nendfunction\n\n\nx = lib()\n')
+
+            # Scripts that can't be bundled are served as-is
+            status, headers, content_bytes = app.request('GET', '/bad.bare')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'x = \n')
+            self.assertIn(('Accept-Ranges', 'bytes'), headers)
+
+            # Bundling disabled
+            app = MarkdownUpApplication(temp_dir)
+            self.assertFalse(app.bundle)
+            status, _, content_bytes = app.request('GET', '/app.bare')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b"include <args.bare>\ninclude 'lib.bare'\n\nx = lib()\n")
+
+
+    def test_static_cache(self):
+        test_files = [
+            ('README.md', '# Title'),
+            (('sub', 'index.md'), '# index.md')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            self.assertEqual(app.static_cache.max_bytes, 64 * 1024 * 1024)
+
+            # Cache miss
+            status, _, content_bytes = app.request('GET', '/README.md')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title')
+            self.assertEqual(len(app.static_cache), 1)
+
+            # Cache hit - the file is not re-read
+            with unittest.mock.patch('builtins.open') as mock_open:
+                status, _, content_bytes = app.request('GET', '/README.md')
+                mock_open.assert_not_called()
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title')
+
+            # Modify the file - the cache entry is revalidated
+            readme_path = os.path.join(temp_dir, 'README.md')
+            with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                readme_file.write('# Title 2')
+            status, _, content_bytes = app.request('GET', '/README.md')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title 2')
+
+            # Directory index stub
+            status, _, content_bytes = app.request('GET', '/sub/')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('index.md'))
+            self.assertEqual(len(app.static_cache), 2)
+
+            # Add an HTML index file - the directory entry is revalidated
+            with open(os.path.join(temp_dir, 'sub', 'index.html'), 'w', encoding='utf-8') as index_file:
+                index_file.write('<html></html>')
+            status, _, content_bytes = app.request('GET', '/sub/')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'<html></html>')
+
+            # Delete the file
+            os.remove(readme_path)
+            status, _, content_bytes = app.request('GET', '/README.md')
+            self.assertEqual(status, '404 Not Found')
+            self.assertEqual(content_bytes, b'Not Found')
+
+
+    def test_static_directory_cache(self):
+        test_files = [
+            ('README.md', '# Title'),
+            (('sub', 'index.md'), '# index.md')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'notFoundSeconds': 0})
+            self.assertIsNone(app.not_found_cache)
+
+            # Markdown stub - the parent directory is scanned once
+            status, _, content_bytes = app.request('GET', '/README.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('README.md'))
+            status, _, content_bytes = app.request('GET', '/other.html')
+            self.assertEqual(status, '404 Not Found')
+            self.assertEqual(content_bytes, b'Not Found')
+            self.assertEqual(len(app.directory_cache.snapshots), 1)
+
+            # Directory index - the directory snapshot is used to find the index file
+            status, _, content_bytes = app.request('GET', '/sub/')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('index.md'))
+            self.assertEqual(len(app.directory_cache.snapshots), 2)
+
+            # Cached snapshots - the directories are not re-scanned
+            app.static_cache = None
+            with unittest.mock.patch('os.scandir') as mock_scandir:
+                status, _, content_bytes = app.request('GET', '/README.html')
+                self.assertEqual(status, '200 OK')
+                status, _, content_bytes = app.request('GET', '/sub/')
+                self.assertEqual(status, '200 OK')
+                mock_scandir.assert_not_called()
+
+            # Add a Markdown file - the parent directory is re-scanned
+            with open(os.path.join(temp_dir, 'other.md'), 'w', encoding='utf-8') as other_file:
+                other_file.write('# Other')
+            status, _, content_bytes = app.request('GET', '/other.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('other.md'))
+
+
+    def test_static_prewarm(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('large.txt', 'x' * 1000),
+            ('test.unk', ''),
+            (('sub', 'index.html'), '<html></html>'),
+            (('sub', 'sub2', 'other.markdown'), '# Other')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'release': True, 'compressBytes': 0})
+            response_count, response_bytes = app.prewarm(max_file_bytes=100, workers=2)
+            self.assertEqual(response_count, 14)
+            self.assertEqual(response_bytes, app.static_cache.size)
+            self.assertEqual(
+                sorted(key for shard in app.static_cache.shards for key in shard.entries if isinstance(key, str)),
+                ['/', '/README.html', '/README.md', '/sub/', '/sub/index.html', '/sub/sub2/other.html', '/sub/sub2/other.markdown']
+            )
+            self.assertEqual(
+                sorted(key for shard in app.static_cache.shards for key in shard.entries if not isinstance(key, str)),
+                [
+                    ('/', 'gzip'), ('/README.html', 'gzip'), ('/README.md', 'gzip'), ('/sub/', 'gzip'), ('/sub/index.html', 'gzip'),
+                    ('/sub/sub2/other.html', 'gzip'), ('/sub/sub2/other.markdown', 'gzip')
+                ]
+            )
+
+            # Pre-warmed - the files are not read
+            with unittest.mock.patch('builtins.open') as mock_open:
+                status, _, content_bytes = app.request('GET', '/README.md')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(content_bytes, b'# Title')
+                status, _, content_bytes = app.request('GET', '/sub/sub2/other.html')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(content_bytes, create_markdown_up_stub('other.markdown'))
+                mock_open.assert_not_called()
+
+
+    def test_static_prewarm_max_bytes(self):
+        test_files = [
+            ('a.txt', 'a' * 100),
+            ('b.txt', 'b' * 100),
+            ('c.txt', 'c' * 100)
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'release': True, 'compress': False})
+            response_count, response_bytes = app.prewarm(max_bytes=150, workers=1)
+            self.assertEqual(response_count, 2)
+            self.assertEqual(response_bytes, 212)
+
+
+    def test_static_prewarm_symlink_cycle(self):
+        with create_test_files([('README.md', '# Title'), (('sub', 'info.md'), '# Info')]) as temp_dir:
+            os.symlink('.', os.path.join(temp_dir, 'loop'))
+            os.symlink('.', os.path.join(temp_dir, 'loop2'))
+            os.symlink('..', os.path.join(temp_dir, 'sub', 'up'))
+            app = MarkdownUpApplication(temp_dir, {'release': True, 'compress': False})
+
+            # Symbolic link cycles are visited once
+            response_count, _ = app.prewarm(workers=1)
+            self.assertEqual(response_count, 5)
+            self.assertEqual(
+                sorted(key for shard in app.static_cache.shards for key in shard.entries),
+                ['/', '/README.html', '/README.md', '/sub/info.html', '/sub/info.md']
+            )
+
+
+    def test_static_prewarm_root_not_found(self):
+        with create_test_files([]) as temp_dir:
+            app = MarkdownUpApplication(os.path.join(temp_dir, 'missing'), {'release': True})
+            self.assertEqual(app.prewarm(), (0, 0))
+
+
+    def test_static_prewarm_cache_disabled(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'cacheBytes': 0})
+            self.assertEqual(app.prewarm(), (0, 0))
+
+
+    def test_static_hot_manifest(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('other.txt', 'other')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            manifest_path = os.path.join(temp_dir, 'hot.json')
+            app = MarkdownUpApplication(temp_dir, {'hotManifest': manifest_path})
+            readme_etag = static_validator_headers(temp_dir, 'README.md')[0][1]
+            other_etag = static_validator_headers(temp_dir, 'other.txt')[0][1]
+
+            # Static requests are counted - not-found and pre-warm requests are not
+            for _ in range(3):
+                self.assertEqual(app.request('GET', '/README.md')[0], '200 OK')
+            self.assertEqual(app.request('GET', '/other.txt')[0], '200 OK')
+            self.assertEqual(app.request('GET', '/missing.txt')[0], '404 Not Found')
+            app.prewarm(path_infos=['/other.txt'])
+            self.assertEqual(app.hot_paths, {'/README.md': (3, readme_etag), '/other.txt': (1, other_etag)})
+
+            # Save the manifest - the manifest is not served
+            self.assertEqual(app.save_hot_manifest(manifest_path), 2)
+            with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+                self.assertEqual(json.load(manifest_file), {'paths': [
+                    {'path': '/README.md', 'hits': 3, 'etag': readme_etag},
+                    {'path': '/other.txt', 'hits': 1, 'etag': other_etag}
+                ]})
+            self.assertEqual(app.request('GET', '/hot.json')[0], '404 Not Found')
+            self.assertEqual(app.save_hot_manifest(manifest_path, 1), 1)
+            with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+                self.assertEqual(json.load(manifest_file), {'paths': [
+                    {'path': '/README.md', 'hits': 3, 'etag': readme_etag}
+                ]})
+
+            # Load the manifest - the hit counts are seeded
+            self.assertEqual(app.save_hot_manifest(manifest_path), 2)
+            app2 = MarkdownUpApplication(temp_dir, {'hotManifest': manifest_path})
+            self.assertEqual(app2.load_hot_manifest(manifest_path), ['/README.md', '/other.txt'])
+            self.assertEqual(app2.load_hot_manifest(manifest_path, 1), ['/README.md'])
+            self.assertEqual(app2.hot_paths, {'/README.md': (3, readme_etag), '/other.txt': (1, other_etag)})
+
+            # Pre-warm the manifest's paths
+            response_count, _ = app2.prewarm(path_infos=app2.load_hot_manifest(manifest_path))
+            self.assertEqual(response_count, 2)
+            with unittest.mock.patch('builtins.open') as mock_open:
+                status, _, content_bytes = app2.request('GET', '/README.md')
+                mock_open.assert_not_called()
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title')
+            self.assertEqual(app2.hot_paths['/README.md'], (4, readme_etag))
+
+
+    def test_static_hot_manifest_invalid(self):
+        test_files = [
+            ('missing-paths.json', '{}'),
+            ('invalid.json', 'asdf'),
+            ('bad-entry.json', '{"paths": [{"path": "/README.md"}]}')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'hotManifest': 'hot.json'})
+            for manifest_name in ('missing.json', 'missing-paths.json', 'invalid.json', 'bad-entry.json'):
+                self.assertEqual(app.load_hot_manifest(os.path.join(temp_dir, manifest_name)), [])
+            self.assertEqual(app.hot_paths, {})
+
+
+    def test_static_hot_manifest_disabled(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            self.assertIsNone(app.hot_paths)
+            self.assertEqual(app.request('GET', '/README.md')[0], '200 OK')
+
+            # Saving an empty manifest
+            manifest_path = os.path.join(temp_dir, 'hot.json')
+            self.assertEqual(app.save_hot_manifest(manifest_path), 0)
+            self.assertEqual(app.load_hot_manifest(manifest_path), [])
+            self.assertIsNone(app.hot_paths)
+
+
+    def test_static_watch(self):
+        test_files = [
+            ('README.md', '# Title'),
+            (('sub', 'index.md'), '# index.md')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'watch': True, 'watchPollSeconds': 0.01})
+            try:
+                self.assertIsNotNone(app.watcher)
+                status, _, content_bytes = app.request('GET', '/README.md')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(content_bytes, b'# Title')
+                status, _, _ = app.request('GET', '/sub/other.html')
+                self.assertEqual(status, '404 Not Found')
+
+                # Cached responses are revalidated without stat-ing
+                with unittest.mock.patch('os.stat') as mock_stat:
+                    status, _, content_bytes = app.request('GET', '/README.md')
+                    self.assertEqual(status, '200 OK')
+                    self.assertEqual(content_bytes, b'# Title')
+                    status, _, _ = app.request('GET', '/sub/other.html')
+                    self.assertEqual(status, '404 Not Found')
+                    mock_stat.assert_not_called()
+
+                # Modify a file and add a Markdown file - the changes are reflected without waiting for the not-found
+                # cache's time-to-live
+                readme_path = os.path.join(temp_dir, 'README.md')
+                with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                    readme_file.write('# Title 2')
+                with open(os.path.join(temp_dir, 'sub', 'other.md'), 'w', encoding='utf-8') as other_file:
+                    other_file.write('# Other')
+                end_time = time.monotonic() + 5
+                while (readme_path in app.watcher.keys or os.path.join(temp_dir, 'sub') in app.watcher.keys) and \
+                      time.monotonic() < end_time:
+                    time.sleep(0.01)
+                status, _, content_bytes = app.request('GET', '/README.md')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(content_bytes, b'# Title 2')
+                status, _, content_bytes = app.request('GET', '/sub/other.html')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(content_bytes, create_markdown_up_stub('other.md'))
+            finally:
+                app.close()
+            self.assertIsNone(app.watcher)
+
+            # Close without a watcher
+            app.close()
+
+
+    def test_static_not_found_cache(self):
+        test_files = [
+            ('README.md', '# Title'),
+            (('sub', 'other.txt'), 'other')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'release': True})
+            self.assertEqual(app.not_found_seconds, 10)
+
+            # Not found - the not-found path is cached
+            status, headers, content_bytes = app.request('GET', '/other.html')
+            self.assertEqual(status, '404 Not Found')
+            self.assertEqual(headers, [('Content-Type', 'text/plain')])
+            self.assertEqual(content_bytes, b'Not Found')
+            status, headers, content_bytes = app.request('GET', '/sub/')
+            self.assertEqual(status, '404 Not Found')
+            self.assertEqual(len(app.not_found_cache), 2)
+
+            # Cached not-found - the file system is not accessed
+            with unittest.mock.patch('os.stat') as mock_stat, \
+                 unittest.mock.patch('os.scandir') as mock_scandir:
+                status, headers, content_bytes = app.request('GET', '/other.html')
+                self.assertEqual(status, '404 Not Found')
+                self.assertEqual(headers, [('Content-Type', 'text/plain')])
+                self.assertEqual(content_bytes, b'Not Found')
+                status, headers, content_bytes = app.request('HEAD', '/other.html')
+                self.assertEqual(status, '404 Not Found')
+                self.assertEqual(headers, [('Content-Type', 'text/plain')])
+                self.assertEqual(content_bytes, b'')
+                mock_stat.assert_not_called()
+                mock_scandir.assert_not_called()
+
+            # Add the Markdown file - the cached not-found path is still served within its time-to-live
+            with open(os.path.join(temp_dir, 'other.md'), 'w', encoding='utf-8') as other_file:
+                other_file.write('# Other')
+            status, _, _ = app.request('GET', '/other.html')
+            self.assertEqual(status, '404 Not Found')
+
+            # Expired, unchanged directory - the entry's time-to-live is renewed
+            app.not_found_cache.get('/sub/').expires = 0
+            status, _, _ = app.request('GET', '/sub/')
+            self.assertEqual(status, '404 Not Found')
+            self.assertGreater(app.not_found_cache.get('/sub/').expires, 0)
+
+            # Expired, changed directory - the entry is removed
+            app.not_found_cache.get('/other.html').expires = 0
+            status, _, content_bytes = app.request('GET', '/other.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('other.md'))
+            self.assertIsNone(app.not_found_cache.get('/other.html'))
+
+
+    def test_static_not_found_cache_no_release(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+
+            # Not found - the not-found path is cached
+            status, _, _ = app.request('GET', '/other.html')
+            self.assertEqual(status, '404 Not Found')
+            self.assertEqual(len(app.not_found_cache), 1)
+
+            # Cached not-found - the directory's stat key is revalidated
+            with unittest.mock.patch('os.stat', wraps=os.stat) as mock_stat:
+                status, _, _ = app.request('GET', '/other.html')
+                self.assertEqual(status, '404 Not Found')
+                mock_stat.assert_called_once_with(temp_dir)
+
+            # Add the Markdown file - the cached not-found path is removed within its time-to-live
+            with open(os.path.join(temp_dir, 'other.md'), 'w', encoding='utf-8') as other_file:
+                other_file.write('# Other')
+            os.utime(temp_dir, ns=(0, 0))
+            status, _, content_bytes = app.request('GET', '/other.html')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, create_markdown_up_stub('other.md'))
+            self.assertIsNone(app.not_found_cache.get('/other.html'))
+
+
+    def test_static_not_found_cache_bad_method(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+
+            # Chisel bad-method responses are not cached
+            status, _, _ = app.request('POST', '/markdownUpIndex.bare')
+            self.assertEqual(status, '405 Method Not Allowed')
+            self.assertEqual(len(app.not_found_cache), 0)
+
+
+    def test_static_if_modified_since(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            validator_headers = static_validator_headers(temp_dir, 'README.md')
+            last_modified = validator_headers[1][1]
+
+            # Not modified - the file is not read or cached
+            with unittest.mock.patch('builtins.open') as mock_open:
+                status, headers, content_bytes = app.request(
+                    'GET', '/README.md', environ={'HTTP_IF_MODIFIED_SINCE': last_modified}
+                )
+                mock_open.assert_not_called()
+            self.assertEqual(status, '304 Not Modified')
+            self.assertEqual(headers, validator_headers)
+            self.assertEqual(content_bytes, b'')
+            self.assertEqual(len(app.static_cache), 0)
+
+            # Modified
+            status, headers, content_bytes = app.request(
+                'GET', '/README.md', environ={'HTTP_IF_MODIFIED_SINCE': 'Thu, 01 Jan 1970 00:00:00 GMT'}
+            )
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(
+                headers,
+                [('Content-Type', 'text/markdown; charset=utf-8'), *validator_headers, ('Accept-Ranges', 'bytes')]
+            )
+            self.assertEqual(content_bytes, b'# Title')
+            self.assertEqual(len(app.static_cache), 1)
+
+            # Not modified (cached)
+            status, headers, content_bytes = app.request(
+                'GET', '/README.md', environ={'HTTP_IF_NONE_MATCH': validator_headers[0][1]}
+            )
+            self.assertEqual(status, '304 Not Modified')
+            self.assertEqual(headers, validator_headers)
+            self.assertEqual(content_bytes, b'')
+
+
+    def test_static_stream(self):
+        test_files = [
+            ('large.txt', 'Large file'),
+            ('small.txt', 'Small')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'streamBytes': 10})
+            self.assertEqual(app.stream_bytes, 10)
+
+            # Large file is streamed using the WSGI file wrapper
+            file_wrapper_calls = []
+            def file_wrapper(file_, block_size):
+                file_wrapper_calls.append(block_size)
+                with file_:
+                    return [file_.read()]
+            environ = chisel.Context.create_environ('GET', '/large.txt', environ={'wsgi.file_wrapper': file_wrapper})
+            start_response = chisel.app.StartResponse()
+            content = app(environ, start_response)
+            self.assertEqual(start_response.status, '200 OK')
+            self.assertEqual(start_response.headers, [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                *static_validator_headers(temp_dir, 'large.txt'),
+                ('Accept-Ranges', 'bytes'),
+                ('Content-Length', '10')
+            ])
+            self.assertEqual(content, [b'Large file'])
+            self.assertEqual(file_wrapper_calls, [65536])
+
+            # Large file streamed without a WSGI file wrapper
+            status, headers, content_bytes = app.request('GET', '/large.txt')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-1], ('Content-Length', '10'))
+            self.assertEqual(content_bytes, b'Large file')
+
+            # Streamed files are not cached
+            self.assertIsNone(app.static_cache.get('/large.txt'))
+
+            # Small file is read
+            status, headers, content_bytes = app.request('GET', '/small.txt')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(
+                headers,
+                [
+                    ('Content-Type', 'text/plain; charset=utf-8'),
+                    *static_validator_headers(temp_dir, 'small.txt'),
+                    ('Accept-Ranges', 'bytes')
+                ]
+            )
+            self.assertEqual(content_bytes, b'Small')
+            self.assertIsNotNone(app.static_cache.get('/small.txt'))
+
+
+    def test_static_range(self):
+        with create_test_files([('data.csv', 'a,b\n1,2\n')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            status, headers, content_bytes = app.request('GET', '/data.csv', environ={'HTTP_RANGE': 'bytes=4-'})
+            self.assertEqual(status, '206 Partial Content')
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/csv; charset=utf-8'),
+                *static_validator_headers(temp_dir, 'data.csv'),
+                ('Accept-Ranges', 'bytes'),
+                ('Content-Range', 'bytes 4-7/8'),
+                ('Content-Length', '4')
+            ])
+            self.assertEqual(content_bytes, b'1,2\n')
+
+            # The file content is cached for subsequent range requests
+            self.assertIsNotNone(app.static_cache.get('/data.csv'))
+            status, _, content_bytes = app.request('GET', '/data.csv', environ={'HTTP_RANGE': 'bytes=0-2'})
+            self.assertEqual(status, '206 Partial Content')
+            self.assertEqual(content_bytes, b'a,b')
+
+
+    def test_static_compress(self):
+        markdown_text = '# Title\n\n' + 'This is a sentence.\n' * 50
+        test_files = [
+            ('README.md', markdown_text),
+            ('small.md', '# Small')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            self.assertEqual(app.compress_bytes, 512)
+            etag, last_modified = (value for _, value in static_validator_headers(temp_dir, 'README.md'))
+
+            # Identity
+            status, headers, content_bytes = app.request('GET', '/README.md')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/markdown; charset=utf-8'),
+                ('ETag', etag),
+                ('Last-Modified', last_modified),
+                ('Vary', 'Accept-Encoding'),
+                ('Accept-Ranges', 'bytes')
+            ])
+            self.assertEqual(content_bytes, markdown_text.encode('utf-8'))
+
+            # Gzip
+            status, headers, content_bytes = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip, deflate'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/markdown; charset=utf-8'),
+                ('ETag', f'{etag[:-1]}-gzip"'),
+                ('Last-Modified', last_modified),
+                ('Vary', 'Accept-Encoding'),
+                ('Content-Encoding', 'gzip')
+            ])
+            self.assertEqual(gzip.decompress(content_bytes), markdown_text.encode('utf-8'))
+            self.assertLess(len(content_bytes), len(markdown_text))
+
+            # Gzip (cached)
+            with unittest.mock.patch('builtins.open') as mock_open:
+                status, headers, content_bytes_cached = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+                mock_open.assert_not_called()
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes_cached, content_bytes)
+
+            # Gzip not modified
+            status, headers, content_bytes = app.request(
+                'GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip', 'HTTP_IF_NONE_MATCH': f'{etag[:-1]}-gzip"'}
+            )
+            self.assertEqual(status, '304 Not Modified')
+            self.assertEqual(
+                headers,
+                [('ETag', f'{etag[:-1]}-gzip"'), ('Last-Modified', last_modified), ('Vary', 'Accept-Encoding')]
+            )
+            self.assertEqual(content_bytes, b'')
+
+            # Deflate
+            status, headers, content_bytes = app.request(
+                'GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip;q=0, deflate'}
+            )
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-1], ('Content-Encoding', 'deflate'))
+            self.assertEqual(zlib.decompress(content_bytes), markdown_text.encode('utf-8'))
+
+            # Range requests are not compressed
+            status, headers, content_bytes = app.request(
+                'GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip', 'HTTP_RANGE': 'bytes=0-6'}
+            )
+            self.assertEqual(status, '206 Partial Content')
+            self.assertEqual(content_bytes, b'# Title')
+
+            # Small files are not compressed
+            status, headers, content_bytes = app.request('GET', '/small.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/markdown; charset=utf-8'),
+                *static_validator_headers(temp_dir, 'small.md'),
+                ('Accept-Ranges', 'bytes')
+            ])
+            self.assertEqual(content_bytes, b'# Small')
+
+            # Stub
+            status, headers, content_bytes = app.request('GET', '/README.html', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-1], ('Content-Encoding', 'gzip'))
+            self.assertEqual(gzip.decompress(content_bytes), create_markdown_up_stub('README.md'))
+
+            # Modify the file - the compressed variant is revalidated
+            markdown_text = markdown_text + 'Another sentence.\n'
+            with open(os.path.join(temp_dir, 'README.md'), 'w', encoding='utf-8') as readme_file:
+                readme_file.write(markdown_text)
+            status, headers, content_bytes = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(gzip.decompress(content_bytes), markdown_text.encode('utf-8'))
+
+
+    def test_static_compress_precompressed(self):
+        markdown_text = '# Title\n\n' + 'This is a sentence.\n' * 50
+        with create_test_files([('README.md', markdown_text)]) as temp_dir:
+            gzip_path = os.path.join(temp_dir, 'README.md.gz')
+            with open(gzip_path, 'wb') as gzip_file:
+                gzip_file.write(gzip.compress(b'Precompressed'))
+            app = MarkdownUpApplication(temp_dir)
+
+            status, headers, content_bytes = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/markdown; charset=utf-8'),
+                *static_validator_headers(temp_dir, 'README.md.gz'),
+                ('Vary', 'Accept-Encoding'),
+                ('Content-Encoding', 'gzip')
+            ])
+            self.assertEqual(gzip.decompress(content_bytes), b'Precompressed')
+
+            # Delete the pre-compressed file - the compressed variant is revalidated
+            os.remove(gzip_path)
+            status, headers, content_bytes = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(gzip.decompress(content_bytes), markdown_text.encode('utf-8'))
+
+
+    def test_static_compress_stream(self):
+        markdown_text = '# Title\n\n' + 'This is a sentence.\n' * 50
+        with create_test_files([('README.md', markdown_text)]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'streamBytes': 100})
+
+            # Streamed files are not compressed
+            status, headers, content_bytes = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/markdown; charset=utf-8'),
+                *static_validator_headers(temp_dir, 'README.md'),
+                ('Vary', 'Accept-Encoding'),
+                ('Accept-Ranges', 'bytes'),
+                ('Content-Length', str(len(markdown_text)))
+            ])
+            self.assertEqual(content_bytes, markdown_text.encode('utf-8'))
+
+            # Unless a pre-compressed file exists
+            with open(os.path.join(temp_dir, 'README.md.gz'), 'wb') as gzip_file:
+                gzip_file.write(gzip.compress(markdown_text.encode('utf-8')))
+            status, headers, content_bytes = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers[-1], ('Content-Encoding', 'gzip'))
+            self.assertEqual(gzip.decompress(content_bytes), markdown_text.encode('utf-8'))
+
+
+    def test_static_compress_disabled(self):
+        markdown_text = '# Title\n\n' + 'This is a sentence.\n' * 50
+        with create_test_files([('README.md', markdown_text)]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'compress': False})
+            self.assertIsNone(app.compress_bytes)
+            status, headers, content_bytes = app.request('GET', '/README.md', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers, [
+                ('Content-Type', 'text/markdown; charset=utf-8'),
+                *static_validator_headers(temp_dir, 'README.md'),
+                ('Accept-Ranges', 'bytes')
+            ])
+            self.assertEqual(content_bytes, markdown_text.encode('utf-8'))
+
+
+    def test_static_cache_config(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'cacheBytes': 1600, 'cacheEntries': 32})
+            self.assertEqual(app.static_cache.max_bytes, 1600)
+            self.assertEqual(app.static_cache.max_entries, 32)
+            self.assertEqual(len(app.static_cache.shards), 16)
+            self.assertTrue(all(shard.max_bytes == 1600 and shard.max_entries == 2 for shard in app.static_cache.shards))
+
+            status, _, _ = app.request('GET', '/README.md')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(len(app.static_cache), 1)
+            self.assertEqual(app.static_cache.size, 17)
+
+
+    def test_static_cache_disabled(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'cacheBytes': 0})
+            self.assertIsNone(app.static_cache)
+            status, _, content_bytes = app.request('GET', '/README.md')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title')
+
+            app = MarkdownUpApplication(temp_dir, {'cacheEntries': 0})
+            self.assertIsNone(app.static_cache)
+            status, _, content_bytes = app.request('GET', '/README.md')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes, b'# Title')
+
+
 class TestMarkdownUpAPI(unittest.TestCase):
 
     def test_markdown_up_index(self):
@@ -388,10 +1321,58 @@ class TestMarkdownUpAPI(unittest.TestCase):
             self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
                 'path': temp_dir,
                 'files': [{'name': 'README.html', 'display': 'README.md'}, {'name': 'index.html'}],
-                'directories': ['dir', 'dir2']
+                'directories': ['dir', 'dir2'],
+                'fileCount': 2,
+                'directoryCount': 2
             })
 
 
+    def test_markdown_up_index_cache(self):
+        test_files = [
+            ('b.md', '# B'),
+            ('a.html', '<html>'),
+            (('dir', 'info.md'), '# Info')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            status, _, content_bytes = app.request('GET', '/markdown_up_index')
+            self.assertEqual(status, '200 OK')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                'path': temp_dir,
+                'files': [{'name': 'a.html'}, {'name': 'b.html', 'display': 'b.md'}],
+                'directories': ['dir'],
+                'fileCount': 2,
+                'directoryCount': 1
+            })
+            self.assertEqual(len(app.index_cache), 1)
+            index = app.get_directory_index(temp_dir)
+            self.assertIs(app.get_directory_index(temp_dir), index)
+
+            # Cache hit - the directory is not re-scanned
+            with unittest.mock.patch('os.scandir') as mock_scandir:
+                status, _, content_bytes = app.request('GET', '/markdown_up_index')
+                mock_scandir.assert_not_called()
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(json.loads(content_bytes.decode('utf-8'))['directories'], ['dir'])
+
+            # Add a file - the index is revalidated by the directory's stat key
+            os.utime(temp_dir, ns=(0, 0))
+            with open(os.path.join(temp_dir, 'c.md'), 'w', encoding='utf-8') as c_file:
+                c_file.write('# C')
+            status, _, content_bytes = app.request('GET', '/markdown_up_index')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(json.loads(content_bytes.decode('utf-8'))['files'], [
+                {'name': 'a.html'},
+                {'name': 'b.html', 'display': 'b.md'},
+                {'name': 'c.html', 'display': 'c.md'}
+            ])
+            self.assertIsNot(app.get_directory_index(temp_dir), index)
+            self.assertEqual(len(app.index_cache), 1)
+
+            # Not a directory
+            self.assertIsNone(app.get_directory_index(os.path.join(temp_dir, 'b.md')))
+
+
     def test_markdown_up_index_empty(self):
         with create_test_files([]) as temp_dir:
             app = MarkdownUpApplication(temp_dir)
@@ -401,7 +1382,9 @@ class TestMarkdownUpAPI(unittest.TestCase):
             self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
                 'path': temp_dir,
                 'files': [],
-                'directories': []
+                'directories': [],
+                'fileCount': 0,
+                'directoryCount': 0
             })
 
 
@@ -417,7 +1400,9 @@ class TestMarkdownUpAPI(unittest.TestCase):
             self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
                 'path': os.path.join(temp_dir, 'dir'),
                 'files': [{'name': 'README.html', 'display': 'README.md'}],
-                'directories': []
+                'directories': [],
+                'fileCount': 1,
+                'directoryCount': 0
             })
 
 
@@ -434,7 +1419,9 @@ class TestMarkdownUpAPI(unittest.TestCase):
                 'path': os.path.join(temp_dir, 'dir', 'dir2'),
                 'parent': 'dir',
                 'files': [{'name': 'README.html', 'display': 'README.md'}],
-                'directories': []
+                'directories': [],
+                'fileCount': 1,
+                'directoryCount': 0
             })
 
 
@@ -452,10 +1439,57 @@ class TestMarkdownUpAPI(unittest.TestCase):
                 'path': os.path.join(temp_dir, 'dir()[]', 'dir2()[]'),
                 'parent': 'dir()[]',
                 'files': [{'name': 'file()[].html', 'display': 'file()[].md'}],
-                'directories': ['dir3()[]']
+                'directories': ['dir3()[]'],
+                'fileCount': 1,
+                'directoryCount': 1
             })
 
 
+    def test_markdown_up_index_page(self):
+        test_files = [
+            ('ab.md', '# AB'),
+            ('aa.html', '<html>'),
+            ('b.md', '# B'),
+            ('ac.md', '# AC'),
+            (('a1', 'README.md'), '# A1'),
+            (('a2', 'README.md'), '# A2'),
+            (('b1', 'README.md'), '# B1')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+
+            def index_page(query_string):
+                status, _, content_bytes = app.request('GET', '/markdown_up_index', query_string=query_string)
+                self.assertEqual(status, '200 OK')
+                response = json.loads(content_bytes.decode('utf-8'))
+                return (
+                    [file_.get('display', file_['name']) for file_ in response['files']],
+                    response['fileCount'],
+                    response['directories'],
+                    response['directoryCount']
+                )
+
+            # Offset and limit
+            self.assertEqual(index_page('limit=2'), (['aa.html', 'ab.md'], 4, ['a1', 'a2'], 3))
+            self.assertEqual(index_page('offset=2&limit=2'), (['ac.md', 'b.md'], 4, ['b1'], 3))
+            self.assertEqual(index_page('offset=3'), (['b.md'], 4, [], 3))
+            self.assertEqual(index_page('offset=10&limit=2'), ([], 4, [], 3))
+
+            # Prefix
+            self.assertEqual(index_page('prefix=a'), (['aa.html', 'ab.md', 'ac.md'], 3, ['a1', 'a2'], 2))
+            self.assertEqual(index_page('prefix=a&offset=1&limit=1'), (['ab.md'], 3, ['a2'], 2))
+            self.assertEqual(index_page('prefix=b'), (['b.md'], 1, ['b1'], 1))
+            self.assertEqual(index_page('prefix=ab'), (['ab.md'], 1, [], 0))
+            self.assertEqual(index_page('prefix=c'), ([], 0, [], 0))
+            self.assertEqual(index_page('prefix=a%F4%8F%BF%BF'), ([], 0, [], 0))
+            self.assertEqual(index_page('prefix=%F4%8F%BF%BF'), ([], 0, [], 0))
+
+            # Invalid paging
+            status, _, content_bytes = app.request('GET', '/markdown_up_index', query_string='limit=0')
+            self.assertEqual(status, '400 Bad Request')
+            self.assertEqual(json.loads(content_bytes.decode('utf-8'))['error'], 'InvalidInput')
+
+
     def test_markdown_up_index_invalid_path(self):
         with create_test_files([]) as temp_dir:
             app = MarkdownUpApplication(temp_dir)
@@ -465,6 +1499,19 @@ class TestMarkdownUpAPI(unittest.TestCase):
             self.assertEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'InvalidPath'})
 
 
+    def test_markdown_up_index_invalid_path_null(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            for config in ({}, {'watch': True, 'watchPollSeconds': 60}):
+                app = MarkdownUpApplication(temp_dir, config)
+                try:
+                    for api_name in ('markdown_up_index', 'markdown_up_tree'):
+                        status, _, content_bytes = app.request('GET', f'/{api_name}', query_string='path=a%00b')
+                        self.assertEqual(status, '400 Bad Request')
+                        self.assertEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'InvalidPath'})
+                finally:
+                    app.close()
+
+
     def test_markdown_up_index_file_path(self):
         test_files = [
             ('README.md', '# Title')
@@ -484,3 +1531,143 @@ class TestMarkdownUpAPI(unittest.TestCase):
             self.assertEqual(status, '400 Bad Request')
             self.assertEqual(headers, [('Content-Type', 'application/json')])
             self.assertEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'InvalidPath'})
+
+
+    def test_markdown_up_tree(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('index.html', '<html>'),
+            ('text.txt', 'Text'),
+            (('dir', 'info.md'), '# Info'),
+            (('dir', 'sub', 'deep.md'), '# Deep'),
+            (('dir2', 'page.html'), '<html>')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            status, headers, content_bytes = app.request('GET', '/markdown_up_tree')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers, [('Content-Type', 'application/json')])
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                'path': temp_dir,
+                'tree': {
+                    'files': [{'name': 'README.html', 'display': 'README.md'}, {'name': 'index.html'}],
+                    'directories': [
+                        {
+                            'path': 'dir',
+                            'files': [{'name': 'info.html', 'display': 'info.md'}],
+                            'directories': [
+                                {'path': 'dir/sub', 'files': [{'name': 'deep.html', 'display': 'deep.md'}], 'directories': []}
+                            ]
+                        },
+                        {'path': 'dir2', 'files': [{'name': 'page.html'}], 'directories': []}
+                    ]
+                }
+            })
+            self.assertEqual(len(app.index_cache), 4)
+
+            # Cached - the directories are not re-scanned
+            with unittest.mock.patch('os.scandir') as mock_scandir:
+                status, _, content_bytes_cached = app.request('GET', '/markdown_up_tree')
+                mock_scandir.assert_not_called()
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_bytes_cached, content_bytes)
+
+
+    def test_markdown_up_tree_path_depth(self):
+        test_files = [
+            ('README.md', '# Title'),
+            (('dir', 'info.md'), '# Info'),
+            (('dir', 'page.html'), '<html>'),
+            (('dir', 'sub', 'deep.md'), '# Deep'),
+            (('dir', 'sub', 'sub2', 'deeper.md'), '# Deeper')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            status, _, content_bytes = app.request('GET', '/markdown_up_tree', query_string='path=dir&depth=1&markdown=true')
+            self.assertEqual(status, '200 OK')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                'path': os.path.join(temp_dir, 'dir'),
+                'tree': {
+                    'path': 'dir',
+                    'files': [{'name': 'info.html', 'display': 'info.md'}],
+                    'directories': [
+                        {
+                            'path': 'dir/sub',
+                            'files': [{'name': 'deep.html', 'display': 'deep.md'}],
+                            'directories': [],
+                            'more': True
+                        }
+                    ]
+                }
+            })
+
+            # Zero depth
+            status, _, content_bytes = app.request('GET', '/markdown_up_tree', query_string='depth=0')
+            self.assertEqual(status, '200 OK')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                'path': temp_dir,
+                'tree': {'files': [{'name': 'README.html', 'display': 'README.md'}], 'directories': [], 'more': True}
+            })
+
+
+    def test_markdown_up_tree_devices(self):
+        test_files = [(('vol1', 'info.md'), '# Info'), (('vol2', 'info.md'), '# Info')]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+
+            # Directories on different devices with the same inode number are both visited
+            vol1_stat = os.stat(os.path.join(temp_dir, 'vol1'))
+            vol2_path = os.path.join(temp_dir, 'vol2')
+            os_stat = os.stat
+
+            def mock_stat(path, *args, **kwargs):
+                path_stat = os_stat(path, *args, **kwargs)
+                if path == vol2_path:
+                    stat_values = list(path_stat)
+                    stat_values[1] = vol1_stat.st_ino
+                    stat_values[2] = vol1_stat.st_dev + 1
+                    return os.stat_result(stat_values)
+                return path_stat
+
+            with unittest.mock.patch('os.stat', side_effect=mock_stat):
+                status, _, content_bytes = app.request('GET', '/markdown_up_tree')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(
+                [directory['path'] for directory in json.loads(content_bytes.decode('utf-8'))['tree']['directories']],
+                ['vol1', 'vol2']
+            )
+
+
+    def test_markdown_up_tree_truncated(self):
+        test_files = [(('dir', 'info.md'), '# Info'), (('dir2', 'info.md'), '# Info')]
+        with create_test_files(test_files) as temp_dir:
+            os.symlink(temp_dir, os.path.join(temp_dir, 'dir', 'loop'))
+            app = MarkdownUpApplication(temp_dir)
+
+            # Symbolic link cycles are visited once
+            status, _, content_bytes = app.request('GET', '/markdown_up_tree')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(len(json.loads(content_bytes.decode('utf-8'))['tree']['directories']), 2)
+
+            # Too many directories
+            with unittest.mock.patch('markdown_up.index.TREE_MAX_DIRECTORIES', 2):
+                status, _, content_bytes = app.request('GET', '/markdown_up_tree')
+            self.assertEqual(status, '200 OK')
+            self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                'path': temp_dir,
+                'tree': {
+                    'files': [],
+                    'directories': [{'path': 'dir', 'files': [{'name': 'info.html', 'display': 'info.md'}], 'directories': []}]
+                },
+                'truncated': True
+            })
+
+
+    def test_markdown_up_tree_invalid_path(self):
+        test_files = [('README.md', '# Title')]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            for query_string in ('path=../dir', 'path=README.md', 'path=missing'):
+                status, _, content_bytes = app.request('GET', '/markdown_up_tree', query_string=query_string)
+                self.assertEqual(status, '400 Bad Request')
+                self.assertEqual(json.loads(content_bytes.decode('utf-8')), {'error': 'InvalidPath'})
@@ -0,0 +1,182 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+import os
+import unittest
+
+from bare_script import BareScriptParserError, barescript_parse_script
+from markdown_up.bundle import bundle_script
+
+from .test_app import create_test_files
+
+
+class TestBundle(unittest.TestCase):
+
+    def test_bundle_script(self):
+        test_files = [
+            ('app.bare', '''\
+include <args.bare>
+
+# Local includes
+include 'lib.bare'
+include 'util.bare'
+include 'sub/other.bare'
+include 'missing.bare'
+
+function main():
+    include 'nested.bare'
+    return lib() + util()
+endfunction
+'''),
+            ('lib.bare', '''\
+include <url.bare>
+include 'util.bare'
+
+function lib():
+    return 1
+endfunction
+'''),
+            ('util.bare', '''\
+include <args.bare>
+include 'app.bare'
+
+function util():
+    return 2
+endfunction
+'''),
+            (('sub', 'other.bare'), 'other = 3\n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app_path = os.path.join(temp_dir, 'app.bare')
+            script_text, script_paths = bundle_script(app_path)
+            self.assertEqual(script_text, '''\
+include <args.bare>
+include <url.bare>
+
+# Local includes
+
+function util():
+    return 2
+endfunction
+
+
+function lib():
+    return 1
+endfunction
+
+include 'sub/other.bare'
+include 'missing.bare'
+
+function main():
+    include 'nested.bare'
+    return lib() + util()
+endfunction
+''')
+            self.assertEqual(script_paths, [
+                app_path,
+                os.path.join(temp_dir, 'lib.bare'),
+                os.path.join(temp_dir, 'util.bare')
+            ])
+            barescript_parse_script(script_text)
+
+
+    def test_bundle_script_return(self):
+        test_files = [
+            ('main.bare', '''\
+include 'lib.bare'
+include 'util.bare'
+systemLog('main ran')
+'''),
+            ('lib.bare', '''\
+if true:
+    return
+endif
+systemLog('lib ran')
+'''),
+            ('util.bare', '''\
+function util():
+    return 2
+endfunction
+''')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            main_path = os.path.join(temp_dir, 'main.bare')
+            script_text, script_paths = bundle_script(main_path)
+
+            # The include with a top-level return is not inlined - function returns are OK
+            self.assertEqual(script_text, '''\
+include 'lib.bare'
+function util():
+    return 2
+endfunction
+
+systemLog('main ran')
+''')
+            self.assertEqual(script_paths, [main_path, os.path.join(temp_dir, 'util.bare')])
+
+
+    def test_bundle_script_labels(self):
+        test_files = [
+            ('main.bare', '''\
+include 'loop.bare'
+include 'other.bare'
+ix = 0
+loop:
+    ix = ix + 1
+    jumpif (ix < 3) loop
+'''),
+            ('loop.bare', '''\
+jx = 0
+loop:
+    jx = jx + 1
+    jumpif (jx < 3) loop
+'''),
+            ('other.bare', '''\
+kx = 0
+while kx < 3:
+    kx = kx + 1
+endwhile
+other:
+'''),
+        ]
+        with create_test_files(test_files) as temp_dir:
+            main_path = os.path.join(temp_dir, 'main.bare')
+            script_text, script_paths = bundle_script(main_path)
+
+            # The include whose label clashes is not inlined - generated labels don't clash
+            self.assertEqual(script_text, '''\
+include 'loop.bare'
+kx = 0
+while kx < 3:
+    kx = kx + 1
+endwhile
+other:
+
+ix = 0
+loop:
+    ix = ix + 1
+    jumpif (ix < 3) loop
+''')
+            self.assertEqual(script_paths, [main_path, os.path.join(temp_dir, 'other.bare')])
+
+
+    def test_bundle_script_no_includes(self):
+        with create_test_files([('app.bare', 'x = 1\n')]) as temp_dir:
+            app_path = os.path.join(temp_dir, 'app.bare')
+            self.assertEqual(bundle_script(app_path), ('x = 1\n', [app_path]))
+
+
+    def test_bundle_script_parser_error(self):
+        test_files = [
+            ('app.bare', "include 'lib.bare'\n"),
+            ('lib.bare', 'x = \n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            with self.assertRaises(BareScriptParserError):
+                bundle_script(os.path.join(temp_dir, 'app.bare'))
+
+
+    def test_bundle_script_not_found(self):
+        with create_test_files([]) as temp_dir:
+            with self.assertRaises(FileNotFoundError):
+                bundle_script(os.path.join(temp_dir, 'app.bare'))
@@ -0,0 +1,225 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+import os
+import stat
+import unittest
+import unittest.mock
+
+from markdown_up.cache import DirectoryCache, LRUCache, ShardedLRUCache, stat_key, stat_key_is_dir, stat_key_is_file
+
+from .test_app import create_test_files
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = LRUCache(100)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 'A', 10)
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, 10)
+
+        # Replace
+        cache.set('a', 'A2', 20)
+        self.assertEqual(cache.get('a'), 'A2')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, 20)
+
+        # Remove
+        cache.remove('a')
+        cache.remove('a')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+
+    def test_evict(self):
+        cache = LRUCache(100)
+        cache.set('a', 'A', 40)
+        cache.set('b', 'B', 40)
+
+        # Touch "a" so "b" is the least-recently used
+        self.assertEqual(cache.get('a'), 'A')
+        cache.set('c', 'C', 40)
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'C')
+        self.assertEqual(cache.size, 80)
+
+
+    def test_too_large(self):
+        cache = LRUCache(100)
+        cache.set('a', 'A', 101)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 0)
+
+
+    def test_max_entries(self):
+        cache = LRUCache(100, 2)
+        cache.set('a', 'A', 1)
+        cache.set('b', 'B', 1)
+        cache.set('c', 'C', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 'B')
+        self.assertEqual(cache.get('c'), 'C')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 2)
+
+
+class TestShardedLRUCache(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = ShardedLRUCache(1600, 32)
+        self.assertEqual(len(cache.shards), 16)
+        self.assertTrue(all(shard.max_bytes == 1600 and shard.max_entries == 2 for shard in cache.shards))
+
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 'A', 10)
+        cache.set('b', 'B', 20)
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(cache.get('b'), 'B')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 30)
+        self.assertIs(cache.shard('a').get('a'), 'A')
+
+        cache.remove('a')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, 20)
+
+
+    def test_evict(self):
+        cache = ShardedLRUCache(1600, 32)
+        for ix in range(100):
+            cache.set(ix, ix, 1)
+        self.assertEqual(len(cache), 32)
+        self.assertTrue(all(len(shard) == 2 for shard in cache.shards))
+        self.assertEqual(cache.get(99), 99)
+        self.assertIsNone(cache.get(0))
+
+
+    def test_no_max_entries(self):
+        cache = ShardedLRUCache(1600, shard_count=4)
+        self.assertTrue(all(shard.max_bytes == 1600 and shard.max_entries is None for shard in cache.shards))
+
+
+    def test_budget(self):
+        cache = ShardedLRUCache(1600, shard_count=4)
+
+        # Values larger than a shard's share of the budget are cached
+        cache.set('a', 'A', 1000)
+        self.assertEqual(cache.get('a'), 'A')
+
+        # The total budget is enforced across the shards
+        for ix in range(10):
+            cache.set(ix, ix, 100)
+        self.assertLessEqual(cache.size, 1600)
+        self.assertEqual(cache.get(9), 9)
+
+        # A value the size of the total budget evicts the other values
+        cache.set('b', 'B', 1600)
+        self.assertEqual(cache.get('b'), 'B')
+        self.assertEqual((len(cache), cache.size), (1, 1600))
+
+        # Too large
+        cache.set('c', 'C', 1601)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.get('b'), 'B')
+
+
+    def test_budget_no_evict_lock(self):
+        cache = ShardedLRUCache(1600, shard_count=4)
+
+        # Within budget - the eviction lock is not taken
+        with unittest.mock.patch.object(cache, 'evict_lock') as mock_lock:
+            for ix in range(16):
+                cache.set(ix, ix, 100)
+            mock_lock.__enter__.assert_not_called()
+
+            # Over budget - the eviction lock is taken
+            cache.set('a', 'A', 100)
+            mock_lock.__enter__.assert_called_once()
+        self.assertEqual(cache.size, 1600)
+
+
+    def test_evict_empty(self):
+        cache = LRUCache(100)
+        self.assertFalse(cache.evict())
+        cache.set('a', 'A', 10)
+        self.assertTrue(cache.evict())
+        self.assertEqual((len(cache), cache.size), (0, 0))
+
+
+class TestDirectoryCache(unittest.TestCase):
+
+    def test_get(self):
+        test_files = [
+            ('README.md', '# Title'),
+            (('sub', 'index.md'), '# Index')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            cache = DirectoryCache(1024 * 1024)
+            snapshot = cache.get(temp_dir)
+            self.assertEqual(snapshot.key, stat_key(temp_dir))
+            self.assertEqual(snapshot.files, frozenset(['README.md']))
+            self.assertEqual(snapshot.directories, frozenset(['sub']))
+            self.assertEqual(len(cache.snapshots), 1)
+
+            # Cached - the directory is not re-scanned
+            with unittest.mock.patch('os.scandir') as mock_scandir:
+                self.assertIs(cache.get(temp_dir), snapshot)
+                self.assertIs(cache.get(temp_dir, snapshot.key), snapshot)
+                mock_scandir.assert_not_called()
+
+            # Add a file - the directory is re-scanned
+            with open(os.path.join(temp_dir, 'index.html'), 'w', encoding='utf-8') as index_file:
+                index_file.write('<html></html>')
+            snapshot2 = cache.get(temp_dir)
+            self.assertIsNot(snapshot2, snapshot)
+            self.assertEqual(snapshot2.files, frozenset(['README.md', 'index.html']))
+            self.assertEqual(snapshot2.directories, frozenset(['sub']))
+            self.assertEqual(len(cache.snapshots), 1)
+
+
+    def test_get_not_dir(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            cache = DirectoryCache(1024 * 1024)
+            self.assertIsNone(cache.get(os.path.join(temp_dir, 'README.md')))
+            self.assertIsNone(cache.get(os.path.join(temp_dir, 'missing')))
+            self.assertEqual(len(cache.snapshots), 0)
+
+
+    def test_get_scan_error(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            cache = DirectoryCache(1024 * 1024)
+            with unittest.mock.patch('os.scandir', side_effect=FileNotFoundError):
+                self.assertIsNone(cache.get(temp_dir))
+            self.assertEqual(len(cache.snapshots), 0)
+
+
+class TestStatKey(unittest.TestCase):
+
+    def test_stat_key(self):
+        with create_test_files([('test.txt', 'test')]) as temp_dir:
+            file_path = os.path.join(temp_dir, 'test.txt')
+            file_key = stat_key(file_path)
+            self.assertEqual(file_key[0], stat.S_IFREG)
+            self.assertEqual(file_key[2], 4)
+            self.assertEqual(file_key[3:5], (os.stat(file_path).st_ino, os.stat(file_path).st_dev))
+            self.assertTrue(stat_key_is_file(file_key))
+            self.assertFalse(stat_key_is_dir(file_key))
+
+            dir_key = stat_key(temp_dir)
+            self.assertEqual(dir_key[0], stat.S_IFDIR)
+            self.assertTrue(stat_key_is_dir(dir_key))
+            self.assertFalse(stat_key_is_file(dir_key))
+
+            # Invalid paths are not found
+            self.assertIsNone(stat_key(os.path.join(temp_dir, 'a\0b')))
+
+            missing_key = stat_key(os.path.join(temp_dir, 'missing.txt'))
+            self.assertIsNone(missing_key)
+            self.assertFalse(stat_key_is_dir(missing_key))
+            self.assertFalse(stat_key_is_file(missing_key))
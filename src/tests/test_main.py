@@ -2,6 +2,7 @@
 # https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
 
 from io import StringIO
+import json
 import os
 import unittest
 from unittest.mock import ANY, patch
@@ -300,6 +301,126 @@ markdown-up: 200 GET /testGlobals
             self.assertEqual(stderr.getvalue(), '')
 
 
+    def test_main_run_prewarm(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('markdown-up.json', '{"prewarm": true, "prewarmFileBytes": 1000}')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            with patch('sys.stdout', StringIO()) as stdout, \
+                 patch('sys.stderr', StringIO()) as stderr, \
+                 patch('threading.Thread') as mock_thread, \
+                 patch('waitress.serve') as mock_waitress_serve:
+                main(['-n', '-q', '-r', temp_dir])
+
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertEqual(stderr.getvalue(), '')
+                mock_waitress_serve.assert_called_once_with(ANY, port=8080, threads=8)
+                wsgiapp = mock_waitress_serve.call_args[0][0]
+                self.assertIsInstance(wsgiapp, MarkdownUpApplication)
+                mock_thread.assert_called_once_with(target=ANY, args=(wsgiapp, ANY, True))
+                self.assertEqual(len(wsgiapp.static_cache), 0)
+
+            # Run the pre-warm thread function (the pre-warm thread pool needs real threads)
+            thread_fn = mock_thread.call_args.kwargs['target']
+            _, thread_config, _ = mock_thread.call_args.kwargs['args']
+            with patch('sys.stdout', StringIO()) as stdout, \
+                 patch('sys.stderr', StringIO()) as stderr:
+                thread_fn(wsgiapp, thread_config, True)
+                self.assertEqual(len(wsgiapp.static_cache), 6)
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertEqual(stderr.getvalue(), '')
+
+            # Not quiet
+            with patch('sys.stdout', StringIO()) as stdout, \
+                 patch('sys.stderr', StringIO()) as stderr:
+                thread_fn(wsgiapp, thread_config, False)
+                self.assertRegex(
+                    stdout.getvalue(),
+                    r'^markdown-up: Pre-warmed 6 static responses \(\d+ bytes\) in \d+\.\d{3} seconds\n$'
+                )
+                self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_main_run_search(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('markdown-up.json', '{"search": true}')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            with patch('sys.stdout', StringIO()) as stdout, \
+                 patch('sys.stderr', StringIO()) as stderr, \
+                 patch('threading.Thread') as mock_thread, \
+                 patch('waitress.serve') as mock_waitress_serve:
+                main(['-n', '-q', '-r', temp_dir])
+
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertEqual(stderr.getvalue(), '')
+                wsgiapp = mock_waitress_serve.call_args[0][0]
+                self.assertIsNotNone(wsgiapp.search_index)
+                mock_thread.assert_called_once_with(target=wsgiapp.search_index.run, name=f'SearchIndex-{temp_dir}')
+                wsgiapp.close()
+
+
+    def test_main_run_search_fts5_unavailable(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('markdown-up.json', '{"search": true}')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            with patch('sys.stdout', StringIO()) as stdout, \
+                 patch('sys.stderr', StringIO()) as stderr, \
+                 patch('markdown_up.main.search_fts5_available', return_value=False), \
+                 patch('waitress.serve') as mock_waitress_serve:
+                main(['-n', '-q', '-r', temp_dir])
+
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertEqual(stderr.getvalue(), 'markdown-up: SQLite FTS5 is not available - search is disabled\n')
+                wsgiapp = mock_waitress_serve.call_args[0][0]
+                self.assertIsNone(wsgiapp.search_index)
+
+
+    def test_main_run_hot_manifest(self):
+        test_files = [
+            ('README.md', '# Title'),
+            ('hot.json', '{"paths": [{"path": "/README.md", "hits": 5, "etag": null}]}')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            manifest_path = os.path.join(temp_dir, 'hot.json')
+            with open(os.path.join(temp_dir, 'markdown-up.json'), 'w', encoding='utf-8') as config_file:
+                json.dump({'hotManifest': manifest_path, 'hotManifestSeconds': 30}, config_file)
+            with patch('sys.stdout', StringIO()) as stdout, \
+                 patch('sys.stderr', StringIO()) as stderr, \
+                 patch('threading.Thread') as mock_thread, \
+                 patch('waitress.serve') as mock_waitress_serve:
+                main(['-n', '-q', '-r', temp_dir])
+
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertEqual(stderr.getvalue(), '')
+                wsgiapp = mock_waitress_serve.call_args[0][0]
+                mock_thread.assert_called_once_with(target=ANY, args=(wsgiapp, ANY, True))
+
+            # Run the hot-set manifest thread function - stop after the second save
+            thread_fn = mock_thread.call_args.kwargs['target']
+            _, thread_config, _ = mock_thread.call_args.kwargs['args']
+            with patch('sys.stdout', StringIO()) as stdout, \
+                 patch('sys.stderr', StringIO()) as stderr, \
+                 patch('time.sleep', side_effect=[None, None, SystemExit]) as mock_sleep, \
+                 patch.object(MarkdownUpApplication, 'save_hot_manifest', side_effect=[1, OSError('Failed')]) as mock_save:
+                with self.assertRaises(SystemExit):
+                    thread_fn(wsgiapp, thread_config, False)
+
+                self.assertRegex(
+                    stdout.getvalue(),
+                    r'^markdown-up: Pre-warmed 1 static responses \(\d+ bytes\) in \d+\.\d{3} seconds\n$'
+                )
+                self.assertEqual(stderr.getvalue(), f'markdown-up: Failed to save hot-set manifest "{manifest_path}": Failed\n')
+                self.assertEqual(mock_sleep.call_args_list, [unittest.mock.call(30)] * 3)
+                self.assertEqual(mock_save.call_args_list, [unittest.mock.call(manifest_path, 1000)] * 2)
+            self.assertEqual(len(wsgiapp.static_cache), 1)
+            self.assertEqual(wsgiapp.hot_paths, {'/README.md': (5, None)})
+
+
     def test_main_run_config(self):
         test_files = [
             ('test.smd', '''\
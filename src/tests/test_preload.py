@@ -0,0 +1,67 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+import unittest
+
+from markdown_up.preload import markdown_preload_urls, preload_link_header
+
+
+class TestPreload(unittest.TestCase):
+
+    def test_markdown_preload_urls(self):
+        markdown_text = '''\
+# Title
+
+![Image](image.png) ![Angle](<my image.png> "Title") ![Image again](image.png)
+
+![Remote](https://example.com/remote.png) ![Absolute](/absolute.svg) ![Fragment](#fragment)
+
+```
+![Code](code.png)
+```
+
+~~~~ markdown-script
+include <args.bare>
+include 'lib.bare'
+
+data = jsonParse(systemFetch('data.json'))
+text = systemFetch("https://example.com/data.txt")
+
+function main(url):
+    include 'nested.bare'
+    return systemFetch(url) + systemFetch('main.txt')
+endfunction
+~~~~
+
+```markdown-script
+x = 
+```
+
+![After](after.png)
+
+```markdown-script
+other = systemFetch('other.json')
+'''
+        self.assertEqual(markdown_preload_urls(markdown_text), [
+            ('image.png', 'image'),
+            ('my image.png', 'image'),
+            ('/absolute.svg', 'image'),
+            ('lib.bare', 'fetch'),
+            ('data.json', 'fetch'),
+            ('main.txt', 'fetch'),
+            ('after.png', 'image'),
+            ('other.json', 'fetch')
+        ])
+
+
+    def test_markdown_preload_urls_empty(self):
+        self.assertEqual(markdown_preload_urls(''), [])
+        self.assertEqual(markdown_preload_urls('# Title\n\n```\n![Code](code.png)\n'), [])
+
+
+    def test_preload_link_header(self):
+        self.assertEqual(preload_link_header('my image.png', 'image'), '<my%20image.png>; rel=preload; as=image')
+        self.assertEqual(
+            preload_link_header('data.json?a=1&b=%20', 'fetch'),
+            '<data.json?a=1&b=%20>; rel=preload; as=fetch; crossorigin'
+        )
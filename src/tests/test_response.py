@@ -0,0 +1,370 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+import gzip
+import hashlib
+import os
+import unittest
+import wsgiref.util
+import zlib
+
+import chisel.app
+from markdown_up.response import StaticResponse, accept_content_encoding, compress_content, content_etag, \
+    is_compressible_content_type, is_if_range, is_not_modified, parse_ranges, static_content_type, stat_key_etag, \
+    stat_key_last_modified
+
+from .test_app import create_test_files
+
+
+class TestStaticResponse(unittest.TestCase):
+
+    def test_response(self):
+        response = StaticResponse('text/plain; charset=utf-8', '"abc"', 1700000000, b'Hello')
+        environ = chisel.Context.create_environ('GET', '/test.txt')
+        start_response = chisel.app.StartResponse()
+        content = response(environ, start_response)
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(start_response.headers, [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('ETag', '"abc"'),
+            ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT')
+        ])
+        self.assertEqual(content, [b'Hello'])
+
+
+    def test_response_not_modified(self):
+        response = StaticResponse('text/plain; charset=utf-8', '"abc"', 1700000000, path='not-read.txt')
+        environ = chisel.Context.create_environ('GET', '/test.txt', environ={'HTTP_IF_NONE_MATCH': '"abc"'})
+        start_response = chisel.app.StartResponse()
+        content = response(environ, start_response)
+        self.assertEqual(start_response.status, '304 Not Modified')
+        self.assertEqual(start_response.headers, [('ETag', '"abc"'), ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT')])
+        self.assertEqual(content, [])
+        self.assertIsNone(response.content)
+
+
+    def test_response_headers(self):
+        link_header = ('Link', '<image.png>; rel=preload; as=image')
+        response = StaticResponse(
+            'text/plain; charset=utf-8', '"abc"', 1700000000, b'Hello', encodable=True, headers=[link_header]
+        )
+        environ = chisel.Context.create_environ('GET', '/test.txt')
+        start_response = chisel.app.StartResponse()
+        content = response(environ, start_response)
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(start_response.headers, [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('ETag', '"abc"'),
+            ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT'),
+            ('Vary', 'Accept-Encoding'),
+            link_header
+        ])
+        self.assertEqual(content, [b'Hello'])
+
+        # Not-modified responses have the headers, too
+        environ = chisel.Context.create_environ('GET', '/test.txt', environ={'HTTP_IF_NONE_MATCH': '"abc"'})
+        start_response = chisel.app.StartResponse()
+        content = response(environ, start_response)
+        self.assertEqual(start_response.status, '304 Not Modified')
+        self.assertEqual(start_response.headers[-1], link_header)
+        self.assertEqual(content, [])
+
+        # Encoded variants have the headers
+        self.assertEqual(response.encoded_response('gzip').headers, [link_header])
+
+
+    def test_response_stream(self):
+        with create_test_files([('test.txt', 'Hello')]) as temp_dir:
+            response = StaticResponse(
+                'text/plain; charset=utf-8', '"abc"', 1700000000, path=os.path.join(temp_dir, 'test.txt'), stream=True
+            )
+            environ = chisel.Context.create_environ('GET', '/test.txt')
+            start_response = chisel.app.StartResponse()
+            content = response(environ, start_response)
+            self.assertEqual(start_response.status, '200 OK')
+            self.assertEqual(start_response.headers, [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('ETag', '"abc"'),
+                ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT'),
+                ('Accept-Ranges', 'bytes'),
+                ('Content-Length', '5')
+            ])
+            self.assertIsInstance(content, wsgiref.util.FileWrapper)
+            self.assertEqual(list(content), [b'Hello'])
+            content.close()
+            self.assertIsNone(response.content)
+
+
+    def test_response_stream_error(self):
+        with create_test_files([('test.txt', 'Hello')]) as temp_dir:
+            response = StaticResponse(
+                'text/plain; charset=utf-8', '"abc"', 1700000000, path=os.path.join(temp_dir, 'test.txt'), stream=True
+            )
+            environ = chisel.Context.create_environ('GET', '/test.txt')
+            def start_response(status, headers):
+                raise ValueError('start_response error')
+            with self.assertRaises(ValueError):
+                response(environ, start_response)
+
+
+    def test_response_range(self):
+        for stream in (False, True):
+            with create_test_files([('test.txt', '0123456789')]) as temp_dir:
+                response = StaticResponse(
+                    'text/plain; charset=utf-8', '"abc"', 1700000000, path=os.path.join(temp_dir, 'test.txt'), stream=stream
+                )
+                environ = chisel.Context.create_environ('GET', '/test.txt', environ={'HTTP_RANGE': 'bytes=2-4'})
+                start_response = chisel.app.StartResponse()
+                content = response(environ, start_response)
+                self.assertEqual(start_response.status, '206 Partial Content')
+                self.assertEqual(start_response.headers, [
+                    ('Content-Type', 'text/plain; charset=utf-8'),
+                    ('ETag', '"abc"'),
+                    ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT'),
+                    ('Accept-Ranges', 'bytes'),
+                    ('Content-Range', 'bytes 2-4/10'),
+                    ('Content-Length', '3')
+                ])
+                self.assertEqual(b''.join(content), b'234')
+
+
+    def test_response_range_multiple(self):
+        for stream in (False, True):
+            with create_test_files([('test.txt', '0123456789')]) as temp_dir:
+                response = StaticResponse(
+                    'text/plain; charset=utf-8', '"abc"', 1700000000, path=os.path.join(temp_dir, 'test.txt'), stream=stream
+                )
+                environ = chisel.Context.create_environ('GET', '/test.txt', environ={'HTTP_RANGE': 'bytes=0-1, -2'})
+                start_response = chisel.app.StartResponse()
+                content = b''.join(response(environ, start_response))
+                boundary = hashlib.md5(b'"abc"').hexdigest()
+                expected_content = (
+                    f'\r\n--{boundary}\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Range: bytes 0-1/10\r\n\r\n01'
+                    f'\r\n--{boundary}\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Range: bytes 8-9/10\r\n\r\n89'
+                    f'\r\n--{boundary}--\r\n'
+                ).encode('utf-8')
+                self.assertEqual(start_response.status, '206 Partial Content')
+                self.assertEqual(start_response.headers, [
+                    ('Content-Type', f'multipart/byteranges; boundary={boundary}'),
+                    ('ETag', '"abc"'),
+                    ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT'),
+                    ('Accept-Ranges', 'bytes'),
+                    ('Content-Length', str(len(expected_content)))
+                ])
+                self.assertEqual(content, expected_content)
+
+
+    def test_response_range_not_satisfiable(self):
+        for stream in (False, True):
+            with create_test_files([('test.txt', '0123456789')]) as temp_dir:
+                response = StaticResponse(
+                    'text/plain; charset=utf-8', '"abc"', 1700000000, path=os.path.join(temp_dir, 'test.txt'), stream=stream
+                )
+                environ = chisel.Context.create_environ('GET', '/test.txt', environ={'HTTP_RANGE': 'bytes=10-'})
+                start_response = chisel.app.StartResponse()
+                content = response(environ, start_response)
+                self.assertEqual(start_response.status, '416 Range Not Satisfiable')
+                self.assertEqual(start_response.headers, [
+                    ('Content-Type', 'text/plain; charset=utf-8'),
+                    ('Content-Range', 'bytes */10')
+                ])
+                self.assertEqual(content, [b'Range Not Satisfiable'])
+
+
+    def test_response_range_if_range(self):
+        response = StaticResponse('text/plain; charset=utf-8', '"abc"', 1700000000, b'0123456789', path='test.txt')
+
+        # If-Range matches
+        environ = chisel.Context.create_environ('GET', '/test.txt', environ={'HTTP_RANGE': 'bytes=2-4', 'HTTP_IF_RANGE': '"abc"'})
+        start_response = chisel.app.StartResponse()
+        content = response(environ, start_response)
+        self.assertEqual(start_response.status, '206 Partial Content')
+        self.assertEqual(content, [b'234'])
+
+        # If-Range does not match - serve the full content
+        environ = chisel.Context.create_environ('GET', '/test.txt', environ={'HTTP_RANGE': 'bytes=2-4', 'HTTP_IF_RANGE': '"xyz"'})
+        start_response = chisel.app.StartResponse()
+        content = response(environ, start_response)
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(content, [b'0123456789'])
+
+
+    def test_response_range_no_path(self):
+        response = StaticResponse('text/html; charset=utf-8', '"abc"', 1700000000, b'<html></html>')
+        environ = chisel.Context.create_environ('GET', '/index.html', environ={'HTTP_RANGE': 'bytes=0-1'})
+        start_response = chisel.app.StartResponse()
+        content = response(environ, start_response)
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(start_response.headers, [
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('ETag', '"abc"'),
+            ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT')
+        ])
+        self.assertEqual(content, [b'<html></html>'])
+
+
+    def test_encoded_response(self):
+        response = StaticResponse('text/plain; charset=utf-8', '"abc"', 1700000000, b'Hello', encodable=True)
+        encoded_response = response.encoded_response('gzip')
+        self.assertEqual(encoded_response.etag, '"abc-gzip"')
+        self.assertEqual(gzip.decompress(encoded_response.content), b'Hello')
+        self.assertFalse(encoded_response.compress)
+
+        environ = chisel.Context.create_environ('GET', '/test.txt')
+        start_response = chisel.app.StartResponse()
+        content = encoded_response(environ, start_response)
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(start_response.headers, [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('ETag', '"abc-gzip"'),
+            ('Last-Modified', 'Tue, 14 Nov 2023 22:13:20 GMT'),
+            ('Vary', 'Accept-Encoding'),
+            ('Content-Encoding', 'gzip')
+        ])
+        self.assertEqual(content, [encoded_response.content])
+
+
+    def test_encoded_response_path(self):
+        with create_test_files([('test.txt', 'Hello')]) as temp_dir:
+            response = StaticResponse(
+                'text/plain; charset=utf-8', '"abc"', 1700000000, path=os.path.join(temp_dir, 'test.txt'), encodable=True
+            )
+            encoded_response = response.encoded_response('deflate')
+            self.assertIsNone(encoded_response.content)
+            self.assertTrue(encoded_response.compress)
+
+            environ = chisel.Context.create_environ('GET', '/test.txt')
+            start_response = chisel.app.StartResponse()
+            content = encoded_response(environ, start_response)
+            self.assertEqual(start_response.status, '200 OK')
+            self.assertEqual(start_response.headers[-1], ('Content-Encoding', 'deflate'))
+            self.assertEqual(zlib.decompress(b''.join(content)), b'Hello')
+
+
+    def test_encoded_response_stream(self):
+        response = StaticResponse('text/plain; charset=utf-8', '"abc"', 1700000000, path='test.txt', stream=True, encodable=True)
+        self.assertIsNone(response.encoded_response('gzip'))
+
+
+class TestContentEncoding(unittest.TestCase):
+
+    def test_accept_content_encoding(self):
+        self.assertIsNone(accept_content_encoding(None))
+        self.assertIsNone(accept_content_encoding(''))
+        self.assertEqual(accept_content_encoding('gzip'), 'gzip')
+        self.assertEqual(accept_content_encoding('deflate, gzip;q=1.0, br'), 'gzip')
+        self.assertEqual(accept_content_encoding('GZIP'), 'gzip')
+        self.assertEqual(accept_content_encoding('deflate'), 'deflate')
+        self.assertEqual(accept_content_encoding('gzip;q=0, deflate;q=0.5'), 'deflate')
+        self.assertEqual(accept_content_encoding('*'), 'gzip')
+        self.assertIsNone(accept_content_encoding('*;q=0'))
+        self.assertIsNone(accept_content_encoding('br, identity'))
+        self.assertIsNone(accept_content_encoding('gzip;q=asdf'))
+
+
+    def test_compress_content(self):
+        self.assertEqual(gzip.decompress(compress_content(b'Hello', 'gzip')), b'Hello')
+        self.assertEqual(compress_content(b'Hello', 'gzip'), compress_content(b'Hello', 'gzip'))
+        self.assertEqual(zlib.decompress(compress_content(b'Hello', 'deflate')), b'Hello')
+
+
+    def test_is_compressible_content_type(self):
+        self.assertTrue(is_compressible_content_type('text/markdown; charset=utf-8'))
+        self.assertTrue(is_compressible_content_type('application/json; charset=utf-8'))
+        self.assertTrue(is_compressible_content_type('image/svg+xml; charset=utf-8'))
+        self.assertFalse(is_compressible_content_type('image/png'))
+
+
+class TestParseRanges(unittest.TestCase):
+
+    def test_parse_ranges(self):
+        self.assertEqual(parse_ranges('bytes=0-499', 1000), [(0, 499)])
+        self.assertEqual(parse_ranges('bytes=500-', 1000), [(500, 999)])
+        self.assertEqual(parse_ranges('bytes=-200', 1000), [(800, 999)])
+        self.assertEqual(parse_ranges('bytes=-2000', 1000), [(0, 999)])
+        self.assertEqual(parse_ranges('bytes=900-2000', 1000), [(900, 999)])
+        self.assertEqual(parse_ranges('bytes=0-0, 10-19 ,-1', 1000), [(0, 0), (10, 19), (999, 999)])
+        self.assertEqual(parse_ranges('BYTES=0-1', 1000), [(0, 1)])
+
+
+    def test_parse_ranges_not_satisfiable(self):
+        self.assertEqual(parse_ranges('bytes=1000-', 1000), [])
+        self.assertEqual(parse_ranges('bytes=-0', 1000), [])
+        self.assertEqual(parse_ranges('bytes=-10', 0), [])
+        self.assertEqual(parse_ranges('bytes=1000-1100, 2000-', 1000), [])
+
+
+    def test_parse_ranges_invalid(self):
+        self.assertIsNone(parse_ranges('items=0-1', 1000))
+        self.assertIsNone(parse_ranges('bytes=0', 1000))
+        self.assertIsNone(parse_ranges('bytes=-', 1000))
+        self.assertIsNone(parse_ranges('bytes=a-1', 1000))
+        self.assertIsNone(parse_ranges('bytes=0-b', 1000))
+        self.assertIsNone(parse_ranges('bytes=+1-2', 1000))
+        self.assertIsNone(parse_ranges('bytes=5-4', 1000))
+        self.assertIsNone(parse_ranges('bytes=' + ','.join(['0-1'] * 17), 1000))
+
+
+class TestIsIfRange(unittest.TestCase):
+
+    def test_is_if_range(self):
+        self.assertTrue(is_if_range(None, '"abc"', 1700000000))
+        self.assertTrue(is_if_range('"abc"', '"abc"', 1700000000))
+        self.assertFalse(is_if_range('"xyz"', '"abc"', 1700000000))
+        self.assertFalse(is_if_range('W/"abc"', '"abc"', 1700000000))
+        self.assertTrue(is_if_range('Tue, 14 Nov 2023 22:13:20 GMT', '"abc"', 1700000000))
+        self.assertFalse(is_if_range('Tue, 14 Nov 2023 22:13:21 GMT', '"abc"', 1700000000))
+        self.assertFalse(is_if_range('asdf', '"abc"', 1700000000))
+
+
+class TestIsNotModified(unittest.TestCase):
+
+    def test_if_none_match(self):
+        self.assertTrue(is_not_modified({'HTTP_IF_NONE_MATCH': '"abc"'}, '"abc"', 100))
+        self.assertTrue(is_not_modified({'HTTP_IF_NONE_MATCH': '"xyz", W/"abc"'}, '"abc"', 100))
+        self.assertTrue(is_not_modified({'HTTP_IF_NONE_MATCH': '*'}, '"abc"', 100))
+        self.assertFalse(is_not_modified({'HTTP_IF_NONE_MATCH': '"xyz"'}, '"abc"', 100))
+
+        # If-None-Match takes precedence over If-Modified-Since
+        self.assertFalse(is_not_modified(
+            {'HTTP_IF_NONE_MATCH': '"xyz"', 'HTTP_IF_MODIFIED_SINCE': 'Tue, 14 Nov 2023 22:13:20 GMT'},
+            '"abc"',
+            100
+        ))
+
+
+    def test_if_modified_since(self):
+        environ = {'HTTP_IF_MODIFIED_SINCE': 'Tue, 14 Nov 2023 22:13:20 GMT'}
+        self.assertTrue(is_not_modified(environ, '"abc"', 1699999999))
+        self.assertTrue(is_not_modified(environ, '"abc"', 1700000000))
+        self.assertFalse(is_not_modified(environ, '"abc"', 1700000001))
+
+
+    def test_if_modified_since_invalid(self):
+        self.assertFalse(is_not_modified({'HTTP_IF_MODIFIED_SINCE': 'asdf'}, '"abc"', 100))
+
+
+    def test_unconditional(self):
+        self.assertFalse(is_not_modified({}, '"abc"', 100))
+
+
+class TestValidators(unittest.TestCase):
+
+    def test_stat_key_etag(self):
+        self.assertEqual(stat_key_etag((0o100000, 1700000000123456789, 1024, 42)), '"17979cfe3d85cd15-400"')
+        self.assertEqual(stat_key_etag((0o100000, 1700000000123456789, 1024, 43)), '"17979cfe3d85cd15-400"')
+
+
+    def test_stat_key_last_modified(self):
+        self.assertEqual(stat_key_last_modified((0o100000, 1700000000123456789, 1024, 42)), 1700000000)
+
+
+    def test_content_etag(self):
+        self.assertEqual(content_etag(b'Hello'), '"8b1a9953c4611296a827abf8c47804d7"')
+
+
+    def test_static_content_type(self):
+        self.assertEqual(static_content_type('/README.md'), 'text/markdown; charset=utf-8')
+        with self.assertRaises(ValueError) as cm_exc:
+            static_content_type('/test.unk')
+        self.assertEqual(str(cm_exc.exception), 'Unknown content type for static resource "/test.unk"')
@@ -0,0 +1,447 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+import datetime
+import json
+import os
+import sqlite3
+import unittest
+import unittest.mock
+
+from markdown_up.app import MarkdownUpApplication
+from markdown_up.search import DocumentMetadata, SearchIndex, search_fts5_available, search_match_query
+
+from .test_app import create_test_files
+from .test_watch import wait_for
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def test_refresh(self):
+        test_files = [
+            ('README.md', '# Fox Facts\n\nThe quick brown fox jumps over the lazy dog.\n'),
+            ('notes.txt', 'fox'),
+            (('dir', 'notes.md'), 'No heading - foxes are running here.\n'),
+            (('dir', 'other.markdown'), '## Other ##\n\nNothing to see.\n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            search_index = SearchIndex(temp_dir)
+            try:
+                self.assertEqual(search_index.refresh(), (3, 0))
+
+                # Search - title matches rank first, and words are stemmed
+                self.assertEqual(search_index.search('fox'), (2, [
+                    ('README.md', 'Fox Facts', '# **Fox** Facts\n\nThe quick brown **fox** jumps over the lazy dog.\n'),
+                    ('dir/notes.md', 'notes.md', 'No heading - **foxes** are running here.\n')
+                ]))
+                self.assertEqual(search_index.search('other'), (1, [
+                    ('dir/other.markdown', 'Other', '## **Other** ##\n\nNothing to see.\n')
+                ]))
+                self.assertEqual(search_index.search('quick fox'), (1, [
+                    ('README.md', 'Fox Facts', '# **Fox** Facts\n\nThe **quick** brown **fox** jumps over the lazy dog.\n')
+                ]))
+                self.assertEqual(search_index.search('fac*')[0], 1)
+                self.assertEqual(search_index.search('missing'), (0, []))
+                self.assertEqual(search_index.search(' * '), (0, []))
+
+                # Pagination
+                self.assertEqual(search_index.search('fox', limit=1)[0], 2)
+                self.assertEqual([result[0] for result in search_index.search('fox', limit=1)[1]], ['README.md'])
+                self.assertEqual([result[0] for result in search_index.search('fox', offset=1)[1]], ['dir/notes.md'])
+
+                # Unchanged - nothing is indexed
+                with unittest.mock.patch('builtins.open') as mock_open:
+                    self.assertEqual(search_index.refresh(), (0, 0))
+                    mock_open.assert_not_called()
+
+                # Modify, add, and remove files
+                with open(os.path.join(temp_dir, 'README.md'), 'w', encoding='utf-8') as readme_file:
+                    readme_file.write('# Welcome\n\nThe lazy cat.\n')
+                with open(os.path.join(temp_dir, 'new.md'), 'w', encoding='utf-8') as new_file:
+                    new_file.write('A new fox.\n')
+                os.remove(os.path.join(temp_dir, 'dir', 'notes.md'))
+                self.assertEqual(search_index.refresh(), (2, 1))
+                self.assertEqual(search_index.search('fox'), (1, [('new.md', 'new.md', 'A new **fox**.\n')]))
+                self.assertEqual(search_index.search('cat'), (1, [('README.md', 'Welcome', '# Welcome\n\nThe lazy **cat**.\n')]))
+            finally:
+                search_index.stop()
+
+
+    def test_refresh_paths(self):
+        test_files = [
+            ('README.md', '# Title\n\nHello'),
+            ('other.md', '# Other\n\nHello'),
+            (('dir', 'info.md'), '# Info\n\nHello'),
+            (('dir', 'sub', 'more.md'), '# More\n\nHello'),
+            (('dir2', 'notes.md'), '# Notes\n\nHello')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            search_index = SearchIndex(temp_dir)
+            try:
+                self.assertEqual(search_index.refresh(), (5, 0))
+
+                # Modify a file, add a file, and remove a directory
+                readme_path = os.path.join(temp_dir, 'README.md')
+                new_path = os.path.join(temp_dir, 'dir', 'new.md')
+                sub_path = os.path.join(temp_dir, 'dir', 'sub')
+                with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                    readme_file.write('# Welcome\n\nGoodbye')
+                with open(new_path, 'w', encoding='utf-8') as new_file:
+                    new_file.write('# New\n\nHello')
+                os.remove(os.path.join(sub_path, 'more.md'))
+                os.rmdir(sub_path)
+
+                # Only the changed paths are re-indexed - paths outside the root are ignored
+                with unittest.mock.patch('os.walk', wraps=os.walk) as mock_walk:
+                    self.assertEqual(search_index.refresh([readme_path, sub_path, os.path.dirname(temp_dir)]), (1, 1))
+                    mock_walk.assert_not_called()
+                self.assertEqual(search_index.search('goodbye')[0], 1)
+                self.assertEqual(search_index.search('hello')[0], 3)
+                self.assertEqual(sorted(search_index.metadata), ['README.md', 'dir/info.md', 'dir2/notes.md', 'other.md'])
+
+                # Directory change - the directory is walked
+                dir_path = os.path.join(temp_dir, 'dir')
+                self.assertEqual(search_index.refresh([dir_path, new_path]), (1, 0))
+                self.assertEqual(search_index.search('hello')[0], 4)
+
+                # Root change - all files are refreshed
+                os.remove(os.path.join(temp_dir, 'dir2', 'notes.md'))
+                self.assertEqual(search_index.refresh([readme_path, temp_dir]), (0, 1))
+                self.assertEqual(sorted(search_index.metadata), ['README.md', 'dir/info.md', 'dir/new.md', 'other.md'])
+            finally:
+                search_index.stop()
+
+
+    def test_changed(self):
+        with create_test_files([('README.md', '# Title'), ('notes.txt', 'notes'), (('dir', 'info.md'), '# Info')]) as temp_dir:
+            search_index = SearchIndex(temp_dir)
+            try:
+                # Non-Markdown file changes are ignored
+                search_index.changed(os.path.join(temp_dir, 'notes.txt'))
+                self.assertEqual(search_index.changed_paths, set())
+                self.assertFalse(search_index.refresh_event.is_set())
+
+                # Markdown file, directory, and removed path changes are queued
+                changed_paths = {os.path.join(temp_dir, name) for name in ('README.md', 'dir', 'missing')}
+                for path in changed_paths:
+                    search_index.changed(path)
+                self.assertEqual(search_index.changed_paths, changed_paths)
+                self.assertTrue(search_index.refresh_event.is_set())
+            finally:
+                search_index.stop()
+
+
+    def test_refresh_unreadable(self):
+        test_files = [
+            ('large.md', '# Large\n\nlarge text'),
+            ('binary.md', '')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            with open(os.path.join(temp_dir, 'binary.md'), 'wb') as binary_file:
+                binary_file.write(b'# \xff binary')
+            search_index = SearchIndex(temp_dir)
+            try:
+                with unittest.mock.patch('markdown_up.search.SEARCH_MAX_FILE_BYTES', 10):
+                    self.assertEqual(search_index.refresh(), (2, 0))
+
+                # Indexed by file name only
+                self.assertEqual(search_index.search('text')[0], 0)
+                self.assertEqual(search_index.search('binary'), (1, [('binary.md', 'binary.md', '')]))
+                self.assertEqual(search_index.search('large'), (1, [('large.md', 'large.md', '')]))
+            finally:
+                search_index.stop()
+
+
+    def test_database(self):
+        with create_test_files([('README.md', '# Title\n\nHello')]) as temp_dir:
+            database = os.path.join(temp_dir, 'search.db')
+            search_index = SearchIndex(temp_dir, database)
+            self.assertEqual(search_index.refresh(), (1, 0))
+            search_index.stop()
+
+            # The persistent index is only updated with changed files
+            search_index = SearchIndex(temp_dir, database)
+            try:
+                self.assertEqual(search_index.refresh(), (0, 0))
+                self.assertEqual(search_index.search('hello')[0], 1)
+            finally:
+                search_index.stop()
+
+
+    def test_metadata(self):
+        test_files = [
+            ('README.md', '---\ntitle: "Front Title"\n---\n# Heading\n\n```\n# Not a heading\n```\n\n## Sub ##\n'),
+            ('notes.md', 'No heading\n'),
+            (('dir', 'page.md'), '---\nauthor: me\n---\n\n### Page\n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            search_index = SearchIndex(temp_dir, text=False)
+            try:
+                self.assertEqual(search_index.refresh(), (3, 0))
+                self.assertEqual(
+                    {path: (metadata.title, metadata.size, metadata.outline) for path, metadata in search_index.metadata.items()},
+                    {
+                        'README.md': ('Front Title', 75, ((1, 'Heading'), (2, 'Sub'))),
+                        'notes.md': (None, 11, ()),
+                        'dir/page.md': ('Page', 29, ((3, 'Page'),))
+                    }
+                )
+                self.assertEqual(
+                    search_index.metadata['notes.md'].mtime,
+                    os.stat(os.path.join(temp_dir, 'notes.md')).st_mtime_ns
+                )
+
+                # The full-text search index is not created
+                self.assertIsNone(search_index.connection.execute(
+                    "SELECT name FROM sqlite_master WHERE name = 'search_text'"
+                ).fetchone())
+
+                # Modify and remove files
+                with open(os.path.join(temp_dir, 'notes.md'), 'w', encoding='utf-8') as notes_file:
+                    notes_file.write('# Notes\n')
+                os.remove(os.path.join(temp_dir, 'dir', 'page.md'))
+                self.assertEqual(search_index.refresh(), (1, 1))
+                self.assertEqual(sorted(search_index.metadata), ['README.md', 'notes.md'])
+                self.assertEqual(search_index.metadata['notes.md'].title, 'Notes')
+            finally:
+                search_index.stop()
+
+
+    def test_metadata_max_headings(self):
+        with create_test_files([('README.md', '# One\n\n# Two\n\n# Three\n')]) as temp_dir:
+            search_index = SearchIndex(temp_dir)
+            try:
+                with unittest.mock.patch('markdown_up.search.METADATA_MAX_HEADINGS', 2):
+                    self.assertEqual(search_index.refresh(), (1, 0))
+                self.assertEqual(search_index.metadata['README.md'].outline, ((1, 'One'), (1, 'Two')))
+
+                # Headings beyond the outline limit are still searchable
+                self.assertEqual(search_index.search('three')[1], [('README.md', 'One', '# One\n\n# Two\n\n# **Three**\n')])
+            finally:
+                search_index.stop()
+
+
+    def test_metadata_database(self):
+        with create_test_files([('README.md', '# Title\n\nHello')]) as temp_dir:
+            database = os.path.join(temp_dir, 'search.db')
+            search_index = SearchIndex(temp_dir, database)
+            self.assertEqual(search_index.refresh(), (1, 0))
+            search_index.stop()
+
+            # The persisted metadata is loaded
+            search_index = SearchIndex(temp_dir, database)
+            try:
+                self.assertEqual(search_index.refresh(), (0, 0))
+                metadata = search_index.metadata['README.md']
+                self.assertIsInstance(metadata, DocumentMetadata)
+                self.assertEqual((metadata.title, metadata.size, metadata.outline), ('Title', 14, ((1, 'Title'),)))
+            finally:
+                search_index.stop()
+
+            # A database with different text indexing is rebuilt
+            search_index = SearchIndex(temp_dir, database, text=False)
+            try:
+                self.assertEqual(search_index.refresh(), (1, 0))
+            finally:
+                search_index.stop()
+
+            # A database with an older schema is rebuilt
+            connection = sqlite3.connect(database)
+            connection.execute('PRAGMA user_version = 0')
+            connection.close()
+            search_index = SearchIndex(temp_dir, database, text=False)
+            try:
+                self.assertEqual(search_index.refresh(), (1, 0))
+            finally:
+                search_index.stop()
+
+
+    def test_start_stop(self):
+        with create_test_files([('README.md', '# Title\n\nHello')]) as temp_dir:
+            search_index = SearchIndex(temp_dir, refresh_seconds=60)
+            self.assertEqual(search_index.refresh_seconds, 60)
+            search_index.start()
+            try:
+                self.assertTrue(wait_for(lambda: search_index.ready))
+                self.assertEqual(search_index.search('hello')[0], 1)
+
+                # File change - the index is refreshed
+                with unittest.mock.patch('markdown_up.search.SEARCH_CHANGE_SECONDS', 0):
+                    with open(os.path.join(temp_dir, 'new.md'), 'w', encoding='utf-8') as new_file:
+                        new_file.write('Hello again')
+                    with unittest.mock.patch('os.walk', wraps=os.walk) as mock_walk:
+                        search_index.changed(os.path.join(temp_dir, 'new.md'))
+                        self.assertTrue(wait_for(lambda: search_index.search('hello')[0] == 2))
+                        mock_walk.assert_not_called()
+            finally:
+                search_index.stop()
+            self.assertIsNone(search_index.thread)
+
+
+    def test_search_match_query(self):
+        self.assertEqual(search_match_query('hello'), '"hello"')
+        self.assertEqual(search_match_query(' hello  "world" OR wor* '), '"hello" "world" "OR" "wor"*')
+        self.assertEqual(search_match_query('a"b NEAR('), '"ab" "NEAR("')
+        self.assertIsNone(search_match_query(' " * '))
+
+
+    def test_search_fts5_available(self):
+        self.assertTrue(search_fts5_available())
+        with unittest.mock.patch('sqlite3.connect') as mock_connect:
+            mock_connect.return_value.execute.side_effect = sqlite3.OperationalError('no such module: fts5')
+            self.assertFalse(search_fts5_available())
+            mock_connect.return_value.close.assert_called_once_with()
+
+
+class TestMarkdownUpSearch(unittest.TestCase):
+
+    def test_markdown_up_search(self):
+        test_files = [
+            ('README.md', '# Title\n\nHello world\n'),
+            (('dir', 'page.md'), '# Page\n\nHello there\n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'search': True})
+            try:
+                self.assertTrue(wait_for(lambda: app.search_index.ready))
+                status, headers, content_bytes = app.request('GET', '/markdown_up_search', query_string='query=hello')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(headers, [('Content-Type', 'application/json')])
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {
+                    'count': 2,
+                    'results': [
+                        {'path': 'README.md', 'url': 'README.html', 'title': 'Title', 'snippet': '# Title\n\n**Hello** world\n'},
+                        {'path': 'dir/page.md', 'url': 'dir/page.html', 'title': 'Page', 'snippet': '# Page\n\n**Hello** there\n'}
+                    ]
+                })
+
+                # Pagination
+                status, _, content_bytes = app.request('GET', '/markdown_up_search', query_string='query=hello&offset=1&limit=1')
+                self.assertEqual(status, '200 OK')
+                response = json.loads(content_bytes.decode('utf-8'))
+                self.assertEqual(response['count'], 2)
+                self.assertEqual([result['path'] for result in response['results']], ['dir/page.md'])
+
+                # Index building
+                app.search_index.ready = False
+                status, _, content_bytes = app.request('GET', '/markdown_up_search', query_string='query=missing')
+                self.assertEqual(status, '200 OK')
+                self.assertDictEqual(json.loads(content_bytes.decode('utf-8')), {'count': 0, 'results': [], 'building': True})
+            finally:
+                app.close()
+            self.assertIsNone(app.search_index)
+
+
+    def test_markdown_up_search_watch(self):
+        with create_test_files([('README.md', '# Title\n\nHello')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'search': True, 'watch': True, 'watchPollSeconds': 0.01})
+            try:
+                self.assertIn(app.search_index.changed, app.watcher.listeners)
+            finally:
+                app.close()
+
+
+    def test_markdown_up_search_database(self):
+        with create_test_files([('README.md', '# Title\n\nHello')]) as temp_dir:
+            database_path = os.path.join(temp_dir, 'search.db')
+            app = MarkdownUpApplication(temp_dir, {'search': True, 'searchDatabase': database_path, 'searchRefreshSeconds': 30})
+            try:
+                self.assertEqual(app.search_index.refresh_seconds, 30)
+                self.assertTrue(wait_for(lambda: app.search_index.ready))
+                self.assertTrue(os.path.isfile(database_path))
+
+                # The database files are not served
+                for path_info in ('/search.db', '/search.db-journal'):
+                    status, _, _ = app.request('GET', path_info)
+                    self.assertEqual(status, '404 Not Found')
+            finally:
+                app.close()
+
+
+    def test_markdown_up_search_disabled(self):
+        with create_test_files([]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir)
+            self.assertIsNone(app.search_index)
+            self.assertFalse('markdown_up_search' in (request.name for request in app.requests.values()))
+            status, _, _ = app.request('GET', '/markdown_up_search', query_string='query=hello')
+            self.assertEqual(status, '404 Not Found')
+
+
+class TestMarkdownUpMetadata(unittest.TestCase):
+
+    def test_markdown_up_index(self):
+        test_files = [
+            ('README.md', '# Title\n\n## Section\n'),
+            ('notitle.md', 'Hello'),
+            ('index.html', ''),
+            (('dir', 'page.md'), '# Page\n')
+        ]
+        with create_test_files(test_files) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'metadata': True})
+            try:
+                self.assertIs(app.document_metadata, app.search_index.metadata)
+                self.assertFalse(app.search_index.text)
+                self.assertFalse('markdown_up_search' in (request.name for request in app.requests.values()))
+                self.assertTrue(wait_for(lambda: app.search_index.ready))
+                readme_modified = datetime.datetime.fromtimestamp(
+                    os.stat(os.path.join(temp_dir, 'README.md')).st_mtime_ns / 1e9, datetime.timezone.utc
+                ).isoformat()
+                notitle_modified = datetime.datetime.fromtimestamp(
+                    os.stat(os.path.join(temp_dir, 'notitle.md')).st_mtime_ns / 1e9, datetime.timezone.utc
+                ).isoformat()
+
+                status, _, content_bytes = app.request('GET', '/markdown_up_index')
+                self.assertEqual(status, '200 OK')
+                self.assertListEqual(json.loads(content_bytes.decode('utf-8'))['files'], [
+                    {'name': 'README.html', 'display': 'README.md', 'title': 'Title', 'size': 20, 'modified': readme_modified},
+                    {'name': 'index.html'},
+                    {'name': 'notitle.html', 'display': 'notitle.md', 'size': 5, 'modified': notitle_modified}
+                ])
+
+                # Outline
+                status, _, content_bytes = app.request('GET', '/markdown_up_index', query_string='outline=true&limit=1')
+                self.assertEqual(status, '200 OK')
+                self.assertListEqual(json.loads(content_bytes.decode('utf-8'))['files'], [
+                    {
+                        'name': 'README.html',
+                        'display': 'README.md',
+                        'title': 'Title',
+                        'size': 20,
+                        'modified': readme_modified,
+                        'outline': [{'level': 1, 'text': 'Title'}, {'level': 2, 'text': 'Section'}]
+                    }
+                ])
+
+                # Sub-directory
+                status, _, content_bytes = app.request('GET', '/markdown_up_index', query_string='path=dir')
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(json.loads(content_bytes.decode('utf-8'))['files'][0]['title'], 'Page')
+
+                # The cached index files are not modified
+                self.assertNotIn('title', app.get_directory_index(temp_dir).files[0])
+
+                # Tree
+                status, _, content_bytes = app.request('GET', '/markdown_up_tree', query_string='markdown=true')
+                self.assertEqual(status, '200 OK')
+                tree = json.loads(content_bytes.decode('utf-8'))['tree']
+                self.assertEqual([file_.get('title') for file_ in tree['files']], ['Title', None])
+                self.assertNotIn('outline', tree['files'][0])
+                self.assertEqual(tree['directories'][0]['files'][0]['title'], 'Page')
+            finally:
+                app.close()
+
+
+    def test_markdown_up_index_disabled(self):
+        with create_test_files([('README.md', '# Title\n')]) as temp_dir:
+            app = MarkdownUpApplication(temp_dir, {'search': True})
+            try:
+                self.assertIsNone(app.document_metadata)
+                self.assertTrue(wait_for(lambda: app.search_index.ready))
+                status, _, content_bytes = app.request('GET', '/markdown_up_index')
+                self.assertEqual(status, '200 OK')
+                self.assertListEqual(
+                    json.loads(content_bytes.decode('utf-8'))['files'],
+                    [{'name': 'README.html', 'display': 'README.md'}]
+                )
+            finally:
+                app.close()
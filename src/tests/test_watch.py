@@ -0,0 +1,304 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/markdown-up-py/blob/main/LICENSE
+
+import os
+import sys
+import time
+import unittest
+import unittest.mock
+
+from markdown_up.cache import stat_key
+from markdown_up.watch import FileWatcher, IN_CREATE, IN_IGNORED, IN_ISDIR, IN_MODIFY, IN_Q_OVERFLOW, INOTIFY_EVENT, \
+    InotifyFileWatcher, PollingFileWatcher, create_file_watcher
+
+from .test_app import create_test_files
+
+
+# Wait for a condition to become true
+def wait_for(condition, timeout=5.0):
+    end_time = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= end_time:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestFileWatcher(unittest.TestCase):
+
+    def test_stat_key(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            watcher = PollingFileWatcher(temp_dir)
+            readme_path = os.path.join(temp_dir, 'README.md')
+            readme_key = stat_key(readme_path)
+            self.assertEqual(watcher.stat_key(readme_path), readme_key)
+            self.assertEqual(watcher.keys, {readme_path: readme_key})
+
+            # Cached - the path is not stat-ed
+            with unittest.mock.patch('os.stat') as mock_stat:
+                self.assertEqual(watcher.stat_key(readme_path), readme_key)
+                mock_stat.assert_not_called()
+
+            # Not-found paths are cached
+            missing_path = os.path.join(temp_dir, 'missing.md')
+            self.assertIsNone(watcher.stat_key(missing_path))
+            self.assertEqual(watcher.keys, {readme_path: readme_key, missing_path: None})
+
+            # Paths outside the root are not cached
+            self.assertIsNotNone(watcher.stat_key(os.path.dirname(temp_dir)))
+            self.assertEqual(len(watcher.keys), 2)
+
+
+    def test_stat_key_max_keys(self):
+        with create_test_files([('a.md', 'a'), ('b.md', 'b'), ('c.md', 'c')]) as temp_dir:
+            watcher = PollingFileWatcher(temp_dir)
+            a_path, b_path, c_path = (os.path.join(temp_dir, name) for name in ('a.md', 'b.md', 'c.md'))
+
+            # The least-recently used stat keys are evicted
+            with unittest.mock.patch('markdown_up.watch.WATCHER_MAX_KEYS', 2):
+                watcher.stat_key(a_path)
+                watcher.stat_key(b_path)
+                watcher.stat_key(a_path)
+                watcher.stat_key(c_path)
+            self.assertEqual(list(watcher.keys), [a_path, c_path])
+
+
+    def test_stat_key_changed_while_stat(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            watcher = PollingFileWatcher(temp_dir)
+            readme_path = os.path.join(temp_dir, 'README.md')
+
+            def stat_changed(path):
+                watcher.changed(path)
+                return stat_key(path)
+
+            with unittest.mock.patch('markdown_up.watch.stat_key', side_effect=stat_changed):
+                self.assertEqual(watcher.stat_key(readme_path), stat_key(readme_path))
+            self.assertEqual(watcher.keys, {})
+
+
+    def test_changed(self):
+        with create_test_files([('README.md', '# Title'), (('sub', 'index.md'), '# Index')]) as temp_dir:
+            watcher = PollingFileWatcher(temp_dir)
+            listener = unittest.mock.Mock()
+            watcher.add_listener(listener)
+            readme_path = os.path.join(temp_dir, 'README.md')
+            sub_path = os.path.join(temp_dir, 'sub')
+            index_path = os.path.join(sub_path, 'index.md')
+            for path in (temp_dir, readme_path, sub_path, index_path):
+                watcher.stat_key(path)
+
+            # File change - the file and its parent directory are invalidated
+            watcher.changed(readme_path)
+            self.assertEqual(sorted(watcher.keys), [sub_path, index_path])
+            listener.assert_called_once_with(readme_path)
+
+            # Directory change - the directory and its sub-paths are invalidated
+            watcher.changed(sub_path, is_dir=True)
+            self.assertEqual(watcher.keys, {})
+
+            # Change all
+            watcher.stat_key(readme_path)
+            watcher.changed_all()
+            self.assertEqual(watcher.keys, {})
+            listener.assert_called_with(watcher.root)
+            self.assertEqual(listener.call_count, 3)
+
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            FileWatcher('.') # pylint: disable=abstract-class-instantiated
+
+
+class TestPollingFileWatcher(unittest.TestCase):
+
+    def test_poll(self):
+        with create_test_files([('README.md', '# Title'), (('sub', 'index.md'), '# Index')]) as temp_dir:
+            watcher = PollingFileWatcher(temp_dir)
+            self.assertEqual(watcher.poll_seconds, 1.0)
+            listener = unittest.mock.Mock()
+            watcher.add_listener(listener)
+            readme_path = os.path.join(temp_dir, 'README.md')
+            other_path = os.path.join(temp_dir, 'other.md')
+            sub_path = os.path.join(temp_dir, 'sub')
+            index_path = os.path.join(sub_path, 'index.md')
+            for path in (readme_path, other_path, sub_path, index_path):
+                watcher.stat_key(path)
+
+            # Unchanged
+            watcher.poll()
+            listener.assert_not_called()
+
+            # Modify a file and add a file
+            with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                readme_file.write('# Title 2')
+            with open(other_path, 'w', encoding='utf-8') as other_file:
+                other_file.write('# Other')
+            watcher.poll()
+            self.assertEqual(sorted(call.args[0] for call in listener.call_args_list), [readme_path, other_path])
+            self.assertEqual(sorted(watcher.keys), [sub_path, index_path])
+
+            # Remove a directory - its sub-paths are invalidated
+            os.remove(index_path)
+            os.rmdir(sub_path)
+            watcher.poll()
+            self.assertEqual(watcher.keys, {})
+
+
+    def test_start_stop(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            watcher = PollingFileWatcher(temp_dir, 0.01)
+            readme_path = os.path.join(temp_dir, 'README.md')
+            watcher.stat_key(readme_path)
+            watcher.start()
+            try:
+                with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                    readme_file.write('# Title 2')
+                self.assertTrue(wait_for(lambda: readme_path not in watcher.keys))
+            finally:
+                watcher.stop()
+            self.assertIsNone(watcher.thread)
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify is Linux-only')
+class TestInotifyFileWatcher(unittest.TestCase):
+
+    def test_watch(self):
+        with create_test_files([('README.md', '# Title'), (('sub', 'index.md'), '# Index')]) as temp_dir:
+            watcher = InotifyFileWatcher(temp_dir)
+            self.assertEqual(sorted(watcher.watch_paths.values()), [temp_dir, os.path.join(temp_dir, 'sub')])
+            readme_path = os.path.join(temp_dir, 'README.md')
+            new_dir_path = os.path.join(temp_dir, 'new')
+            new_path = os.path.join(new_dir_path, 'new.md')
+            watcher.start()
+            try:
+                # Modify a file
+                watcher.stat_key(readme_path)
+                with open(readme_path, 'w', encoding='utf-8') as readme_file:
+                    readme_file.write('# Title 2')
+                self.assertTrue(wait_for(lambda: readme_path not in watcher.keys))
+
+                # Add a directory - it's watched
+                os.mkdir(new_dir_path)
+                self.assertTrue(wait_for(lambda: new_dir_path in watcher.watch_paths.values()))
+                watcher.stat_key(new_path)
+                with open(new_path, 'w', encoding='utf-8') as new_file:
+                    new_file.write('# New')
+                self.assertTrue(wait_for(lambda: new_path not in watcher.keys))
+            finally:
+                watcher.stop()
+            self.assertIsNone(watcher.thread)
+
+
+    def test_stat_key_symlink(self):
+        with create_test_files([('README.md', '# Title'), (('target', 'index.md'), '# Index')]) as temp_dir:
+            root_path = os.path.join(temp_dir, 'root')
+            os.mkdir(root_path)
+            os.symlink(os.path.join(temp_dir, 'target'), os.path.join(root_path, 'link'))
+            os.symlink(os.path.join(temp_dir, 'README.md'), os.path.join(root_path, 'README.md'))
+            with open(os.path.join(root_path, 'other.md'), 'w', encoding='utf-8') as other_file:
+                other_file.write('# Other')
+            watcher = InotifyFileWatcher(root_path)
+            try:
+                self.assertEqual(list(watcher.watch_paths.values()), [root_path])
+
+                # Paths through symbolic links are not watched, so their stat keys are not cached
+                index_path = os.path.join(root_path, 'link', 'index.md')
+                readme_path = os.path.join(root_path, 'README.md')
+                other_path = os.path.join(root_path, 'other.md')
+                for path in (root_path, index_path, readme_path, other_path):
+                    self.assertEqual(watcher.stat_key(path), stat_key(path))
+                self.assertEqual(sorted(watcher.keys), [root_path, other_path])
+            finally:
+                watcher.stop()
+
+
+    def test_handle_events(self):
+        with create_test_files([('README.md', '# Title')]) as temp_dir:
+            watcher = InotifyFileWatcher(temp_dir)
+            try:
+                listener = unittest.mock.Mock()
+                watcher.add_listener(listener)
+                watch = next(iter(watcher.watch_paths))
+
+                def event(event_watch, mask, name=b''):
+                    name_size = (len(name) + 16) // 16 * 16 if name else 0
+                    return INOTIFY_EVENT.pack(event_watch, mask, 0, name_size) + name.ljust(name_size, b'\0')
+
+                watcher.handle_events(
+                    event(watch, IN_MODIFY, b'README.md') +
+                    event(99, IN_MODIFY, b'unknown.md') +
+                    event(-1, IN_Q_OVERFLOW) +
+                    event(watch, IN_CREATE | IN_ISDIR, b'missing') +
+                    event(watch, IN_IGNORED)
+                )
+                self.assertEqual(listener.call_args_list, [
+                    unittest.mock.call(os.path.join(temp_dir, 'README.md')),
+                    unittest.mock.call(temp_dir),
+                    unittest.mock.call(os.path.join(temp_dir, 'missing'))
+                ])
+                self.assertEqual(watcher.watch_paths, {})
+            finally:
+                watcher.stop()
+
+
+    def test_handle_events_add_watch_error(self):
+        with create_test_files([('README.md', '# Title'), (('new', 'new.md'), '# New')]) as temp_dir:
+            watcher = InotifyFileWatcher(temp_dir)
+            try:
+                watch = next(watch for watch, path in watcher.watch_paths.items() if path == temp_dir)
+                name = b'new'.ljust(16, b'\0')
+                event = INOTIFY_EVENT.pack(watch, IN_CREATE | IN_ISDIR, 0, len(name)) + name
+                readme_path = os.path.join(temp_dir, 'README.md')
+                new_dir_path = os.path.join(temp_dir, 'new')
+                new_path = os.path.join(new_dir_path, 'new.md')
+
+                # The new directory can't be watched - its paths' stat keys are not cached
+                add_watches_error = OSError('No space left on device')
+                with unittest.mock.patch.object(InotifyFileWatcher, 'add_watches', side_effect=add_watches_error):
+                    watcher.handle_events(event)
+                for path in (readme_path, new_dir_path, new_path):
+                    self.assertEqual(watcher.stat_key(path), stat_key(path))
+                self.assertEqual(list(watcher.keys), [readme_path])
+
+                # The directory is re-created and watched - its paths' stat keys are cached
+                watcher.handle_events(event)
+                self.assertEqual(watcher.unwatched_prefixes, ())
+                for path in (new_dir_path, new_path):
+                    self.assertEqual(watcher.stat_key(path), stat_key(path))
+                self.assertEqual(sorted(watcher.keys), [readme_path, new_dir_path, new_path])
+            finally:
+                watcher.stop()
+
+
+    def test_add_watch_error(self):
+        with create_test_files([]) as temp_dir:
+            with unittest.mock.patch('markdown_up.watch.INOTIFY_MASK', 0):
+                with self.assertRaises(OSError) as cm_exc:
+                    InotifyFileWatcher(temp_dir)
+            self.assertTrue(str(cm_exc.exception).startswith(f'[Errno 22] inotify_add_watch "{temp_dir}": '))
+
+
+class TestCreateFileWatcher(unittest.TestCase):
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'inotify is Linux-only')
+    def test_inotify(self):
+        watcher = create_file_watcher('.')
+        try:
+            self.assertIsInstance(watcher, InotifyFileWatcher)
+        finally:
+            watcher.stop()
+
+
+    def test_inotify_error(self):
+        with unittest.mock.patch('sys.platform', 'linux'), \
+             unittest.mock.patch('markdown_up.watch.InotifyFileWatcher', side_effect=OSError):
+            watcher = create_file_watcher('.', 0.5)
+        self.assertIsInstance(watcher, PollingFileWatcher)
+        self.assertEqual(watcher.poll_seconds, 0.5)
+
+
+    def test_polling(self):
+        with unittest.mock.patch('sys.platform', 'darwin'):
+            watcher = create_file_watcher('.')
+        self.assertIsInstance(watcher, PollingFileWatcher)